@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import User, Post, Like
+from .models import User, Post, Like, Task
 
 class UserAdmin(admin.ModelAdmin):
     list_display = ("username", "email")
@@ -13,7 +13,12 @@ class PostAdmin(admin.ModelAdmin):
 class LikeAdmin(admin.ModelAdmin):
     list_display = ("liker", "post")
 
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("name", "args", "run_at", "attempts", "failed")
+    list_filter = ("failed",)
+
 # Register your models here.
 admin.site.register(User, UserAdmin)
 admin.site.register(Post, PostAdmin)
-admin.site.register(Like, LikeAdmin)
\ No newline at end of file
+admin.site.register(Like, LikeAdmin)
+admin.site.register(Task, TaskAdmin)
\ No newline at end of file
@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class NetworkConfig(AppConfig):
     name = 'network'
+
+    def ready(self):
+        from .instrumentation import install_query_timer
+        from .querylog import install_query_inspector
+        connection_created.connect(install_query_timer)
+        connection_created.connect(install_query_inspector)
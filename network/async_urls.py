@@ -0,0 +1,18 @@
+from django.urls import path
+
+from . import async_views, urls
+
+# The routes of urls.py, with the read-heavy API routes and the event stream served by the async views in
+# async_views.py
+ASYNC_VIEWS = {
+    "posts": async_views.posts,
+    "posts_events": async_views.posts_events,
+    "user_posts": async_views.user_posts,
+    "user_following_posts": async_views.user_following_posts,
+    "user": async_views.user,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS.get(pattern.name, pattern.callback), name=pattern.name)
+    for pattern in urls.urlpatterns
+]
@@ -0,0 +1,161 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import StreamingHttpResponse
+from django.http.response import JsonResponse
+
+from . import views
+from .cache import aget_or_compute, cache_key
+from .conditional import (
+    acondition, following_posts_etag, following_posts_last_modified, posts_etag, posts_last_modified, user_etag,
+    user_last_modified
+)
+from .events import event_stream
+from .likebuffer import overlay_pending_likes
+from .models import User, Post, Like
+from .pagination import InvalidPageRequest, apaginate_posts
+from .routers import replica_reads
+from .streaming import STREAM_CONTENT_TYPES, astreaming_posts_response
+from .timeline import afollowing_posts_page
+
+# Async versions of the read-heavy API routes, served when the project runs under ASGI (see project4/asgi.py).
+#
+# Reads use the async ORM, so a request waiting on the database or on a slow client does not hold a worker thread.
+# Writes are rare next to reads and go through a chain of sync helpers (timelines, cache invalidation), so they are
+# handed to the sync views in views.py.
+
+# Async version of views.mark_liked_by_me
+async def amark_liked_by_me(posts, user):
+    liked = await Like.objects.aliked_post_ids(user, [post["id"] for post in posts])
+    for post in posts:
+        post["liked_by_me"] = post["id"] in liked
+    return overlay_pending_likes(posts, user)
+
+# Async version of views.posts_page
+async def aposts_page(request, queryset):
+    return views.serialize_page(await apaginate_posts(queryset, request.GET))
+
+# API Route: POST = creates a new post, GET = retrieves a page of all posts (or streams every post)
+@replica_reads
+@acondition(etag_func=posts_etag, last_modified_func=posts_last_modified)
+async def posts(request):
+    # Create a new post (or do nothing) in the sync view
+    if request.method != "GET":
+        return await sync_to_async(views.posts)(request)
+
+    # Stream every post, one chunk at a time
+    if "stream" in request.GET:
+        format = request.GET["stream"]
+        if format not in STREAM_CONTENT_TYPES:
+            return JsonResponse({"message": "Invalid stream."}, status=400)
+
+        return astreaming_posts_response(Post.objects.serializable(), format, await request.auser())
+
+    # Return a page of all posts, from the cache if possible
+    key = await sync_to_async(cache_key)(
+        "posts", request.GET.get("cursor"), request.GET.get("direction"), request.GET.get("limit")
+    )
+    try:
+        data, hit = await aget_or_compute(key, lambda: aposts_page(request, Post.objects.serializable()))
+    except InvalidPageRequest as e:
+        return JsonResponse({"message": str(e)}, status=400)
+
+    await amark_liked_by_me(data["posts"], await request.auser())
+    return views.cached_json_response(data, hit)
+
+# API route: GET = retrieves a page of the posts created by a user
+@replica_reads
+@login_required
+async def user_posts(request, username):
+    # If request is not GET, do nothing
+    if request.method != "GET":
+        return JsonResponse({"message": "GET request required."}, status=400)
+
+    # Get user with username=username
+    try:
+        user = await User.objects.aget(username=username)
+    except User.DoesNotExist:
+        return JsonResponse({"message": "User does not exist."}, status=400)
+
+    # Return a page of the posts created by a user in reverse chronological order
+    try:
+        data = await aposts_page(request, Post.objects.serializable().filter(poster=user))
+    except InvalidPageRequest as e:
+        return JsonResponse({"message": str(e)}, status=400)
+
+    await amark_liked_by_me(data["posts"], await request.auser())
+    return views.json_response(data)
+
+# API route: GET = retrieve info about a user, PUT = follow or unfollow a user
+@replica_reads
+@acondition(etag_func=user_etag, last_modified_func=user_last_modified)
+async def user(request, username):
+    # Follow or unfollow a user (or do nothing) in the sync view
+    if request.method != "GET":
+        return await sync_to_async(views.user)(request, username)
+
+    # Return info about a user, from the cache if possible
+    async def serialize():
+        return (await User.objects.aget(username=username)).serialize()
+
+    try:
+        data, hit = await aget_or_compute(await sync_to_async(cache_key)(f"user:{username}"), serialize)
+    except User.DoesNotExist:
+        return JsonResponse({"message": "User does not exist."}, status=400)
+
+    return views.cached_json_response(data, hit)
+
+# API route: GET = retrieves a page of the posts made by the people a user follows
+@replica_reads
+@login_required
+@acondition(etag_func=following_posts_etag, last_modified_func=following_posts_last_modified)
+async def user_following_posts(request, username):
+    # If request is not GET, do nothing
+    if request.method != "GET":
+        return JsonResponse({"message": "GET request required."}, status=400)
+
+    # Get user with username=username
+    try:
+        user = await User.objects.aget(username=username)
+    except User.DoesNotExist:
+        return JsonResponse({"message": "User does not exist."}, status=400)
+
+    # Return a page of the posts made by people a user follows in reverse chronological order
+    try:
+        data = views.serialize_page(await afollowing_posts_page(user, request.GET))
+    except InvalidPageRequest as e:
+        return JsonResponse({"message": str(e)}, status=400)
+
+    await amark_liked_by_me(data["posts"], await request.auser())
+    return views.json_response(data)
+
+# API route: GET = streams updates to the posts as Server-Sent Events: "post" events with the id and poster of each new
+# post (of every poster, of the poster query parameter's user, or, with following=true, of the users the logged in
+# user follows), and "likes" and "edit" events for the posts whose comma-separated ids are in the posts query parameter
+async def posts_events(request):
+    # If request is not GET, do nothing
+    if request.method != "GET":
+        return JsonResponse({"message": "GET request required."}, status=400)
+
+    try:
+        post_ids = views.parse_ids(request.GET.get("posts", ""))
+    except ValueError:
+        return JsonResponse({"message": "Invalid posts."}, status=400)
+
+    if len(post_ids) > views.MAX_BATCH_SIZE:
+        return JsonResponse({"message": f"At most {views.MAX_BATCH_SIZE} posts can be watched at once."}, status=400)
+
+    # Pick the posters whose new posts are sent
+    posters = None
+    if "poster" in request.GET:
+        posters = {request.GET["poster"]}
+    elif request.GET.get("following") == "true":
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({"message": "Log in to follow the posts of the users you follow."}, status=401)
+        posters = {username async for username in user.following.values_list("username", flat=True)}
+
+    return StreamingHttpResponse(
+        event_stream(post_ids, posters),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
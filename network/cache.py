@@ -0,0 +1,110 @@
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .routers import reading_from_replica, replica_aliases, sticky_seconds
+
+# Response cache for the anonymous-readable API routes.
+#
+# Cached values live under keys that include the current generation of a namespace ("posts" for the post listings,
+# "user:<username>" for a user's profile). Writes do not delete cached values; they bump the generation of the
+# namespaces they affect once they commit, so every read after the write misses and the stale values age out.
+# A generation is the time (in nanoseconds) of the last write to its namespace, so it also tells when the namespace was
+# last modified.
+
+# Returns the cache that responses are stored in
+def get_cache():
+    return caches[getattr(settings, "NETWORK_CACHE_ALIAS", "default")]
+
+# Returns the number of seconds a cached response is kept.
+# A response read from a lagging replica can miss writes made before the generation it is cached under, so it is kept
+# no longer than a writer reads from the primary (see routers.py).
+def cache_timeout():
+    timeout = getattr(settings, "NETWORK_CACHE_TIMEOUT", 300)
+    if reading_from_replica.get() and replica_aliases() and (timeout is None or timeout > sticky_seconds()):
+        return sticky_seconds()
+    return timeout
+
+def generation_key(namespace):
+    return f"network:generation:{namespace}"
+
+# Returns the current generation of a namespace.
+# A missing generation (never set, or evicted) starts from the current time so that it can never go back to a
+# generation that still has values cached under it.
+def get_generation(namespace):
+    cache = get_cache()
+    generation = cache.get(generation_key(namespace))
+    if generation is None:
+        cache.add(generation_key(namespace), time.time_ns(), None)
+        generation = cache.get(generation_key(namespace))
+    return generation
+
+# Invalidates everything cached in the given namespaces once the current transaction commits
+def invalidate(*namespaces):
+    def bump():
+        cache = get_cache()
+        for namespace in namespaces:
+            cache.set(generation_key(namespace), time.time_ns(), None)
+
+    transaction.on_commit(bump)
+
+# Returns the cache key of a value in a namespace, identified by parts (which may come from query parameters, so they
+# are hashed to keep the key short and free of characters some cache backends reject).
+# Values read from a replica are kept apart from values read from the primary: a replica read can miss a write made
+# before the current generation, and a client pinned to the primary after that write must not be served it.
+def cache_key(namespace, *parts):
+    source = "replica" if reading_from_replica.get() and replica_aliases() else "primary"
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f"network:{namespace}:{get_generation(namespace)}:{source}:{digest}"
+
+# Records a cache hit or miss
+def record(hit):
+    cache = get_cache()
+    key = "network:stats:hits" if hit else "network:stats:misses"
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+# Returns the number of cache hits and misses recorded
+def stats():
+    counts = get_cache().get_many(["network:stats:hits", "network:stats:misses"])
+    hits = counts.get("network:stats:hits", 0)
+    misses = counts.get("network:stats:misses", 0)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / (hits + misses) if hits + misses else 0.0
+    }
+
+# Returns the value cached under key, computing and caching it with compute() on a miss. Also returns whether it was a
+# hit.
+def get_or_compute(key, compute):
+    cache = get_cache()
+    value = cache.get(key)
+    if value is not None:
+        record(True)
+        return value, True
+
+    value = compute()
+    cache.set(key, value, cache_timeout())
+    record(False)
+    return value, False
+
+# Async version of get_or_compute, for a coroutine function compute
+async def aget_or_compute(key, compute):
+    cache = get_cache()
+    value = await cache.aget(key)
+    if value is not None:
+        await sync_to_async(record)(True)
+        return value, True
+
+    value = await compute()
+    await cache.aset(key, value, cache_timeout())
+    await sync_to_async(record)(False)
+    return value, False
@@ -0,0 +1,139 @@
+import datetime
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import cache_key, cache_timeout, get_cache, get_generation
+from .models import User, Post, Like
+from .pagination import InvalidPageRequest, parse_page_request
+
+# Validators for conditional GETs (ETag / Last-Modified).
+#
+# Validators are computed from a few indexed aggregates (the newest post timestamp, the newest like id, a user's
+# counters) and the cache generations that every write bumps, without fetching or serializing any posts. They are
+# cached under the same generations as the responses, so a client whose copy is current gets a 304 without a query.
+
+# Returns the time a cache generation was bumped
+def generation_time(generation):
+    return datetime.datetime.fromtimestamp(generation / 1e9, tz=datetime.timezone.utc)
+
+# Returns the key of the session of the user a request is from. Posts are marked with whether the requesting user liked
+# them, so their validators differ per session; the session cookie tells sessions apart without loading the session.
+def session_key(request):
+    return request.COOKIES.get(settings.SESSION_COOKIE_NAME, "")
+
+# Returns the ETag for a response that depends on parts
+def make_etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+# Returns the (etag, last_modified) validators of a request, cached in namespace under parts and computed with
+# compute() on a miss. Only GET and HEAD requests have validators.
+def validators(request, namespace, parts, compute):
+    if request.method not in ("GET", "HEAD"):
+        return None, None
+
+    if not hasattr(request, "_network_validators"):
+        cache = get_cache()
+        key = cache_key(namespace, "validators", *parts)
+        found = cache.get(key)
+        if found is None:
+            found = compute()
+            if found[0] is not None:
+                cache.set(key, found, cache_timeout())
+        request._network_validators = found
+
+    return request._network_validators
+
+# Returns the validators of a page of posts, which change whenever a post is created, edited, liked or unliked, or
+# whenever a namespace in namespaces is invalidated.
+# Malformed page requests have no validators, so their errors are never answered with a 304.
+def posts_validators(request, *namespaces):
+    try:
+        parse_page_request(request.GET)
+    except InvalidPageRequest:
+        return None, None
+
+    latest = Post.objects.aggregate(latest=Max("timestamp"))["latest"]
+    last_like = Like.objects.aggregate(last_like=Max("id"))["last_like"]
+    generations = [get_generation(namespace) for namespace in ("posts", *namespaces)]
+
+    etag = make_etag(latest, last_like, generations, session_key(request), request.GET.urlencode())
+    last_modified = max(generation_time(generation) for generation in generations)
+    if latest is not None:
+        last_modified = max(last_modified, latest)
+    return etag, last_modified
+
+# Returns the validators of a user's profile, which change whenever they follow or are followed by someone
+def user_validators(username):
+    counts = User.objects.filter(username=username).values_list("follower_count", "following_count").first()
+    if counts is None:
+        return None, None
+
+    generation = get_generation(f"user:{username}")
+    return make_etag(username, counts, generation), generation_time(generation)
+
+# Returns the validators of GET /posts
+def feed_validators(request):
+    parts = (session_key(request), request.GET.urlencode())
+    return validators(request, "posts", parts, lambda: posts_validators(request))
+
+# Returns the validators of GET /posts/user/<username>/following, which also change whenever the user follows or
+# unfollows someone
+def following_feed_validators(request, username):
+    parts = (username, get_generation(f"user:{username}"), session_key(request), request.GET.urlencode())
+    return validators(request, "posts", parts, lambda: posts_validators(request, f"user:{username}"))
+
+# Returns the validators of GET /<username>
+def profile_validators(request, username):
+    return validators(request, f"user:{username}", (), lambda: user_validators(username))
+
+# ETag and Last-Modified functions for django.views.decorators.http.condition
+def posts_etag(request):
+    return feed_validators(request)[0]
+
+def posts_last_modified(request):
+    return feed_validators(request)[1]
+
+def following_posts_etag(request, username):
+    return following_feed_validators(request, username)[0]
+
+def following_posts_last_modified(request, username):
+    return following_feed_validators(request, username)[1]
+
+def user_etag(request, username):
+    return profile_validators(request, username)[0]
+
+def user_last_modified(request, username):
+    return profile_validators(request, username)[1]
+
+# Async counterpart of django.views.decorators.http.condition for async views. That decorator calls etag_func and
+# last_modified_func synchronously even around an async view, which would run their queries on the event loop; this
+# one runs them in a thread.
+def acondition(etag_func, last_modified_func):
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag = await sync_to_async(etag_func)(request, *args, **kwargs)
+            last_modified = await sync_to_async(last_modified_func)(request, *args, **kwargs)
+            etag = quote_etag(etag) if etag is not None else None
+            last_modified = int(last_modified.timestamp()) if last_modified is not None else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+
+            if request.method in ("GET", "HEAD"):
+                if last_modified is not None and not response.has_header("Last-Modified"):
+                    response.headers["Last-Modified"] = http_date(last_modified)
+                if etag is not None:
+                    response.headers.setdefault("ETag", etag)
+            return response
+
+        return inner
+
+    return decorator
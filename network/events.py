@@ -0,0 +1,137 @@
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Publish/subscribe of feed updates, pushed to clients as Server-Sent Events by async_views.posts_events.
+#
+# Writes publish small events once they commit: "post" (a new post's id and poster) on the "posts" channel, and
+# "likes" (a post's new like count) and "edit" (a post's new content) on the "post:<id>" channel of the post. Each
+# event stream subscribes to "posts" and to the channels of the posts its client displays.
+#
+# The broker is NETWORK_EVENT_BROKER, InProcessBroker by default, which only reaches the clients connected to the same
+# process. Any class with the same methods can stand in for it, e.g. one backed by a message broker shared by every
+# process; subscribe() must return an object with an async get() and a close().
+
+# Maximum number of events waiting to be sent to one client. A client that falls further behind is told to resync.
+QUEUE_SIZE = 100
+
+# Number of milliseconds a disconnected client waits before reconnecting
+RETRY_MS = 3000
+
+# Returns the number of seconds after which an idle event stream sends a comment, so proxies keep it open
+def keepalive_seconds():
+    return getattr(settings, "NETWORK_EVENTS_KEEPALIVE_SECONDS", 15)
+
+# Brokers by class path
+brokers = {}
+
+# Returns the broker events are published to
+def get_broker():
+    path = getattr(settings, "NETWORK_EVENT_BROKER", "network.events.InProcessBroker")
+    if path not in brokers:
+        brokers[path] = import_string(path)()
+    return brokers[path]
+
+# A client's subscription to a set of channels, read from the event loop that created it
+class Subscription:
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    # Queues an event (called on the subscription's event loop)
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    # Waits for the next event, as a (name, data) tuple
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+# Broker that hands events to the subscriptions of the current process
+class InProcessBroker:
+    def __init__(self):
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+
+    # Sends an event, a (name, data) tuple, to the subscribers of channel. Safe to call from any thread.
+    def publish(self, channel, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The subscription's event loop has closed
+                self.unsubscribe(subscription)
+
+    # Returns a Subscription to channels. Must be called from a running event loop.
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels)
+        with self.lock:
+            for channel in channels:
+                self.subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                subscribers = self.subscriptions.get(channel, set())
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self.subscriptions.pop(channel, None)
+
+    # Returns whether anyone is subscribed to channel, so events nobody would receive need not be built
+    def has_subscribers(self, channel):
+        with self.lock:
+            return channel in self.subscriptions
+
+# Publishes the event returned by make_event() (None for no event) on channel once the current transaction commits,
+# if anyone is subscribed
+def publish_on_commit(channel, make_event):
+    def publish():
+        broker = get_broker()
+        if broker.has_subscribers(channel):
+            event = make_event()
+            if event is not None:
+                broker.publish(channel, event)
+
+    transaction.on_commit(publish)
+
+# Formats an event as a Server-Sent Event
+def format_event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+# Yields the events of the "posts" channel and of the channels of post_ids as Server-Sent Events, for as long as the
+# client stays connected. New posts are only sent if their poster is in posters (None for every poster).
+async def event_stream(post_ids, posters=None):
+    subscription = get_broker().subscribe(["posts", *(f"post:{id}" for id in post_ids)])
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield format_event("resync", {})
+
+            try:
+                name, data = await asyncio.wait_for(subscription.get(), keepalive_seconds())
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            if name == "post" and posters is not None and data["poster"] not in posters:
+                continue
+            yield format_event(name, data)
+    finally:
+        subscription.close()
@@ -0,0 +1,88 @@
+import bisect
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .cache import get_generation
+from .models import User
+from .routers import PRIMARY
+
+# In-process cache of the follow graph.
+#
+# Each cached entry is the sorted array of the ids a user follows, so a membership test is a binary search over 8 bytes
+# per followee instead of a query. Entries are tagged with the generation of the user's "user:<username>" cache
+# namespace, which every follow and unfollow bumps, so an entry stops being used as soon as the user's following list
+# changes. Generations live in NETWORK_CACHE_ALIAS, so that holds for changes made by other processes only if that
+# cache is shared between them (e.g. Redis or Memcached, not the default local-memory cache); entries are also dropped
+# NETWORK_FOLLOW_GRAPH_MAX_AGE_SECONDS after they are read, which bounds how long another process's changes go unseen
+# otherwise. The cache holds at most NETWORK_FOLLOW_GRAPH_MAX_IDS ids in total and evicts the least recently used
+# entries beyond that.
+
+# Returns the maximum number of ids held by the follow graph cache
+def follow_graph_max_ids():
+    return getattr(settings, "NETWORK_FOLLOW_GRAPH_MAX_IDS", 1_000_000)
+
+# Returns the number of seconds a cached entry is used for (None for as long as its generation is current)
+def follow_graph_max_age():
+    return getattr(settings, "NETWORK_FOLLOW_GRAPH_MAX_AGE_SECONDS", 60)
+
+# Returns True if the sorted array ids holds id
+def contains(ids, id):
+    index = bisect.bisect_left(ids, id)
+    return index < len(ids) and ids[index] == id
+
+class FollowGraph:
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    # Returns the sorted array of the ids that the user with user_id follows, as of generation
+    def following(self, user_id, generation):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] == generation and time.monotonic() < entry[2]:
+                self.entries.move_to_end(user_id)
+                return entry[1]
+
+        # A follow row (from_user=followee, to_user=follower) means follower follows followee. Entries are read from the
+        # primary, even in views that read from replicas: an entry filled from a lagging replica would be kept until the
+        # next follow or unfollow, or until it expires.
+        ids = User.followers.through.objects.using(PRIMARY).filter(to_user_id=user_id).order_by("from_user_id")
+        ids = array("q", ids.values_list("from_user_id", flat=True))
+        self.store(user_id, generation, ids)
+        return ids
+
+    # Caches the following ids of a user, evicting the least recently used entries to stay within follow_graph_max_ids()
+    def store(self, user_id, generation, ids):
+        max_ids = follow_graph_max_ids()
+        if len(ids) > max_ids:
+            return
+
+        with self.lock:
+            self.discard(user_id)
+            while self.entries and self.size + len(ids) > max_ids:
+                self.discard(next(iter(self.entries)))
+            max_age = follow_graph_max_age()
+            expires = time.monotonic() + max_age if max_age is not None else float("inf")
+            self.entries[user_id] = (generation, ids, expires)
+            self.size += len(ids)
+
+    def discard(self, user_id):
+        entry = self.entries.pop(user_id, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    # Returns True if the user with user_id (whose username is username) follows the user with other_id
+    def follows(self, user_id, username, other_id):
+        return contains(self.following(user_id, get_generation(f"user:{username}")), other_id)
+
+follow_graph = FollowGraph()
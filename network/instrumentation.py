@@ -0,0 +1,111 @@
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Per-request performance measurements (see middleware.PerformanceMiddleware).
+#
+# A sampled request gets a RequestMetrics that counts and times its queries and the spans timed with timer(). When the
+# request is done the measurements are added to per-route histograms kept in process memory, so each process reports
+# the requests it served.
+
+# Upper bounds (in milliseconds) of the buckets of the wall time histograms; slower requests go in a last, open bucket
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+# Returns the fraction of requests that are measured
+def sample_rate():
+    return getattr(settings, "NETWORK_PERFORMANCE_SAMPLE_RATE", 1.0)
+
+# Measurements of the request being handled, or None if it is not sampled
+current_metrics = contextvars.ContextVar("network_request_metrics", default=None)
+
+# The measurements of one request
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.spans = defaultdict(float)
+
+# Database execute wrapper that counts and times the queries of sampled requests. It is installed on every connection
+# (see apps.py) rather than per request, so it also sees the queries async views run in other threads.
+def time_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+# connection_created receiver that installs time_query on a new connection
+def install_query_timer(sender, connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+# Adds the time spent in the block to the span name of the current request, if it is sampled
+@contextmanager
+def timer(name):
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.spans[name] += time.perf_counter() - started
+
+# Aggregated measurements per route
+class Histograms:
+    def __init__(self):
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    # Adds the measurements of a request to route took wall seconds and returned size bytes
+    def record(self, route, wall, metrics, size):
+        wall_ms = wall * 1000
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if wall_ms <= bound), len(LATENCY_BUCKETS_MS))
+
+        with self.lock:
+            totals = self.routes.setdefault(route, {
+                "count": 0, "wall_ms": 0.0, "db_ms": 0.0, "queries": 0, "bytes": 0, "spans_ms": defaultdict(float),
+                "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+            })
+            totals["count"] += 1
+            totals["wall_ms"] += wall_ms
+            totals["db_ms"] += metrics.db_time * 1000
+            totals["queries"] += metrics.queries
+            totals["bytes"] += size
+            for name, seconds in metrics.spans.items():
+                totals["spans_ms"][name] += seconds * 1000
+            totals["buckets"][bucket] += 1
+
+    # Returns the mean measurements and wall time histogram of each route
+    def snapshot(self):
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        with self.lock:
+            return {
+                route: {
+                    "count": totals["count"],
+                    "mean_wall_ms": totals["wall_ms"] / totals["count"],
+                    "mean_db_ms": totals["db_ms"] / totals["count"],
+                    "mean_queries": totals["queries"] / totals["count"],
+                    "mean_bytes": totals["bytes"] / totals["count"],
+                    "mean_spans_ms": {name: ms / totals["count"] for name, ms in totals["spans_ms"].items()},
+                    "wall_ms_histogram": dict(zip(labels, totals["buckets"])),
+                }
+                for route, totals in self.routes.items()
+            }
+
+    def clear(self):
+        with self.lock:
+            self.routes.clear()
+
+histograms = Histograms()
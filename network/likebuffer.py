@@ -0,0 +1,204 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .cache import invalidate
+from .models import User, Post, Like
+
+# Write-behind buffer of likes and unlikes.
+#
+# With NETWORK_LIKE_WRITE_BEHIND on, liking or unliking a post records the intent in memory instead of writing to the
+# Like table, so a burst of likes on a popular post does not queue every request on SQLite's single write lock. Intents
+# are kept per (user, post) as the state the Like table had before them and the state wanted, so toggling back cancels
+# out. The buffer is flushed as one transaction (a bulk insert, a few batched deletes and a recount of the affected
+# posts' like counts) every NETWORK_LIKE_FLUSH_SECONDS, once it holds NETWORK_LIKE_FLUSH_SIZE intents, and when the
+# process exits. Until then, the posts served by this process overlay the pending intents on their like counts and
+# liked_by_me, so users see their own likes straight away.
+#
+# Intents only live in the process that recorded them: other processes see them once they are flushed, and the intents
+# of a process that crashes are lost.
+
+logger = logging.getLogger("network.likes")
+
+# Maximum number of (post, likers) conditions in one batched delete
+DELETE_BATCH_SIZE = 100
+
+# Returns whether likes and unlikes are buffered
+def write_behind_enabled():
+    return getattr(settings, "NETWORK_LIKE_WRITE_BEHIND", False)
+
+# Returns the number of seconds between flushes of the buffer (None to only flush when it is full)
+def flush_seconds():
+    return getattr(settings, "NETWORK_LIKE_FLUSH_SECONDS", 1)
+
+# Returns the number of buffered intents that triggers a flush
+def flush_size():
+    return getattr(settings, "NETWORK_LIKE_FLUSH_SIZE", 500)
+
+# Returns the change an intent makes to its post's like count
+def like_delta(entry):
+    before, liked = entry
+    return int(liked) - int(before)
+
+# Writes intents, a dict of (user id, post id): (liked before, liked) entries, to the Like table in one transaction and
+# recounts the like counts of their posts. Intents for posts or users deleted since are dropped.
+def write_intents(intents):
+    post_ids = {post_id for _, post_id in intents}
+    user_ids = {user_id for user_id, _ in intents}
+
+    with transaction.atomic():
+        post_ids = set(Post.objects.filter(pk__in=post_ids).values_list("pk", flat=True))
+        user_ids = set(User.objects.filter(pk__in=user_ids).values_list("pk", flat=True))
+        intents = {
+            (user_id, post_id): entry for (user_id, post_id), entry in intents.items()
+            if user_id in user_ids and post_id in post_ids
+        }
+
+        # Likes another process already wrote are left as they are
+        likes = [Like(liker_id=user_id, post_id=post_id) for (user_id, post_id), (_, liked) in intents.items() if liked]
+        Like.objects.bulk_create(likes, batch_size=500, ignore_conflicts=True)
+
+        unlikes = defaultdict(list)
+        for (user_id, post_id), (_, liked) in intents.items():
+            if not liked:
+                unlikes[post_id].append(user_id)
+        unlikes = list(unlikes.items())
+        for start in range(0, len(unlikes), DELETE_BATCH_SIZE):
+            batch = unlikes[start:start + DELETE_BATCH_SIZE]
+            condition = reduce(or_, (Q(post_id=post_id, liker_id__in=users) for post_id, users in batch))
+            Like.objects.filter(condition).delete()
+
+        # Recount rather than add the deltas, so likes written by other processes in between are counted exactly once
+        counts = Like.objects.filter(post=OuterRef("pk")).values("post").annotate(count=Count("pk")).values("count")
+        Post.objects.filter(pk__in=post_ids).update(like_count=Coalesce(Subquery(counts), 0))
+        invalidate("posts")
+
+class LikeBuffer:
+    def __init__(self):
+        # (user id, post id): (liked before, liked)
+        self.pending = {}
+        # post id: change to its like count
+        self.deltas = defaultdict(int)
+        self.timer = None
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+
+    # Records that user likes (liked=True) or unlikes post. Returns False if user already does, counting the pending
+    # intents.
+    def record(self, post, user, liked):
+        key = (user.id, post.id)
+        with self.lock:
+            entry = self.pending.get(key)
+        # The state of the Like table, should the intent be flushed in the meantime
+        stored = Like.objects.filter(post=post, liker=user).exists() if entry is None else entry[1]
+
+        with self.lock:
+            before, current = self.pending.get(key, (stored, stored))
+            if liked == current:
+                return False
+
+            self.set(key, (before, liked))
+            full = len(self.pending) >= flush_size()
+            if not full:
+                self.schedule()
+
+        if full:
+            self.flush()
+        return True
+
+    # Sets (or, for an entry that changes nothing, removes) the intent of key. Must hold the lock.
+    def set(self, key, entry):
+        old = self.pending.pop(key, None)
+        if old is not None:
+            self.deltas[key[1]] -= like_delta(old)
+        if entry[0] != entry[1]:
+            self.pending[key] = entry
+            self.deltas[key[1]] += like_delta(entry)
+        if not self.deltas[key[1]]:
+            del self.deltas[key[1]]
+
+    # Starts the timer of the next flush, unless it is running or flushes are not timed. Must hold the lock.
+    def schedule(self):
+        if self.timer is None and flush_seconds() is not None:
+            self.timer = threading.Timer(flush_seconds(), self.flush_in_background)
+            self.timer.daemon = True
+            self.timer.start()
+
+    # Returns the pending change to the like count of the post with post_id
+    def pending_delta(self, post_id):
+        with self.lock:
+            return self.deltas.get(post_id, 0)
+
+    # Overlays the pending intents on serialized posts, whose liked_by_me is already set for user
+    def overlay(self, posts, user):
+        with self.lock:
+            if not self.pending:
+                return posts
+
+            for post in posts:
+                post["likes"] = max(post["likes"] + self.deltas.get(post["id"], 0), 0)
+                entry = self.pending.get((user.id, post["id"])) if user.is_authenticated else None
+                if entry is not None:
+                    post["liked_by_me"] = entry[1]
+        return posts
+
+    # Writes the pending intents to the database. Returns the number of intents written.
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                intents = dict(self.pending)
+            if not intents:
+                return 0
+
+            write_intents(intents)
+
+            # Intents recorded during the write now start from the state it wrote
+            with self.lock:
+                for key, (_, liked) in intents.items():
+                    if key in self.pending:
+                        self.set(key, (liked, self.pending[key][1]))
+        return len(intents)
+
+    # Flushes the buffer on the timer's thread, trying again later if the write fails
+    def flush_in_background(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Failed to flush buffered likes")
+        finally:
+            connections.close_all()
+            with self.lock:
+                self.timer = None
+                if self.pending:
+                    self.schedule()
+
+    # Drops the pending intents without writing them
+    def clear(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.pending.clear()
+            self.deltas.clear()
+
+like_buffer = LikeBuffer()
+atexit.register(like_buffer.flush)
+
+# Makes user like (liked=True) or unlike post, through the buffer when write-behind is on. Returns False if nothing
+# changed.
+def set_like(post, user, liked):
+    if write_behind_enabled():
+        return like_buffer.record(post, user, liked)
+    return post.like(user) if liked else post.unlike(user)
+
+# Overlays the pending likes and unlikes on serialized posts, whose liked_by_me is already set for user
+def overlay_pending_likes(posts, user):
+    return like_buffer.overlay(posts, user)
@@ -0,0 +1,187 @@
+import json
+import math
+import platform
+import time
+import urllib.request
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from network.cache import get_cache
+from network.models import User, Post
+from network.search import WORD, search_available
+
+# Management command that replays the API routes of network/urls.py against the current database (e.g. one filled by
+# generate_graph) and reports, per route, the p50 / p95 / p99 latency, the queries per request and the bytes per
+# response. Requests go through Django's test client in process, or to a running server with --server (which cannot
+# count queries). Results are written as JSON so runs on different versions can be compared with --compare.
+class Command(BaseCommand):
+    help = "Benchmarks the latency, queries and response size of each API route on the current database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50, help="Number of requests per route (default 50)")
+        parser.add_argument("--route", action="append", dest="routes", help="Only benchmark this route (repeatable)")
+        parser.add_argument(
+            "--server", help="Base URL of a running server to send the requests to, e.g. http://127.0.0.1:8000"
+        )
+        parser.add_argument("--no-cache", action="store_true", help="Do not serve responses from the response cache")
+        parser.add_argument("--output", help="File to write the results to as JSON")
+        parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1:
+            raise CommandError("--requests must be at least 1.")
+
+        viewer = User.objects.order_by("-following_count", "id").first()
+        popular = User.objects.order_by("-follower_count", "id").first()
+        post = Post.objects.order_by("-like_count", "id").first()
+        if viewer is None or popular is None or post is None:
+            raise CommandError("The database needs users and posts to benchmark (see generate_graph).")
+
+        routes = self.routes(viewer, popular, post)
+        if options["routes"]:
+            unknown = set(options["routes"]) - set(routes)
+            if unknown:
+                raise CommandError(f"Unknown routes: {', '.join(sorted(unknown))}. Routes: {', '.join(routes)}.")
+            routes = {label: path for label, path in routes.items() if label in options["routes"]}
+
+        overrides = {"ALLOWED_HOSTS": ["testserver", *settings.ALLOWED_HOSTS]}
+        if options["no_cache"]:
+            overrides["NETWORK_CACHE_TIMEOUT"] = 0
+
+        with override_settings(**overrides):
+            client = Client()
+            client.force_login(viewer)
+            get_cache().clear()
+
+            if options["server"]:
+                session = client.cookies[settings.SESSION_COOKIE_NAME].value
+                request = lambda path: self.server_request(options["server"], path, session)
+            else:
+                request = lambda path: self.client_request(client, path)
+
+            results = {
+                "run": {
+                    "timestamp": timezone.now().isoformat(),
+                    "django": django.get_version(),
+                    "python": platform.python_version(),
+                    "database": connection.vendor,
+                    "server": options["server"],
+                    "requests": options["requests"],
+                    "cache": not options["no_cache"],
+                    "users": User.objects.count(),
+                    "posts": Post.objects.count(),
+                },
+                "routes": {label: self.benchmark(request, path, options["requests"]) for label, path in routes.items()},
+            }
+
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)["routes"]
+
+        for label, result in results["routes"].items():
+            self.report(label, result, baseline.get(label) if baseline else None)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+
+    # Returns the path of each API route, by label, filled in with a user that follows many users (viewer), a user with
+    # many followers (popular) and a post with many likes (post), whose first word is searched for. Search is left out
+    # where it is not available.
+    def routes(self, viewer, popular, post):
+        newest_ids = Post.objects.order_by("-timestamp", "-id").values_list("id", flat=True)[:100]
+        routes = {
+            "posts": (reverse("posts"), {}),
+            "posts?limit=100": (reverse("posts"), {"limit": 100}),
+            "posts_batch": (reverse("posts_batch"), {"ids": ",".join(str(id) for id in newest_ids)}),
+            "user_posts": (reverse("user_posts", args=[popular.username]), {}),
+            "user_following_posts": (reverse("user_following_posts", args=[viewer.username]), {}),
+            "user": (reverse("user", args=[popular.username]), {}),
+            "user_followers": (reverse("user_followers", args=[popular.username]), {}),
+            "user_following": (reverse("user_following", args=[viewer.username]), {}),
+            "user_follows": (reverse("user_follows", args=[viewer.username, popular.username]), {}),
+            "post_likers": (reverse("post_likers", args=[post.id]), {}),
+            "user_suggestions": (reverse("user_suggestions", args=[viewer.username]), {}),
+        }
+        words = WORD.findall(post.content)
+        if words and search_available():
+            routes["posts_search"] = (reverse("posts_search"), {"q": words[0]})
+        return {label: f"{path}?{urlencode(params)}" if params else path for label, (path, params) in routes.items()}
+
+    # Makes a request through the test client. Returns its latency, number of queries and response size.
+    def client_request(self, client, path):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(path)
+            content = b"".join(response.streaming_content) if response.streaming else response.content
+            latency = time.perf_counter() - started
+
+        if response.status_code >= 400:
+            raise CommandError(f"GET {path} failed with status {response.status_code}.")
+        return latency, len(queries), len(content)
+
+    # Makes a request to a running server, logged in with the session key session. Returns the same as client_request,
+    # without the number of queries.
+    def server_request(self, server, path, session):
+        request = urllib.request.Request(
+            server.rstrip("/") + path, headers={"Cookie": f"{settings.SESSION_COOKIE_NAME}={session}"}
+        )
+        started = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            content = response.read()
+        return time.perf_counter() - started, None, len(content)
+
+    # Makes requests to path and returns the latency percentiles (in milliseconds), queries and bytes per request
+    def benchmark(self, request, path, requests):
+        latencies, queries, sizes = [], [], []
+        for _ in range(requests):
+            latency, num_queries, size = request(path)
+            latencies.append(latency * 1000)
+            queries.append(num_queries)
+            sizes.append(size)
+
+        latencies.sort()
+        return {
+            "path": path,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "queries": None if None in queries else sum(queries) / len(queries),
+            "bytes": sum(sizes) / len(sizes),
+        }
+
+    # Writes the results of a route, with their change from baseline if given
+    def report(self, label, result, baseline):
+        line = f"{label}: p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms"
+        if result["queries"] is not None:
+            line += f", {result['queries']:.1f} queries"
+        line += f", {result['bytes']:.0f} bytes"
+
+        if baseline:
+            changes = [
+                f"{key} {change(baseline[key], result[key])}"
+                for key in ("p50_ms", "p95_ms", "queries", "bytes")
+                if baseline.get(key) is not None and result[key] is not None
+            ]
+            line += f" ({', '.join(changes)} vs baseline)"
+
+        self.stdout.write(line)
+
+# Returns the p-th percentile of sorted values (nearest rank)
+def percentile(values, p):
+    return values[max(0, math.ceil(len(values) * p / 100) - 1)]
+
+# Returns the relative change from before to after, formatted as a signed percentage
+def change(before, after):
+    if before == 0:
+        return "+0%" if after == 0 else "new"
+    return f"{(after - before) / before:+.0%}"
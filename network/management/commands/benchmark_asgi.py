@@ -0,0 +1,88 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+
+from network.cache import get_cache
+
+# Management command that compares the throughput of the API routes under WSGI (the sync views, one request per thread)
+# and under ASGI (the async views, all requests on one event loop) on the same database. Requests are made in process
+# through Django's test clients, so the numbers measure the handlers, views and database rather than a web server.
+class Command(BaseCommand):
+    help = "Compares the throughput of concurrent API requests under WSGI and ASGI on the current database."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path", action="append", dest="paths",
+            help="A path to request (repeatable, default /posts and /posts?limit=100)"
+        )
+        parser.add_argument("--requests", type=int, default=500, help="Number of requests per handler (default 500)")
+        parser.add_argument("--concurrency", type=int, default=20, help="Number of requests in flight (default 20)")
+        parser.add_argument(
+            "--no-cache", action="store_true", help="Do not serve responses from the response cache"
+        )
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be at least 1.")
+
+        paths = options["paths"] or ["/posts", "/posts?limit=100"]
+        paths = [paths[i % len(paths)] for i in range(options["requests"])]
+        concurrency = options["concurrency"]
+        overrides = {"ALLOWED_HOSTS": ["testserver"]}
+        if options["no_cache"]:
+            overrides["NETWORK_CACHE_TIMEOUT"] = 0
+
+        with override_settings(**overrides):
+            get_cache().clear()
+            self.report("WSGI", *self.run_wsgi(paths, concurrency))
+
+            get_cache().clear()
+            with override_settings(ROOT_URLCONF="project4.asgi_urls"):
+                self.report("ASGI", *asyncio.run(self.run_asgi(paths, concurrency)))
+
+    # Makes the requests through the sync views from concurrency threads. Returns the elapsed time, the latency of each
+    # request and the number of failed requests.
+    def run_wsgi(self, paths, concurrency):
+        # Each thread has its own database connection, closed once its request is done
+        def run(path):
+            try:
+                started = time.perf_counter()
+                status = Client().get(path).status_code
+                return time.perf_counter() - started, status
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(run, paths))
+        return time.perf_counter() - started, results
+
+    # Makes the requests through the async views, at most concurrency at a time. Returns the same as run_wsgi.
+    async def run_asgi(self, paths, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(path):
+            async with semaphore:
+                started = time.perf_counter()
+                status = (await client.get(path)).status_code
+                return time.perf_counter() - started, status
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(run(path) for path in paths))
+        return time.perf_counter() - started, results
+
+    # Writes the throughput, latency and failures of a run
+    def report(self, handler, elapsed, results):
+        latencies = sorted(latency for latency, _ in results)
+        failures = sum(1 for _, status in results if status >= 400)
+        self.stdout.write(
+            f"{handler}: {len(results) / elapsed:.1f} requests/s, "
+            f"mean latency {sum(latencies) / len(latencies) * 1000:.1f} ms, "
+            f"p95 latency {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms, "
+            f"{failures} failed"
+        )
@@ -0,0 +1,140 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connection, connections
+from django.test import Client, override_settings
+
+from network.models import User, Post
+
+# The SQLite setup the WAL profile replaces: rollback journal and a new connection for every request
+DEFAULT_PROFILE = {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False, "OPTIONS": {}}
+
+# Management command that compares the throughput of concurrent reads and writes on SQLite with its default setup and
+# with the WAL profile of project4/settings.py (SQLITE_WAL_PROFILE). Each run works on its own copy of the current
+# database, so the database itself is left untouched. Reader threads get pages of posts and writer threads create
+# posts and like and unlike them, all through the views (with the response cache off) in process.
+class Command(BaseCommand):
+    help = "Compares concurrent read/write throughput of SQLite's default setup and the WAL profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=5, help="Duration of each run in seconds (default 5)")
+        parser.add_argument("--readers", type=int, default=8, help="Number of reader threads (default 8)")
+        parser.add_argument("--writers", type=int, default=2, help="Number of writer threads (default 2)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("benchmark_sqlite only runs on SQLite.")
+
+        writers = list(User.objects.order_by("id")[:max(options["writers"], 1)])
+        post_ids = list(Post.objects.order_by("-timestamp", "-id").values_list("id", flat=True)[:100])
+        if not writers or not post_ids:
+            raise CommandError("The database needs users and posts to benchmark (see generate_graph).")
+
+        profiles = {"default": ("DELETE", DEFAULT_PROFILE), "wal": ("WAL", settings.SQLITE_WAL_PROFILE)}
+        overrides = {
+            "ALLOWED_HOSTS": ["testserver", *settings.ALLOWED_HOSTS],
+            "NETWORK_CACHE_TIMEOUT": 0,
+            # Lock waits are expected here, not worth logging
+            "NETWORK_SLOW_QUERY_MS": None,
+        }
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(**overrides):
+            for name, (journal_mode, profile) in profiles.items():
+                path = os.path.join(directory, f"{name}.sqlite3")
+                self.copy_database(path, journal_mode)
+                with self.database(path, profile):
+                    self.report(name, *self.run(writers, post_ids, options))
+
+    # Copies the current database to path, in the given journal mode
+    def copy_database(self, path, journal_mode):
+        connection.ensure_connection()
+        copy = sqlite3.connect(path)
+        try:
+            connection.connection.backup(copy)
+            copy.execute(f"PRAGMA journal_mode={journal_mode}")
+        finally:
+            copy.close()
+
+    # Points the default database at the file path, with the connection settings of profile, within the block
+    @contextmanager
+    def database(self, path, profile):
+        original = connections.settings["default"]
+        connection.close()
+        del connections["default"]
+        connections.settings["default"] = {**original, **profile, "NAME": path}
+        try:
+            yield
+        finally:
+            connection.close()
+            del connections["default"]
+            connections.settings["default"] = original
+
+    # Runs the reader and writer threads for the given number of seconds. Returns the elapsed time and the number of
+    # reads, writes and failed requests.
+    def run(self, writers, post_ids, options):
+        counts = {"reads": 0, "writes": 0, "failures": 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options["seconds"]
+
+        def count(key):
+            with lock:
+                counts[key] += 1
+
+        # Makes a request the way the request handler does: stale and per-request connections are closed after it
+        def request(method, path, data=None):
+            try:
+                response = method(path, data, "application/json") if data is not None else method(path)
+                return response.status_code < 400
+            except DatabaseError:
+                return False
+            finally:
+                close_old_connections()
+
+        def read():
+            client = Client()
+            try:
+                while time.perf_counter() < deadline:
+                    count("reads" if request(client.get, "/posts") else "failures")
+            finally:
+                connection.close()
+
+        def write(user, seed):
+            client = Client()
+            rng = random.Random(seed)
+            try:
+                client.force_login(user)
+                while time.perf_counter() < deadline:
+                    if rng.random() < 0.5:
+                        ok = request(client.post, "/posts", {"content": "benchmark post"})
+                    else:
+                        post_path = f"/posts/{rng.choice(post_ids)}/like"
+                        ok = request(client.put, post_path, {}) and request(client.delete, post_path, {})
+                    count("writes" if ok else "failures")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=read) for _ in range(options["readers"])]
+        threads += [
+            threading.Thread(target=write, args=(writers[i % len(writers)], i)) for i in range(options["writers"])
+        ]
+
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return elapsed, counts["reads"], counts["writes"], counts["failures"]
+
+    # Writes the throughput and failures of a run
+    def report(self, name, elapsed, reads, writes, failures):
+        self.stdout.write(
+            f"{name}: {reads / elapsed:.1f} reads/s, {writes / elapsed:.1f} writes/s, {failures} failed"
+        )
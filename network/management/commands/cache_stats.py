@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from network.cache import stats
+
+# Management command that reports the response cache's hit/miss counts
+class Command(BaseCommand):
+    help = "Reports the number of response cache hits and misses (requires a cache shared between processes)."
+
+    def handle(self, *args, **options):
+        counts = stats()
+        self.stdout.write(f"hits: {counts['hits']}, misses: {counts['misses']}, hit ratio: {counts['hit_ratio']:.2%}")
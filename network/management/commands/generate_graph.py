@@ -0,0 +1,126 @@
+import itertools
+import random
+from collections import defaultdict, deque
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from network.models import User, Post, Like, TimelineEntry
+from network.timeline import heavy_follower_threshold, timeline_depth
+
+Follow = User.followers.through
+
+# Number of rows inserted per INSERT
+BATCH_SIZE = 1000
+
+WORDS = ["hello", "world", "today", "network", "post", "great", "news", "coffee", "code", "music", "weekend", "photo"]
+
+# Management command that fills the database with a synthetic social graph for benchmarking.
+#
+# Users are ranked, and user i is picked as a followee, poster or liked poster with weight 1 / (i + 1) ^ alpha, so
+# followers, posts and likes follow a power law: a few accounts have most of the followers and likes, like on a real
+# network. The whole graph is built in memory from a seeded random generator and inserted in bulk, with the like,
+# follower and following counts and the following timelines filled in to match.
+class Command(BaseCommand):
+    help = "Generates users, posts, and a power-law follow and like graph between them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Number of users (default 1000)")
+        parser.add_argument("--posts", type=int, default=10000, help="Number of posts (default 10000)")
+        parser.add_argument(
+            "--follows", type=float, default=20, help="Average number of users each user follows (default 20)"
+        )
+        parser.add_argument("--likes", type=float, default=5, help="Average number of likes per post (default 5)")
+        parser.add_argument("--alpha", type=float, default=1.0, help="Exponent of the power law (default 1.0)")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator (default 0)")
+        parser.add_argument("--prefix", default="bench", help="Prefix of the generated usernames (default bench)")
+
+    def handle(self, *args, **options):
+        num_users, num_posts, prefix = options["users"], options["posts"], options["prefix"]
+        if num_users < 2:
+            raise CommandError("At least 2 users are needed.")
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f"Users prefixed with {prefix!r} already exist; pick another --prefix.")
+
+        rng = random.Random(options["seed"])
+        ranks = range(num_users)
+        weights = [1 / (rank + 1) ** options["alpha"] for rank in ranks]
+
+        # followees[i] is the set of users user i follows
+        followees = []
+        for user in ranks:
+            count = min(num_users - 1, int(rng.expovariate(1 / options["follows"])) + 1)
+            followees.append(set(rng.choices(ranks, weights, k=count)) - {user})
+
+        follower_counts = [0] * num_users
+        for user_followees in followees:
+            for followee in user_followees:
+                follower_counts[followee] += 1
+
+        # Posts, oldest first, by poster; likes as (liker, post index) pairs, mostly of the posts of popular users
+        posters = rng.choices(ranks, weights, k=num_posts)
+        post_weights = [weights[poster] for poster in posters]
+        num_likes = int(num_posts * options["likes"])
+        liked_posts = rng.choices(range(num_posts), post_weights, k=num_likes) if posters else []
+        likes = {(rng.randrange(num_users), post) for post in liked_posts}
+        like_counts = [0] * num_posts
+        for _, post in likes:
+            like_counts[post] += 1
+
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(
+                    username=f"{prefix}{user}", email=f"{prefix}{user}@example.com", password="!",
+                    follower_count=follower_counts[user], following_count=len(followees[user])
+                )
+                for user in ranks
+            ], batch_size=BATCH_SIZE)
+
+            Follow.objects.bulk_create([
+                Follow(from_user_id=users[followee].id, to_user_id=users[follower].id)
+                for follower in ranks for followee in followees[follower]
+            ], batch_size=BATCH_SIZE)
+
+            posts = Post.objects.bulk_create([
+                Post(poster=users[poster], content=" ".join(rng.choices(WORDS, k=8)), like_count=like_counts[post])
+                for post, poster in enumerate(posters)
+            ], batch_size=BATCH_SIZE)
+
+            Like.objects.bulk_create([
+                Like(liker=users[liker], post=posts[post]) for liker, post in likes
+            ], batch_size=BATCH_SIZE)
+
+            # Heavy accounts' posts are merged into the feeds instead of being in the timelines
+            heavy = [users[user].id for user in ranks if follower_counts[user] >= heavy_follower_threshold()]
+            if posts:
+                User.objects.filter(pk__in=heavy).update(merged_since=posts[0].timestamp)
+
+            entries = self.timeline_entries(users, posts, posters, followees, follower_counts)
+            num_entries = 0
+            while batch := list(itertools.islice(entries, BATCH_SIZE)):
+                TimelineEntry.objects.bulk_create(batch)
+                num_entries += len(batch)
+
+        self.stdout.write(
+            f"Generated {num_users} users, {num_posts} posts, {sum(follower_counts)} follows, {len(likes)} likes "
+            f"and {num_entries} timeline entries."
+        )
+
+    # Yields the timeline entries of the generated users: the newest timeline_depth() posts of the users they follow,
+    # leaving out heavy accounts, whose posts are merged in when the timelines are read
+    def timeline_entries(self, users, posts, posters, followees, follower_counts):
+        followers = defaultdict(list)
+        for follower, user_followees in enumerate(followees):
+            for followee in user_followees:
+                followers[followee].append(follower)
+
+        timelines = defaultdict(lambda: deque(maxlen=timeline_depth()))
+        threshold = heavy_follower_threshold()
+        for post, poster in enumerate(posters):
+            if follower_counts[poster] < threshold:
+                for follower in followers[poster]:
+                    timelines[follower].append(post)
+
+        for owner, timeline in timelines.items():
+            for post in timeline:
+                yield TimelineEntry(owner=users[owner], post=posts[post], timestamp=posts[post].timestamp)
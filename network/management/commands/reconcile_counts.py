@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from network.models import User, Post, Like
+
+Follow = User.followers.through
+
+# Returns an expression for the number of rows in queryset that reference the outer row through field
+def count_of(queryset, field):
+    counts = queryset.filter(**{field: OuterRef("pk")}).values(field).annotate(count=Count("pk")).values("count")
+    return Coalesce(Subquery(counts), 0)
+
+# Resets each stored counter that has drifted from the rows it counts to the actual count
+def reconcile(model, counter, actual):
+    drifted = model.objects.annotate(actual=actual).exclude(**{counter: F("actual")})
+    return drifted.update(**{counter: actual})
+
+# Management command that recomputes the denormalized like, follower and following counts
+class Command(BaseCommand):
+    help = "Recomputes Post.like_count, User.follower_count and User.following_count from the rows they count."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            likes = reconcile(Post, "like_count", count_of(Like.objects.all(), "post"))
+            followers = reconcile(User, "follower_count", count_of(Follow.objects.all(), "from_user"))
+            following = reconcile(User, "following_count", count_of(Follow.objects.all(), "to_user"))
+
+        self.stdout.write(f"Fixed {likes} like counts, {followers} follower counts and {following} following counts.")
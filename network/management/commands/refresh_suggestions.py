@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from network.models import User
+from network.suggestions import refresh_suggestions
+
+# Management command that recomputes the "who to follow" suggestions (see network/suggestions.py), meant to be run
+# periodically, e.g. from cron. By default only the users whose follows or likes changed since their last refresh are
+# recomputed.
+class Command(BaseCommand):
+    help = "Recomputes the follow suggestions of the users whose follows or likes changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Recompute every user's suggestions, picking up changes to the follows of the users they follow"
+        )
+
+    def handle(self, *args, **options):
+        user_ids = User.objects.values_list("id", flat=True) if options["all"] else None
+        refreshed = refresh_suggestions(user_ids)
+        self.stdout.write(f"Refreshed the suggestions of {refreshed} users.")
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from network.tasks import claim_tasks, run_claimed_task
+
+# Management command that runs the tasks queued by the "database" task backend (see network/tasks.py). Any number of
+# workers can run at once, on any machine that reaches the database; each claims a batch of due tasks at a time.
+class Command(BaseCommand):
+    help = "Runs the background tasks queued in the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit once no task is due instead of waiting for more")
+        parser.add_argument("--batch-size", type=int, default=10, help="Number of tasks claimed at a time (default 10)")
+        parser.add_argument(
+            "--poll-seconds", type=float, default=1, help="Seconds to wait when no task is due (default 1)"
+        )
+
+    def handle(self, *args, **options):
+        succeeded = failed = 0
+        while True:
+            tasks = claim_tasks(options["batch_size"])
+            if not tasks:
+                if options["once"]:
+                    break
+                # Drop connections that have broken or outlived CONN_MAX_AGE while idle
+                close_old_connections()
+                time.sleep(options["poll_seconds"])
+                continue
+
+            for task in tasks:
+                if run_claimed_task(task):
+                    succeeded += 1
+                else:
+                    failed += 1
+
+        self.stdout.write(f"Ran {succeeded + failed} tasks: {succeeded} succeeded, {failed} failed.")
@@ -0,0 +1,31 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from network.routers import PRIMARY, replica_aliases
+
+# Management command that copies the primary database onto the read replicas of NETWORK_READ_REPLICAS, for SQLite files
+# standing in for replicas locally (see project4/replica_settings.py). Real replicas are kept up to date by their
+# database's own replication.
+class Command(BaseCommand):
+    help = "Copies the primary SQLite database onto the local read replicas."
+
+    def handle(self, *args, **options):
+        replicas = replica_aliases()
+        if not replicas:
+            raise CommandError("No read replicas are configured (NETWORK_READ_REPLICAS).")
+
+        primary = connections[PRIMARY]
+        if primary.vendor != "sqlite" or any(connections[alias].vendor != "sqlite" for alias in replicas):
+            raise CommandError("sync_replica only copies SQLite databases.")
+
+        primary.ensure_connection()
+        for alias in replicas:
+            connections[alias].close()
+            replica = sqlite3.connect(connections[alias].settings_dict["NAME"])
+            try:
+                primary.connection.backup(replica)
+            finally:
+                replica.close()
+            self.stdout.write(f"Copied {PRIMARY} to {alias}.")
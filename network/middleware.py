@@ -0,0 +1,90 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .instrumentation import RequestMetrics, current_metrics, histograms, sample_rate
+from .querylog import inspect_queries, repeated_query_threshold
+
+# Middleware that measures a sample of the requests (NETWORK_PERFORMANCE_SAMPLE_RATE): wall time, number and time of
+# queries, response size and the spans timed with instrumentation.timer() (e.g. serialization). The measurements are
+# sent back in a Server-Timing header and added to the histograms of the request's route (its URL name), served by
+# GET /metrics/performance. Requests that are not sampled cost a single random number.
+#
+# It runs in the mode of the handler, so under ASGI the async views and their streamed responses stay async.
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= sample_rate():
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.record(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if random.random() >= sample_rate():
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.record(request, response, metrics, time.perf_counter() - started)
+
+    # Adds the measurements of a request that took wall seconds to its route's histograms and its response's headers
+    def record(self, request, response, metrics, wall):
+        # The size of a streamed response is not known until it has been sent
+        size = 0 if response.streaming else len(response.content)
+        route = request.resolver_match.url_name if request.resolver_match else None
+        histograms.record(route or "unresolved", wall, metrics, size)
+
+        timings = [f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries"']
+        timings += [f"{name};dur={seconds * 1000:.2f}" for name, seconds in metrics.spans.items()]
+        timings.append(f"total;dur={wall * 1000:.2f}")
+        response["Server-Timing"] = ", ".join(timings)
+        return response
+
+# Middleware that counts the queries of each request by shape, logging those run NETWORK_REPEATED_QUERY_THRESHOLD
+# times or more in one request as likely N+1 queries (see querylog.py)
+class QueryInspectionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if repeated_query_threshold() is None:
+            return self.get_response(request)
+
+        with inspect_queries(f"{request.method} {request.path}"):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if repeated_query_threshold() is None:
+            return await self.get_response(request)
+
+        with inspect_queries(f"{request.method} {request.path}"):
+            return await self.get_response(request)
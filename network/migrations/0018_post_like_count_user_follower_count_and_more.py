@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(queryset, field):
+    counts = queryset.filter(**{field: OuterRef("pk")}).values(field).annotate(count=Count("pk")).values("count")
+    return Coalesce(Subquery(counts), 0)
+
+
+def backfill_counts(apps, schema_editor):
+    User = apps.get_model("network", "User")
+    Post = apps.get_model("network", "Post")
+    Like = apps.get_model("network", "Like")
+    Follow = User.followers.through
+
+    Post.objects.update(like_count=count_of(Like.objects.all(), "post"))
+    User.objects.update(
+        follower_count=count_of(Follow.objects.all(), "from_user"),
+        following_count=count_of(Follow.objects.all(), "to_user"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0017_auto_20210731_0054'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='first_name',
+            field=models.CharField(blank=True, max_length=150, verbose_name='first name'),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_timelines(apps, schema_editor):
+    User = apps.get_model("network", "User")
+    Post = apps.get_model("network", "Post")
+    TimelineEntry = apps.get_model("network", "TimelineEntry")
+    Follow = User.followers.through
+
+    depth = getattr(settings, "NETWORK_TIMELINE_DEPTH", 800)
+    threshold = getattr(settings, "NETWORK_TIMELINE_HEAVY_FOLLOWER_THRESHOLD", 10000)
+
+    # A follow row (from_user=followee, to_user=follower) means follower follows followee
+    for follow in Follow.objects.filter(from_user__follower_count__lt=threshold).iterator():
+        post_ids = Post.objects.filter(poster_id=follow.from_user_id).order_by("-id").values_list("id", flat=True)[:depth]
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(owner_id=follow.to_user_id, post_id=post_id) for post_id in post_ids], ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0018_post_like_count_user_follower_count_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='network.post')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('owner', 'post'), name='unique_timeline_entry')],
+            },
+        ),
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:02
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_post_timestamps(apps, schema_editor):
+    Post = apps.get_model("network", "Post")
+    TimelineEntry = apps.get_model("network", "TimelineEntry")
+
+    TimelineEntry.objects.update(
+        timestamp=Subquery(Post.objects.filter(id=OuterRef("post_id")).values("timestamp"))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0019_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timelineentry',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_post_timestamps, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['post', 'liker'], name='like_post_liker_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['timestamp', 'id'], name='post_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['poster', 'timestamp', 'id'], name='post_poster_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['owner', 'timestamp', 'post'], name='timeline_owner_timestamp_idx'),
+        ),
+        # The following list of a user is read from the auto-created through table by to_user_id, which only has a
+        # single-column index; make it covering so the followee ids come from the index
+        migrations.RunSQL(
+            'CREATE INDEX "user_followers_to_from_idx" ON "network_user_followers" ("to_user_id", "from_user_id")',
+            'DROP INDEX "user_followers_to_from_idx"',
+        ),
+    ]
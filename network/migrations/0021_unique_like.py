@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:06
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_likes(apps, schema_editor):
+    Post = apps.get_model("network", "Post")
+    Like = apps.get_model("network", "Like")
+
+    duplicates = Like.objects.values("liker", "post").annotate(keep=Min("id"), count=Count("id")).filter(count__gt=1)
+    for duplicate in duplicates:
+        Like.objects.filter(liker=duplicate["liker"], post=duplicate["post"]).exclude(id=duplicate["keep"]).delete()
+
+    # Duplicates inflated like counts, so recount them
+    counts = Like.objects.filter(post=OuterRef("pk")).values("post").annotate(count=Count("pk")).values("count")
+    Post.objects.update(like_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0020_add_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='like',
+            constraint=models.UniqueConstraint(fields=('liker', 'post'), name='unique_like'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+# Full-text index of post contents (see network/search.py): an SQLite FTS5 table over network_post, kept in sync by
+# triggers so every insert, content edit and delete is indexed, whichever code path makes it
+CREATE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE network_post_fts USING fts5(
+        content, content='network_post', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER network_post_fts_insert AFTER INSERT ON network_post BEGIN
+        INSERT INTO network_post_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER network_post_fts_delete AFTER DELETE ON network_post BEGIN
+        INSERT INTO network_post_fts (network_post_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER network_post_fts_update AFTER UPDATE OF content ON network_post BEGIN
+        INSERT INTO network_post_fts (network_post_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO network_post_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    # Index the existing posts
+    "INSERT INTO network_post_fts (network_post_fts) VALUES ('rebuild')",
+]
+
+DROP_INDEX = [
+    "DROP TRIGGER network_post_fts_update",
+    "DROP TRIGGER network_post_fts_delete",
+    "DROP TRIGGER network_post_fts_insert",
+    "DROP TABLE network_post_fts",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # FTS5 is SQLite-specific; search is not available on other databases
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0021_unique_like'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_INDEX), run(DROP_INDEX)),
+    ]
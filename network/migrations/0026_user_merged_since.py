@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:24
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min, OuterRef, Subquery
+
+
+def set_merged_since(apps, schema_editor):
+    User = apps.get_model("network", "User")
+    Post = apps.get_model("network", "Post")
+
+    # Heavy accounts' posts were never fanned out, so all of them are merged
+    threshold = getattr(settings, "NETWORK_TIMELINE_HEAVY_FOLLOWER_THRESHOLD", 10000)
+    first_post = Post.objects.filter(poster=OuterRef("pk")).values("poster").annotate(first=Min("timestamp"))
+    User.objects.filter(follower_count__gte=threshold).update(merged_since=Subquery(first_post.values("first")))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0025_suggestion_refresh'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='merged_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(set_merged_since, migrations.RunPython.noop),
+    ]
@@ -1,35 +1,222 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
 
 # Represents data for a User in the User table of the database
 class User(AbstractUser):
     followers = models.ManyToManyField("self", symmetrical=False, related_name="following")
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Time of the first post the user made with too many followers to fan it out; their posts since then are merged into
+    # their followers' feeds when read (see timeline.py)
+    merged_since = models.DateTimeField(null=True, blank=True)
+    # Whether the user's follows have changed since their follow suggestions were computed (their new likes are found
+    # from the Like ids, see suggestions.py)
+    suggestions_stale = models.BooleanField(default=True)
 
     def serialize(self):
         return {
             "username": self.username,
             "email": self.email,
-            "followers": [follower.username for follower in self.followers.all()],
-            "following": [followee.username for followee in self.following.all()]
+            "follower_count": self.follower_count,
+            "following_count": self.following_count
         }
 
+    # Makes the user follow followee and updates both users' counts. Returns False if the user already follows followee.
+    def follow(self, followee):
+        try:
+            with transaction.atomic():
+                User.followers.through.objects.create(from_user=followee, to_user=self)
+                User.objects.filter(pk=self.pk).update(following_count=F("following_count") + 1, suggestions_stale=True)
+                User.objects.filter(pk=followee.pk).update(follower_count=F("follower_count") + 1)
+        except IntegrityError:
+            return False
+
+        return True
+
+    # Makes the user unfollow followee and updates both users' counts (never below zero, in case they have drifted).
+    # Returns False if the user did not follow followee.
+    def unfollow(self, followee):
+        with transaction.atomic():
+            deleted, _ = User.followers.through.objects.filter(from_user=followee, to_user=self).delete()
+            if deleted:
+                User.objects.filter(pk=self.pk).update(
+                    following_count=Greatest(F("following_count") - 1, 0), suggestions_stale=True
+                )
+                User.objects.filter(pk=followee.pk, follower_count__gt=0).update(follower_count=F("follower_count") - 1)
+
+        return deleted > 0
+
+    # Makes the user follow each of followees that they do not already follow, with one insert and one update per
+    # counter however many there are. Returns the ids of the users newly followed.
+    def follow_many(self, followees):
+        Follow = User.followers.through
+        with transaction.atomic():
+            ids = {followee.id for followee in followees}
+            ids -= set(Follow.objects.filter(from_user_id__in=ids, to_user=self).values_list("from_user_id", flat=True))
+            if ids:
+                Follow.objects.bulk_create([Follow(from_user_id=id, to_user=self) for id in ids], ignore_conflicts=True)
+                User.objects.filter(pk=self.pk).update(
+                    following_count=F("following_count") + len(ids), suggestions_stale=True
+                )
+                User.objects.filter(pk__in=ids).update(follower_count=F("follower_count") + 1)
+
+        return ids
+
+    # Makes the user unfollow each of followees that they follow, with one delete and one update per counter however
+    # many there are (counts never go below zero). Returns the ids of the users unfollowed.
+    def unfollow_many(self, followees):
+        follows = User.followers.through.objects.filter(from_user__in=followees, to_user=self)
+        with transaction.atomic():
+            ids = set(follows.values_list("from_user_id", flat=True))
+            if ids:
+                follows.filter(from_user_id__in=ids).delete()
+                User.objects.filter(pk=self.pk).update(
+                    following_count=Greatest(F("following_count") - len(ids), 0), suggestions_stale=True
+                )
+                User.objects.filter(pk__in=ids, follower_count__gt=0).update(follower_count=F("follower_count") - 1)
+
+        return ids
+
+# Queries for Posts
+class PostQuerySet(models.QuerySet):
+    # Fetches the posters of the posts along with the posts so that serializing any number of them takes a single query
+    # instead of one per post
+    def serializable(self):
+        return self.select_related("poster")
+
 # Represents data for a Post in the Post table of the database
 class Post(models.Model):
     poster = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts")
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now=True)
+    like_count = models.PositiveIntegerField(default=0)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Feeds are sorted by (timestamp, id), optionally for one poster
+            models.Index(fields=["timestamp", "id"], name="post_timestamp_idx"),
+            models.Index(fields=["poster", "timestamp", "id"], name="post_poster_timestamp_idx"),
+        ]
 
     def serialize(self):
         return {
             "id": self.id,
             "poster": self.poster.username,
             "content": self.content,
-            "likes": self.likes.all().count(),
-            "likers": [like.liker.username for like in self.likes.all()],
+            "likes": self.like_count,
             "timestamp": self.timestamp.strftime("%b %d %Y, %I:%M %p"),
         }
 
+    # Adds a like from liker to the post and updates the post's like count. Returns False if liker already liked the post.
+    # The unique constraint on Like decides which of several concurrent likes wins, so this takes a single INSERT.
+    def like(self, liker):
+        try:
+            with transaction.atomic():
+                Like.objects.create(post=self, liker=liker)
+                Post.objects.filter(pk=self.pk).update(like_count=F("like_count") + 1)
+        except IntegrityError:
+            return False
+
+        return True
+
+    # Removes liker's like from the post and updates the post's like count (never below zero, in case it has drifted).
+    # Returns False if liker did not like the post.
+    def unlike(self, liker):
+        with transaction.atomic():
+            deleted, _ = Like.objects.filter(post=self, liker=liker).delete()
+            if deleted:
+                Post.objects.filter(pk=self.pk, like_count__gt=0).update(like_count=F("like_count") - 1)
+
+        return deleted > 0
+
+# Queries for Likes
+class LikeQuerySet(models.QuerySet):
+    # Returns the set of the ids among post_ids of the posts that user has liked, using a single query (none for an
+    # anonymous user)
+    def liked_post_ids(self, user, post_ids):
+        if not user.is_authenticated:
+            return set()
+
+        return set(self.filter(liker=user, post_id__in=post_ids).values_list("post_id", flat=True))
+
+    # Async version of liked_post_ids, using the async ORM
+    async def aliked_post_ids(self, user, post_ids):
+        if not user.is_authenticated:
+            return set()
+
+        post_ids = self.filter(liker=user, post_id__in=post_ids).values_list("post_id", flat=True)
+        return {post_id async for post_id in post_ids}
+
 # Represents data for a Like in the Like table of the database
 class Like(models.Model):
     liker = models.ForeignKey(User, on_delete=models.CASCADE, related_name="likes")
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="likes")
+
+    objects = LikeQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["liker", "post"], name="unique_like")
+        ]
+        indexes = [
+            # Likes are looked up by (post, liker)
+            models.Index(fields=["post", "liker"], name="like_post_liker_idx"),
+        ]
+
+# Represents a post in a user's precomputed following timeline in the TimelineEntry table of the database
+class TimelineEntry(models.Model):
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="timeline_entries")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="timeline_entries")
+    # Copy of post.timestamp so a timeline can be read in order from an index without joining Post
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "post"], name="unique_timeline_entry")
+        ]
+        indexes = [
+            models.Index(fields=["owner", "timestamp", "post"], name="timeline_owner_timestamp_idx"),
+        ]
+
+# Represents a precomputed follow suggestion for a user in the Suggestion table of the database (see suggestions.py)
+class Suggestion(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="suggestions")
+    suggested = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    # Position of the suggestion among the user's, best first
+    rank = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "rank"], name="unique_suggestion_rank")
+        ]
+
+# Represents the progress of the refresh of stale follow suggestions in the SuggestionRefresh table of the database (one
+# row, see suggestions.py)
+class SuggestionRefresh(models.Model):
+    # Id of the newest like taken into account by the last refresh
+    last_like_id = models.PositiveBigIntegerField(default=0)
+
+# Represents a queued background task in the Task table of the database (see network/tasks.py)
+class Task(models.Model):
+    # Dotted path of the task function, and the arguments it is called with
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    # When the task is next due; pushed back while a worker runs it and after it fails
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    # Whether the task has failed max_attempts() times and is no longer tried
+    failed = models.BooleanField(default=False)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the due tasks that have not failed, in order
+            models.Index(fields=["failed", "run_at"], name="task_due_idx"),
+        ]
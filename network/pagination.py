@@ -0,0 +1,179 @@
+import datetime
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Largest row id a database stores (SQLite's and most others' integer columns are signed 64-bit)
+MAX_ID = 2 ** 63 - 1
+
+# Raised when the cursor, direction or limit query parameters of a request are malformed
+class InvalidPageRequest(ValueError):
+    pass
+
+# Encodes a (timestamp, id) position as a cursor string of the form "<microseconds since epoch>,<id>"
+def encode_cursor(timestamp, id):
+    microseconds = (timestamp - EPOCH) // datetime.timedelta(microseconds=1)
+    return f"{microseconds},{id}"
+
+# Returns the id of a cursor, rejecting ids the database could not store (they would fail the query instead of
+# matching nothing)
+def check_cursor_id(id):
+    if not -MAX_ID <= id <= MAX_ID:
+        raise InvalidPageRequest("Invalid cursor.")
+    return id
+
+# Decodes a cursor string into a (timestamp, id) tuple
+def decode_cursor(cursor):
+    try:
+        microseconds, id = cursor.split(",")
+        timestamp, id = EPOCH + datetime.timedelta(microseconds=int(microseconds)), int(id)
+    except (ValueError, OverflowError):
+        raise InvalidPageRequest("Invalid cursor.")
+
+    return timestamp, check_cursor_id(id)
+
+# Parses the limit query parameter, defaulting to DEFAULT_PAGE_SIZE and capping at MAX_PAGE_SIZE
+def parse_limit(limit):
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise InvalidPageRequest("Invalid limit.")
+
+    if limit < 1:
+        raise InvalidPageRequest("Invalid limit.")
+
+    return min(limit, MAX_PAGE_SIZE)
+
+# Decodes a cursor string that is a row id
+def decode_id_cursor(cursor):
+    try:
+        id = int(cursor)
+    except ValueError:
+        raise InvalidPageRequest("Invalid cursor.")
+
+    return check_cursor_id(id)
+
+# Parses the cursor, direction and limit query parameters of a request, decoding the cursor with decode
+def parse_page_request(params, decode=decode_cursor):
+    cursor = params.get("cursor")
+    direction = params.get("direction", "next")
+
+    if direction not in ("next", "prev"):
+        raise InvalidPageRequest("Invalid direction.")
+
+    return (decode(cursor) if cursor is not None else None), direction, parse_limit(params.get("limit"))
+
+# Returns the filter and ordering that seek to the rows after a cursor, where rows are positioned by the fields
+# timestamp_field and id_field:
+#   - no cursor: all rows, newest first
+#   - direction "next": the rows older than the cursor, newest first
+#   - direction "prev": the rows newer than the cursor, oldest first
+def seek(cursor, direction, timestamp_field="timestamp", id_field="id"):
+    if cursor is None:
+        return Q(), [f"-{timestamp_field}", f"-{id_field}"]
+
+    timestamp, id = cursor
+    if direction == "next":
+        older = Q(**{f"{timestamp_field}__lt": timestamp}) | Q(**{timestamp_field: timestamp, f"{id_field}__lt": id})
+        return older, [f"-{timestamp_field}", f"-{id_field}"]
+    else:
+        newer = Q(**{f"{timestamp_field}__gt": timestamp}) | Q(**{timestamp_field: timestamp, f"{id_field}__gt": id})
+        return newer, [timestamp_field, id_field]
+
+# Builds a page out of up to limit + 1 rows fetched in seek order, with the rows under key. encode(row) returns the
+# cursor of a row.
+def build_page(rows, cursor, direction, limit, encode, key="posts"):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if direction == "prev" and cursor is not None:
+        rows = rows[::-1]
+        has_newer, has_older = has_more, True
+    else:
+        has_newer, has_older = cursor is not None, has_more
+
+    return {
+        key: rows,
+        "next_cursor": encode(rows[-1]) if rows and has_older else None,
+        "prev_cursor": encode(rows[0]) if rows and has_newer else None,
+    }
+
+# Returns one page of posts from a queryset in reverse chronological order, along with the cursors of the pages
+# before and after it.
+#
+# Pages are found with a keyset (seek) on (timestamp, id) instead of an offset so the cost of fetching a page does not
+# depend on how far back it is:
+#   - no cursor: the newest page
+#   - cursor + direction "next": the page of posts older than the cursor
+#   - cursor + direction "prev": the page of posts newer than the cursor
+def paginate_posts(queryset, params):
+    cursor, direction, limit = parse_page_request(params)
+    condition, ordering = seek(cursor, direction)
+    rows = list(queryset.filter(condition).order_by(*ordering)[:limit + 1])
+    return build_page(rows, cursor, direction, limit, lambda post: encode_cursor(post.timestamp, post.id))
+
+# Like paginate_posts, but for posts that come from several sources, each a queryset of rows that position a post by
+# (timestamp_field, post_id_field). A page of positions is fetched from each source with its own index, the pages are
+# merged, and the posts in the merged page are fetched from queryset.
+def paginate_merged_posts(sources, queryset, params):
+    cursor, direction, limit = parse_page_request(params)
+
+    positions = set()
+    for source, timestamp_field, post_id_field in sources:
+        condition, ordering = seek(cursor, direction, timestamp_field, post_id_field)
+        positions.update(source.filter(condition).order_by(*ordering).values_list(timestamp_field, post_id_field)[:limit + 1])
+
+    positions = sorted(positions, reverse=(cursor is None or direction == "next"))[:limit + 1]
+    page = build_page(positions, cursor, direction, limit, lambda position: encode_cursor(*position))
+
+    posts = queryset.in_bulk([id for _, id in page["posts"]])
+    page["posts"] = [posts[id] for _, id in page["posts"] if id in posts]
+    return page
+
+# Returns one page of values of field from a queryset, newest row first by id, along with the cursors (row ids) of the
+# pages before and after it, with the values under key
+def paginate_by_id(queryset, params, field, key):
+    cursor, direction, limit = parse_page_request(params, decode_id_cursor)
+
+    if cursor is None:
+        queryset = queryset.order_by("-id")
+    elif direction == "next":
+        queryset = queryset.filter(id__lt=cursor).order_by("-id")
+    else:
+        queryset = queryset.filter(id__gt=cursor).order_by("id")
+
+    rows = list(queryset.values_list("id", field)[:limit + 1])
+    page = build_page(rows, cursor, direction, limit, lambda row: str(row[0]), key)
+    page[key] = [value for _, value in page[key]]
+    return page
+
+# Async version of paginate_posts, using the async ORM
+async def apaginate_posts(queryset, params):
+    cursor, direction, limit = parse_page_request(params)
+    condition, ordering = seek(cursor, direction)
+    rows = [post async for post in queryset.filter(condition).order_by(*ordering)[:limit + 1]]
+    return build_page(rows, cursor, direction, limit, lambda post: encode_cursor(post.timestamp, post.id))
+
+# Async version of paginate_merged_posts, using the async ORM
+async def apaginate_merged_posts(sources, queryset, params):
+    cursor, direction, limit = parse_page_request(params)
+
+    positions = set()
+    for source, timestamp_field, post_id_field in sources:
+        condition, ordering = seek(cursor, direction, timestamp_field, post_id_field)
+        rows = source.filter(condition).order_by(*ordering).values_list(timestamp_field, post_id_field)[:limit + 1]
+        positions.update([position async for position in rows])
+
+    positions = sorted(positions, reverse=(cursor is None or direction == "next"))[:limit + 1]
+    page = build_page(positions, cursor, direction, limit, lambda position: encode_cursor(*position))
+
+    posts = await queryset.ain_bulk([id for _, id in page["posts"]])
+    page["posts"] = [posts[id] for _, id in page["posts"] if id in posts]
+    return page
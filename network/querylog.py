@@ -0,0 +1,130 @@
+import contextvars
+import logging
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+# Slow query log and repeated query (N+1) detector.
+#
+# inspect_query is installed on every database connection (see apps.py). It logs the queries slower than
+# NETWORK_SLOW_QUERY_MS with the line of project code that made them. Within inspect_queries() (every request, see
+# middleware.QueryInspectionMiddleware) it also counts the queries of each shape, and logs a shape run
+# NETWORK_REPEATED_QUERY_THRESHOLD times: the same query run once per row of an earlier query is the N+1 signature.
+# Tests can use query_budget() to fail when a block runs too many queries or repeats one too often.
+
+logger = logging.getLogger("network.queries")
+
+PROJECT_DIR = str(Path(__file__).resolve().parent.parent)
+
+# Lists of placeholders (e.g. of an IN clause) and numbers, which vary between queries of the same shape
+PLACEHOLDER_LIST = re.compile(r"%s(?:\s*,\s*%s)+")
+NUMBER = re.compile(r"\b\d+\b")
+
+# Returns the number of milliseconds above which a query is logged as slow, or None if slow queries are not logged
+def slow_query_ms():
+    return getattr(settings, "NETWORK_SLOW_QUERY_MS", None)
+
+# Returns the number of times a query shape is run in one request before it is logged, or None if it never is
+def repeated_query_threshold():
+    return getattr(settings, "NETWORK_REPEATED_QUERY_THRESHOLD", None)
+
+# Returns the shape of a query: its SQL with the numbers and lists of placeholders collapsed
+def query_shape(sql):
+    return NUMBER.sub("N", PLACEHOLDER_LIST.sub("%s...", sql))
+
+# Returns "file:line in function" for the frame of project code that called into the ORM to make the current query
+def query_origin():
+    origin = None
+    for frame in traceback.extract_stack():
+        if "/django/db/" in frame.filename:
+            break
+        if frame.filename.startswith(PROJECT_DIR) and "-packages" not in frame.filename:
+            origin = frame
+    if origin is None:
+        return "unknown"
+    return f"{Path(origin.filename).relative_to(PROJECT_DIR)}:{origin.lineno} in {origin.name}"
+
+# The queries run within one inspect_queries() block, which also counts towards the enclosing block's (parent)
+class QueryInspection:
+    def __init__(self, label, threshold, parent=None):
+        self.label = label
+        self.threshold = threshold
+        self.parent = parent
+        self.queries = 0
+        self.shapes = Counter()
+        # Origin of each shape that reached the threshold
+        self.repeated = {}
+
+    def record(self, sql):
+        if self.parent is not None:
+            self.parent.record(sql)
+
+        self.queries += 1
+        shape = query_shape(sql)
+        self.shapes[shape] += 1
+        if self.threshold is not None and self.shapes[shape] == self.threshold and shape not in self.repeated:
+            self.repeated[shape] = query_origin()
+            logger.warning(
+                "Query repeated %d times in %s (likely N+1) at %s: %s",
+                self.threshold, self.label, self.repeated[shape], shape
+            )
+
+# The inspection of the block being run, or None outside inspect_queries()
+current_inspection = contextvars.ContextVar("network_query_inspection", default=None)
+
+# Counts the queries run within the block, by shape, logging those repeated threshold times (by default
+# NETWORK_REPEATED_QUERY_THRESHOLD). Yields the QueryInspection.
+@contextmanager
+def inspect_queries(label, threshold=None):
+    threshold = threshold if threshold is not None else repeated_query_threshold()
+    inspection = QueryInspection(label, threshold, current_inspection.get())
+    token = current_inspection.set(inspection)
+    try:
+        yield inspection
+    finally:
+        current_inspection.reset(token)
+
+# Raised by query_budget() when a block goes over its budget
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+# Fails with QueryBudgetExceeded if the block runs more than queries queries in total or runs a query shape repeats
+# times or more
+@contextmanager
+def query_budget(queries=None, repeats=None, label="query budget"):
+    with inspect_queries(label, repeats) as inspection:
+        yield inspection
+
+    if queries is not None and inspection.queries > queries:
+        raise QueryBudgetExceeded(f"{label} ran {inspection.queries} queries, more than its budget of {queries}")
+    if repeats is not None and inspection.repeated:
+        details = "\n".join(f"{origin}: {shape}" for shape, origin in inspection.repeated.items())
+        raise QueryBudgetExceeded(f"{label} ran queries {repeats} times or more:\n{details}")
+
+# Database execute wrapper that logs slow queries and feeds the current inspection
+def inspect_query(execute, sql, params, many, context):
+    inspection = current_inspection.get()
+    if inspection is not None:
+        inspection.record(sql)
+
+    threshold = slow_query_ms()
+    if threshold is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        if elapsed >= threshold:
+            logger.warning("Slow query (%.1f ms) at %s: %s", elapsed, query_origin(), sql)
+
+# connection_created receiver that installs inspect_query on a new connection
+def install_query_inspector(sender, connection, **kwargs):
+    if inspect_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(inspect_query)
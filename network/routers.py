@@ -0,0 +1,95 @@
+import contextvars
+import random
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+# Read replica routing.
+#
+# The GET requests of the views decorated with replica_reads read the network app's tables from a random database of
+# NETWORK_READ_REPLICAS; everything else (writes, other requests, sessions) uses the primary ("default") database.
+# Replicas lag behind the primary, so a request that writes sets a cookie that keeps the client's reads on the primary
+# for NETWORK_REPLICA_STICKY_SECONDS, letting users see their own posts, likes and follows straight away.
+
+PRIMARY = "default"
+
+# Cookie holding the time (in seconds since the epoch) until which the client reads from the primary
+PRIMARY_COOKIE = "network_primary_until"
+
+# Returns the aliases of the read replica databases
+def replica_aliases():
+    return getattr(settings, "NETWORK_READ_REPLICAS", [])
+
+# Returns the number of seconds a client reads from the primary after writing
+def sticky_seconds():
+    return getattr(settings, "NETWORK_REPLICA_STICKY_SECONDS", 5)
+
+# Whether the request being handled may read from a replica
+reading_from_replica = contextvars.ContextVar("network_reading_from_replica", default=False)
+
+# Database router that sends the reads allowed by replica_reads to the replicas and all writes to the primary
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if replicas and reading_from_replica.get() and model._meta.app_label == "network":
+            return random.choice(replicas)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    # Rows of the primary and its replicas are the same rows
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    # Replicas get their schema from the primary
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
+
+# Returns whether a request's client wrote recently enough to read from the primary
+def pinned_to_primary(request):
+    try:
+        return float(request.COOKIES.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+# Keeps the client of a response to a successful write reading from the primary for the next sticky_seconds()
+def pin_to_primary(response):
+    if replica_aliases() and response.status_code < 400:
+        seconds = sticky_seconds()
+        response.set_cookie(PRIMARY_COOKIE, f"{time.time() + seconds:.3f}", max_age=seconds, samesite="Lax")
+    return response
+
+# View decorator: GET and HEAD requests read from the replicas, unless their client wrote recently; other requests
+# write to the primary and pin their client to it
+def replica_reads(view):
+    def reads_from_replica(request):
+        return request.method in ("GET", "HEAD") and not pinned_to_primary(request)
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            token = reading_from_replica.set(reads_from_replica(request))
+            try:
+                response = await view(request, *args, **kwargs)
+            finally:
+                reading_from_replica.reset(token)
+            return response if request.method in ("GET", "HEAD") else pin_to_primary(response)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            token = reading_from_replica.set(reads_from_replica(request))
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                reading_from_replica.reset(token)
+            return response if request.method in ("GET", "HEAD") else pin_to_primary(response)
+
+    return wrapper
@@ -0,0 +1,81 @@
+import re
+
+from django.db import connections, router
+
+from .models import Post
+from .pagination import InvalidPageRequest, build_page, check_cursor_id, parse_page_request
+
+# Full-text search over post contents.
+#
+# Posts are indexed in the SQLite FTS5 table network_post_fts (see migration 0022), an inverted index kept in sync with
+# network_post by triggers. Matches are found with one lookup of the index per word, ranked by BM25 (FTS5's rank: lower
+# is better) and paged with a keyset on (rank, id). Ranks depend on the whole index, so a cursor may skip or repeat a
+# match when posts are created between pages.
+#
+# Rank is computed per query, not stored, so every page computes the rank of every match and sorts them. This is the
+# one query the API makes that sorts without an index (see QueryPlanTest). Ordering by rank alone would let FTS5 do the
+# sort itself, but that costs the same, and FTS5 leaves matches of equal rank in no documented order, which a keyset
+# needs. Ordering by (rank, rowid) costs the same and is exact.
+
+WORD = re.compile(r"\w+")
+
+# Returns whether full-text search is available on the database posts are read from
+def search_available():
+    return connections[router.db_for_read(Post)].vendor == "sqlite"
+
+# Returns the FTS5 query matching posts that contain every word of text (a word that ends text also matches as a
+# prefix), or None if text has no words. Words are quoted so FTS5 operators in text are searched for, not applied.
+def match_expression(text):
+    words = WORD.findall(text)
+    if not words:
+        return None
+
+    terms = [f'"{word}"' for word in words]
+    if text.rstrip()[-1:].isalnum():
+        terms[-1] += "*"
+    return " ".join(terms)
+
+# Encodes a (rank, id) position as a cursor string of the form "<rank>,<id>"
+def encode_search_cursor(rank, id):
+    return f"{rank!r},{id}"
+
+# Decodes a search cursor string into a (rank, id) tuple. Ids the database could not store are rejected, since the
+# cursor goes into raw SQL.
+def decode_search_cursor(cursor):
+    try:
+        rank, id = cursor.rsplit(",", 1)
+        rank, id = float(rank), int(id)
+    except ValueError:
+        raise InvalidPageRequest("Invalid cursor.")
+
+    return rank, check_cursor_id(id)
+
+# Returns one page of the posts matching the FTS5 query expression, best match first, along with the cursors of the
+# pages before and after it:
+#   - no cursor: the best matches
+#   - cursor + direction "next": the page of worse matches than the cursor
+#   - cursor + direction "prev": the page of better matches than the cursor
+def search_posts(expression, params):
+    cursor, direction, limit = parse_page_request(params, decode_search_cursor)
+
+    sql = "SELECT rank, rowid FROM network_post_fts WHERE network_post_fts MATCH %s"
+    args = [expression]
+    if cursor is None:
+        sql += " ORDER BY rank, rowid DESC"
+    elif direction == "next":
+        sql += " AND (rank > %s OR (rank = %s AND rowid < %s)) ORDER BY rank, rowid DESC"
+        args += [cursor[0], cursor[0], cursor[1]]
+    else:
+        sql += " AND (rank < %s OR (rank = %s AND rowid > %s)) ORDER BY rank DESC, rowid"
+        args += [cursor[0], cursor[0], cursor[1]]
+    sql += " LIMIT %s"
+    args.append(limit + 1)
+
+    with connections[router.db_for_read(Post)].cursor() as db:
+        db.execute(sql, args)
+        positions = db.fetchall()
+
+    page = build_page(positions, cursor, direction, limit, lambda position: encode_search_cursor(*position))
+    posts = Post.objects.serializable().in_bulk([id for _, id in page["posts"]])
+    page["posts"] = [posts[id] for _, id in page["posts"] if id in posts]
+    return page
@@ -25,11 +25,14 @@ document.addEventListener("DOMContentLoaded", function() {
         document.querySelector("#new-post-form").onsubmit = create_post;
     }
 
-    show_posts("/posts", 1);
+    show_posts("/posts", null);
 })
 
 const csrftoken = getCookie("csrftoken");
 
+// Stream of updates to the posts being displayed (see listen_for_updates), null if none is open
+let post_updates = null;
+
 /**
  * Get a cookie (implementation from: https://docs.djangoproject.com/en/3.2/ref/csrf/)
  * @param {string} name name of the cookie
@@ -70,7 +73,7 @@ function show_profile_page(username) {
     show_followers_and_following(username);
 
     // Show posts created by the user
-    show_posts(`/posts/user/${username}`, 1);
+    show_posts(`/posts/user/${username}`, null);
 }
 
 /**
@@ -107,7 +110,7 @@ function show_follow_or_unfollow_button(user_to_follow_or_unfollow) {
     }
 
     // Set button to follow or unfollow depending on if the logged in user is following the user to follow or unfollow
-    fetch(`/${logged_in_user}`, {
+    fetch(`/${logged_in_user}/follows/${user_to_follow_or_unfollow}`, {
         method: "GET"
     })
 
@@ -124,9 +127,7 @@ function show_follow_or_unfollow_button(user_to_follow_or_unfollow) {
 
     // Set button value (i.e. what the button displays) to "follow" or "unfollow"
     .then(function(response) {
-        const logged_in_user_following_list = response["following"]
-
-        if (following(user_to_follow_or_unfollow, logged_in_user_following_list)) {
+        if (response["follows"]) {
             button.innerHTML = "unfollow";
         } else {
             button.innerHTML = "follow";
@@ -146,23 +147,6 @@ function show_follow_or_unfollow_button(user_to_follow_or_unfollow) {
     })
 }
 
-/**
- * Returns true if a username is in users, otherwise return false
- * @param {string} username the username of a user
- * @param {array} users the names of various users
- * @returns {boolean}
- */
-function following(username, users) {
-    for (let i = 0; i < users.length; i++) {
-        user = users[i];
-        if (user == username) {
-            return true;
-        }
-    }
-
-    return false;
-}
-
 /**
  * Follow or unfollow a user
  * @param {string} user_to_follow_or_unfollow the user's username
@@ -249,8 +233,8 @@ function show_followers_and_following(username) {
     // Clear followers/following count, then add them to the page
     .then(function(response) {
         document.querySelector("#followers-and-following-container").innerHTML = "";
-        show_followers_or_following(true, response["followers"].length);
-        show_followers_or_following(false, response["following"].length);
+        show_followers_or_following(true, response["follower_count"]);
+        show_followers_or_following(false, response["following_count"]);
     })
 
     // Catch any errors and log them to console
@@ -294,7 +278,7 @@ function show_following_page(username) {
     document.querySelector("#following-page").style.display = "block";
     
     // Show posts
-    show_posts(`/posts/user/${username}/following`, 1)
+    show_posts(`/posts/user/${username}/following`, null)
 }
 
 /**
@@ -326,9 +310,11 @@ function create_post() {
         console.log(response);
     })
 
-    // Load posts again so new post appears
+    // Load posts again so new post appears, unless it will be pushed to the page
     .then(function() {
-        show_posts("/posts", 1);
+        if (post_updates == null) {
+            show_posts("/posts", null);
+        }
     })
 
     // Catch any errors and log them to console
@@ -344,13 +330,20 @@ function create_post() {
 }
 
 /**
- * Displays 10 posts
+ * Displays a page of posts
  * @param {string} route the "/posts" API route to use
- * @param {integer} group the group of 10 posts to display (ex. group = 1 = the first 10 posts, group = 2 = the next 10 posts, etc.)
+ * @param {Object} page the cursor and direction of the page to display (ex. null = the newest page, {cursor: "...", direction: "next"} = the page after cursor, etc.)
  */
-function show_posts(route, group) {
+function show_posts(route, page) {
+    // Build the url of the page
+    const params = new URLSearchParams({limit: 10});
+    if (page != null) {
+        params.set("cursor", page.cursor);
+        params.set("direction", page.direction);
+    }
+
     // Retrieve posts
-    fetch(route, {
+    fetch(`${route}?${params}`, {
         method: "GET"
     })
 
@@ -366,33 +359,30 @@ function show_posts(route, group) {
     })
 
     // Clear posts that are being displayed then iterate through posts, adding them to the page
-    .then(function(posts) {
+    .then(function(response) {
         document.querySelector("#posts").innerHTML = "";
 
-        const first = (group - 1) * 10  // index of the first post (in the group) in posts
-        for (let i = first; i < posts.length && i < first + 10; i++) {
-            show_post(route, group, posts[i]);
-        }
+        response.posts.forEach(function(post) {
+            show_post(route, page, post);
+        })
 
-        return Math.ceil(posts.length / 10);
+        return response;
     })
 
-    // Clear old post navigation bar and display a new one if there is at least one group
-    .then(function(num_groups) {
+    // Clear old post navigation bar and display a new one if there are posts
+    .then(function(response) {
         document.querySelector("#post-navigation-options").innerHTML = "";
 
-        if (num_groups > 0) {
-            show_post_navigation_bar(route, num_groups, group);
+        if (response.posts.length > 0) {
+            show_post_navigation_bar(route, response.prev_cursor, response.next_cursor);
         }
+
+        return response;
     })
 
-    // Display profile page when poster's username is clicked
-    .then(function() {
-        document.querySelectorAll(".post-poster").forEach(function(poster) {
-            poster.onclick = function() {
-                show_profile_page(poster.innerHTML);
-            }
-        })
+    // Listen for updates to the posts being displayed
+    .then(function(response) {
+        listen_for_updates(route, page, response.posts.map(post => post.id));
     })
 
     // Catch any errors and log them console
@@ -401,47 +391,180 @@ function show_posts(route, group) {
     })
 }
 
+/**
+ * Opens a stream of updates to the posts being displayed (see "GET /posts/events"), closing the previous one. Like
+ * counts and edits are patched into the posts they belong to, and new posts are added to the top of the newest page.
+ * @param {string} route the "/posts" API route that was used to get the posts
+ * @param {Object} page the cursor and direction of the page being displayed
+ * @param {Array} ids the ids of the posts being displayed
+ */
+function listen_for_updates(route, page, ids) {
+    if (post_updates != null) {
+        post_updates.close();
+    }
+
+    // Only receive the new posts that belong on the route
+    const params = new URLSearchParams({posts: ids.join(",")});
+    const user_route = route.match(/^\/posts\/user\/([^/]+)(\/following)?$/);
+    if (user_route != null && user_route[2] != null) {
+        params.set("following", "true");
+    } else if (user_route != null) {
+        params.set("poster", decodeURIComponent(user_route[1]));
+    }
+
+    const events = new EventSource(`/posts/events?${params}`);
+    post_updates = events;
+
+    // Update a post's like count
+    events.addEventListener("likes", function(e) {
+        const update = JSON.parse(e.data);
+        document.querySelectorAll(`.post-container[data-id="${update.id}"] .post-likes`).forEach(function(likes) {
+            likes.textContent = update.likes;
+        })
+    })
+
+    // Update a post's content
+    events.addEventListener("edit", function(e) {
+        const update = JSON.parse(e.data);
+        document.querySelectorAll(`.post-container[data-id="${update.id}"]`).forEach(function(post_div) {
+            if (post_div.querySelector(".post-content") != null) {
+                post_div.querySelector(".post-content").textContent = update.content;
+                post_div.querySelector(".post-timestamp").textContent = update.timestamp;
+            }
+        })
+    })
+
+    // Add a new post to the top of the newest page, then listen for its updates too
+    events.addEventListener("post", function(e) {
+        const update = JSON.parse(e.data);
+        if (page != null || document.querySelector(`.post-container[data-id="${update.id}"]`) != null) {
+            return;
+        }
+
+        fetch(`/posts/batch?ids=${update.id}`, {
+            method: "GET"
+        })
+
+        .then(function(response) {
+            return response.json();
+        })
+
+        .then(function(response) {
+            if (post_updates == events && response.posts.length > 0) {
+                document.querySelector("#posts").prepend(create_post_div(route, page, response.posts[0]));
+                listen_for_updates(route, page, [update.id, ...ids]);
+            }
+        })
+
+        .catch(function(err) {
+            console.log(err);
+        })
+    })
+
+    // Updates were missed, so display the page again
+    events.addEventListener("resync", function() {
+        show_posts(route, page);
+    })
+
+    // Updates are not available (e.g. the server is not running under ASGI)
+    events.onerror = function() {
+        if (events.readyState == EventSource.CLOSED && post_updates == events) {
+            post_updates = null;
+        }
+    }
+}
+
 /**
  * Displays a post on a page
  * @param {string} route the "/posts" API route that was used to get the post's info
- * @param {integer} group the group of 10 posts that this post belongs to
+ * @param {Object} page the cursor and direction of the page that this post belongs to
  * @param {Object} post object that contains info about a post
  */
-function show_post(route, group, post) {
+function show_post(route, page, post) {
+    document.querySelector("#posts").append(create_post_div(route, page, post));
+}
+
+/**
+ * Creates the HTML element that displays a post
+ * @param {string} route the "/posts" API route that was used to get the post's info
+ * @param {Object} page the cursor and direction of the page that this post belongs to
+ * @param {Object} post object that contains info about a post
+ * @returns {Element} HTML element that contains the post
+ */
+function create_post_div(route, page, post) {
     const post_div = document.createElement("div");
     
     post_div.className = "post-container";
+    post_div.dataset.id = post.id;
     post_div.innerHTML = `
         <a class="post-poster" href="#">${post.poster}</a>
-        <p>${post.content}</p>
+        <p class="post-content">${post.content}</p>
         <p class="post-timestamp">${post.timestamp}</p>
+        <p class="post-likes">${post.likes}</p>
     `;
 
+    // Display profile page when poster's username is clicked
+    post_div.querySelector(".post-poster").onclick = function() {
+        show_profile_page(post.poster);
+    }
+
     // Add like/unlike button to the post
-    add_like_or_unlike_button_to_post(route, group, post, post_div);
+    add_like_or_unlike_button_to_post(route, page, post, post_div);
 
     // Add edit link to the post
-    add_edit_link_to_post(route, group, post, post_div);
+    add_edit_link_to_post(route, page, post, post_div);
 
-    document.querySelector("#posts").append(post_div);       
+    return post_div;
+}
+
+/**
+ * Retrieves a post again and redisplays it in place, without reloading the rest of the page
+ * @param {string} route the "/posts" API route that was used to get the post's info
+ * @param {Object} page the cursor and direction of the page that this post belongs to
+ * @param {integer} id the id of the post
+ * @param {Element} post_div HTML element that contains the post
+ */
+function refresh_post(route, page, id, post_div) {
+    // Retrieve post
+    fetch(`/posts/batch?ids=${id}`, {
+        method: "GET"
+    })
+
+    // Convert response to json
+    .then(function(response) {
+        return response.json();
+    })
+
+    // Replace the post's old HTML element with a new one
+    .then(function(response) {
+        if (response.posts.length > 0) {
+            post_div.replaceWith(create_post_div(route, page, response.posts[0]));
+        } else {
+            post_div.remove();
+        }
+    })
+
+    // Catch any errors and log them to console
+    .catch(function(err) {
+        console.log(err);
+    })
 }
 
 /**
  * Adds a button to a post that allows the user to like/unlike the post
  * @param {string} route the "/posts" API route that was used to get the post's info
- * @param {integer} group the group of 10 posts that this post belongs to
+ * @param {Object} page the cursor and direction of the page that this post belongs to
  * @param {Object} post object that contains info about a post
  * @param {Element} post_div HTML element that contains the post
  */
-function add_like_or_unlike_button_to_post(route, group, post, post_div) {
+function add_like_or_unlike_button_to_post(route, page, post, post_div) {
     // If user is not logged in, do nothing
     if (document.querySelector("#profile-page-link") == null) {
         return;
     }
 
     // Otherwise, add like/unlike button to the post
-    const logged_in_user = document.querySelector("#profile-page-link").innerHTML;
-    const liked_post = post.likers.includes(logged_in_user);
+    const liked_post = post.liked_by_me;
     const like_or_unlike_button = document.createElement("button");
 
     like_or_unlike_button.className = "post-like-or-unlike-button";
@@ -459,28 +582,25 @@ function add_like_or_unlike_button_to_post(route, group, post, post_div) {
 
     like_or_unlike_button.onclick = function(e) {
         e.preventDefault(); // Prevents window from scrolling automatically to the top
-        update_post_likes(route, group, post.id, !liked_post);
+        update_post_likes(route, page, post.id, post_div, !liked_post);
     }
 }
 
 /**
  * Updates the like count on a post
  * @param {string} route the "/posts" API route that was used to get the post's info
- * @param {*} group the group of 10 posts this post belongs to
+ * @param {Object} page the cursor and direction of the page that this post belongs to
  * @param {integer} id the id of the post
+ * @param {Element} post_div HTML element that contains the post
  * @param {*} like true = like the post, false = unlike the post
  */
-function update_post_likes(route, group, id, like) {
-    // Update post
-    fetch(`/posts/${id}/update`, {
-        method: "PUT",
+function update_post_likes(route, page, id, post_div, like) {
+    // Like or unlike post
+    fetch(`/posts/${id}/like`, {
+        method: like ? "PUT" : "DELETE",
         headers: {
-            "Content-Type": "application/json",
             "X-CSRFToken": csrftoken
-        },
-        body: JSON.stringify({
-            like: like
-        })
+        }
     })
 
     // Convert response to json
@@ -493,9 +613,9 @@ function update_post_likes(route, group, id, like) {
         console.log(response);
     })
 
-    // Load posts again so new post appears
+    // Retrieve the post again so its new like count appears
     .then(function() {
-        show_posts(route, group);
+        refresh_post(route, page, id, post_div);
     })
 
     // Catch any errors and log them to console
@@ -510,11 +630,11 @@ function update_post_likes(route, group, id, like) {
 /**
  * Adds a link to a post that allows the poster to edit the post
  * @param {string} route the "/posts" API route that was used to get the post's info
- * @param {integer} group the group of 10 posts that this post belongs to
+ * @param {Object} page the cursor and direction of the page that this post belongs to
  * @param {Object} post object that contains info about a post
  * @param {Element} post_div HTML element that contains the post
  */
-function add_edit_link_to_post(route, group, post, post_div) {
+function add_edit_link_to_post(route, page, post, post_div) {
     // If user is not logged in, do nothing
     if (document.querySelector("#profile-page-link") == null) {
         return;
@@ -534,7 +654,7 @@ function add_edit_link_to_post(route, group, post, post_div) {
         // Add functionality to edit link
         edit_link.onclick = function (e) {
             e.preventDefault(); // Prevents window from scrolling automatically to the top
-            edit_post(route, group, post, post_div);
+            edit_post(route, page, post, post_div);
         };
     }
 }
@@ -542,11 +662,11 @@ function add_edit_link_to_post(route, group, post, post_div) {
 /**
  * Allows a user to edit a post
  * @param {string} route the "/posts" API route that was used to get the post's info
- * @param {integer} group the group of 10 posts that this post belongs to
+ * @param {Object} page the cursor and direction of the page that this post belongs to
  * @param {Object} post object that contains info about a post
  * @param {Element} post_div HTML element that contains the post
  */
-function edit_post(route, group, post, post_div) {
+function edit_post(route, page, post, post_div) {
     // Display a form that allows a user to edit a post's content
     post_div.innerHTML = `
         <a class="post-poster" href="#">${post.poster}</a>
@@ -561,23 +681,25 @@ function edit_post(route, group, post, post_div) {
     // Save edits to a post when "save" button is clicked
     document.querySelector("#post-edit-form-save-button").onclick = function() {
         const new_content = document.querySelector("#post-edit-form-content").value;
-        update_post_content(route, post.id, new_content);
+        update_post_content(route, page, post.id, post_div, new_content);
     }
 
     // Cancel edits to a post when "cancel" button is clicked
     document.querySelector("#post-edit-form-cancel-button").onclick = function(e) {
         e.preventDefault(); // Prevents window from scrolling automatically to the top
-        show_posts(route, group);
+        refresh_post(route, page, post.id, post_div);
     }
 }
 
 /**
  * Updates the content of a post
  * @param {string} route the "/posts" API route that was used to get the post's info
+ * @param {Object} page the cursor and direction of the page that this post belongs to
  * @param {integer} id the id of the post
+ * @param {Element} post_div HTML element that contains the post
  * @param {string} content the post's new content
  */
-function update_post_content(route, id, content) {
+function update_post_content(route, page, id, post_div, content) {
     // Update post
     fetch(`/posts/${id}/update`, {
         method: "PUT",
@@ -601,9 +723,9 @@ function update_post_content(route, id, content) {
         console.log(response);
     })
 
-    // Load posts again so new post appears
+    // Retrieve the post again so its new content appears
     .then(function() {
-        show_posts(route, 1);
+        refresh_post(route, page, id, post_div);
     })
 
     // Catch any errors and log them to console
@@ -616,57 +738,31 @@ function update_post_content(route, id, content) {
 }
 
 /**
- * Displays navigation bar that allows a user to move between groups of posts
+ * Displays navigation bar that allows a user to move between pages of posts
  * @param {string} route the "/posts" API route to use
- * @param {integer} num_groups the number of groups of posts in total
- * @param {integer} group the group of 10 posts being displayed currently
+ * @param {string} prev_cursor the cursor of the page before the one being displayed, null if there is none
+ * @param {string} next_cursor the cursor of the page after the one being displayed, null if there is none
  */
-function show_post_navigation_bar(route, num_groups, group) {
-    // Create "previous" button, disable if the first group of posts is being displayed
+function show_post_navigation_bar(route, prev_cursor, next_cursor) {
+    // Create "previous" button, disable if the newest page of posts is being displayed
     create_post_navigation_bar_option("post-navigation-previous", "previous");
-    if (group == 1) {
+    if (prev_cursor == null) {
         document.querySelector("#post-navigation-previous").className = "page-item disabled";
-    }
-
-    // Create "group" buttons, set button of current group being displayed as active
-    for (let i = 1; i <= num_groups; i++) {
-        create_post_navigation_bar_option(`group-${i}`, `${i}`);
-
-        if (i == group) {
-            document.querySelector(`#group-${i}`).className = "page-item active";
+    } else {
+        document.querySelector("#post-navigation-previous").firstChild.onclick = function() {
+            show_posts(route, {cursor: prev_cursor, direction: "prev"});
         }
     }
 
-    // Create "next" button, disable if the last group of posts is being displayed
+    // Create "next" button, disable if the oldest page of posts is being displayed
     create_post_navigation_bar_option("post-navigation-next", "next");
-    if (group == num_groups) {
+    if (next_cursor == null) {
         document.querySelector("#post-navigation-next").className = "page-item disabled";
-    }
-
-    // Add functionality to navigation bar
-    document.querySelectorAll(".page-item").forEach(function(option) {
-        // If option is "previous" and it is not disabled, show posts from the previous group when clicked
-        if (option.id == "post-navigation-previous" && option.className == "page-item") {
-            option.firstChild.onclick = function() {
-                show_posts(route, group - 1);
-            }
-        }
-
-        // Else if option is "next" and it is not disabled, show posts from the next group when clicked
-        else if (option.id == "post-navigation-next" && option.className == "page-item") {
-            option.firstChild.onclick = function() {
-                show_posts(route, group + 1);
-            }
-        }
-
-        // Else show posts from the group that was clicked
-        else {
-            const group_clicked = parseInt(option.firstChild.innerHTML);
-            option.firstChild.onclick = function() {
-                show_posts(route, group_clicked);
-            }   
+    } else {
+        document.querySelector("#post-navigation-next").firstChild.onclick = function() {
+            show_posts(route, {cursor: next_cursor, direction: "next"});
         }
-    })
+    }
 }
 
 /**
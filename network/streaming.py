@@ -0,0 +1,83 @@
+import itertools
+import json
+
+from django.http import StreamingHttpResponse
+
+from .likebuffer import overlay_pending_likes
+from .models import Like
+
+# Number of posts fetched (and looked up in the likes of the requesting user) per query while streaming
+STREAM_CHUNK_SIZE = 500
+
+# Content types of the streaming formats
+STREAM_CONTENT_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+# Yields posts from a queryset in reverse chronological order, serialized for user. Posts are fetched STREAM_CHUNK_SIZE at
+# a time so only one chunk is held in memory at once, and whether user liked them is looked up once per chunk.
+def iterate_posts(queryset, user):
+    posts = queryset.order_by("-timestamp", "-id").iterator(chunk_size=STREAM_CHUNK_SIZE)
+    while chunk := list(itertools.islice(posts, STREAM_CHUNK_SIZE)):
+        liked = Like.objects.liked_post_ids(user, [post.id for post in chunk])
+        serialized = [{**post.serialize(), "liked_by_me": post.id in liked} for post in chunk]
+        yield from overlay_pending_likes(serialized, user)
+
+# Yields a JSON object {"posts": [...]} piece by piece, one post at a time
+def stream_json(queryset, user):
+    yield '{"posts": ['
+    separator = ""
+    for post in iterate_posts(queryset, user):
+        yield separator + json.dumps(post)
+        separator = ", "
+    yield "]}"
+
+# Yields newline-delimited JSON, one post per line
+def stream_ndjson(queryset, user):
+    for post in iterate_posts(queryset, user):
+        yield json.dumps(post) + "\n"
+
+# Returns a response that streams every post in a queryset in format ("json" or "ndjson"), serialized for user
+def streaming_posts_response(queryset, format, user):
+    stream = stream_json if format == "json" else stream_ndjson
+    return StreamingHttpResponse(stream(queryset, user), content_type=STREAM_CONTENT_TYPES[format])
+
+# Serializes a chunk of posts for user, looking up which of them user liked with the async ORM
+async def aserialize_chunk(chunk, user):
+    liked = await Like.objects.aliked_post_ids(user, [post.id for post in chunk])
+    return overlay_pending_likes([{**post.serialize(), "liked_by_me": post.id in liked} for post in chunk], user)
+
+# Async version of iterate_posts, using the async ORM. Under ASGI a StreamingHttpResponse reads a synchronous iterator
+# to the end before sending any of it, so streams served by async views must be asynchronous.
+async def aiterate_posts(queryset, user):
+    chunk = []
+    async for post in queryset.order_by("-timestamp", "-id").aiterator(chunk_size=STREAM_CHUNK_SIZE):
+        chunk.append(post)
+        if len(chunk) == STREAM_CHUNK_SIZE:
+            for serialized in await aserialize_chunk(chunk, user):
+                yield serialized
+            chunk = []
+
+    if chunk:
+        for serialized in await aserialize_chunk(chunk, user):
+            yield serialized
+
+# Async version of stream_json
+async def astream_json(queryset, user):
+    yield '{"posts": ['
+    separator = ""
+    async for post in aiterate_posts(queryset, user):
+        yield separator + json.dumps(post)
+        separator = ", "
+    yield "]}"
+
+# Async version of stream_ndjson
+async def astream_ndjson(queryset, user):
+    async for post in aiterate_posts(queryset, user):
+        yield json.dumps(post) + "\n"
+
+# Async version of streaming_posts_response
+def astreaming_posts_response(queryset, format, user):
+    stream = astream_json if format == "json" else astream_ndjson
+    return StreamingHttpResponse(stream(queryset, user), content_type=STREAM_CONTENT_TYPES[format])
@@ -0,0 +1,120 @@
+import heapq
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .models import User, Like, Suggestion, SuggestionRefresh
+
+Follow = User.followers.through
+
+# Precomputed "who to follow" suggestions.
+#
+# A user's candidates are scored from the follow and like graphs, held as sparse adjacency lists (the rows of the
+# follow matrix A, A[u][v] = 1 if u follows v, and of the like matrix L, L[u][p] = number of u's likes of p's posts):
+#   - FRIEND_OF_FRIEND_WEIGHT for each user they follow who follows the candidate (row u of A x A)
+#   - FOLLOWS_YOU_WEIGHT if the candidate follows them (column u of A)
+#   - LIKE_WEIGHT for each of their likes of the candidate's posts, counting at most MAX_LIKES_COUNTED (row u of L)
+# Users they already follow are left out, and the best suggestions_per_user() are stored in the Suggestion table, so
+# serving them is one indexed range read. A batch job (`manage.py refresh_suggestions`) recomputes them, by default only
+# for the users whose follows changed since (User.suggestions_stale) or who liked a post since (the likes with ids
+# above SuggestionRefresh.last_like_id), so liking costs no extra write. Suggestions that depend on the follows of the
+# users someone follows, or that only an unlike changed, are only brought up to date by a full refresh (--all).
+
+FRIEND_OF_FRIEND_WEIGHT = 1.0
+FOLLOWS_YOU_WEIGHT = 2.0
+LIKE_WEIGHT = 0.5
+MAX_LIKES_COUNTED = 10
+
+# Number of users whose suggestions are computed and written at a time
+REFRESH_BATCH_SIZE = 500
+
+# Maximum number of ids in one IN (...) query
+QUERY_CHUNK_SIZE = 500
+
+# Returns the number of suggestions stored for each user
+def suggestions_per_user():
+    return getattr(settings, "NETWORK_SUGGESTIONS_PER_USER", 20)
+
+# Returns, for each id of ids, the list of the values of the follow rows whose key column holds it, e.g. the ids of the
+# users each user follows with key="to_user_id", value="from_user_id" (a follow row (from_user=followee,
+# to_user=follower) means follower follows followee)
+def follow_lists(ids, key, value):
+    lists = defaultdict(list)
+    ids = list(ids)
+    for start in range(0, len(ids), QUERY_CHUNK_SIZE):
+        rows = Follow.objects.filter(**{f"{key}__in": ids[start:start + QUERY_CHUNK_SIZE]}).values_list(key, value)
+        for id, other in rows:
+            lists[id].append(other)
+    return lists
+
+# Returns the best suggestions_per_user() (candidate id, score) pairs for the user with user_id, best first, from the
+# ids they follow, the ids each of those follows, the ids following them and the likes they gave to each poster
+def score_candidates(user_id, following, following_of_followees, followers, liked_posters):
+    scores = Counter()
+    for followee in following:
+        for candidate in following_of_followees.get(followee, ()):
+            scores[candidate] += FRIEND_OF_FRIEND_WEIGHT
+    for follower in followers:
+        scores[follower] += FOLLOWS_YOU_WEIGHT
+    for poster, likes in liked_posters.items():
+        scores[poster] += LIKE_WEIGHT * min(likes, MAX_LIKES_COUNTED)
+
+    for id in [user_id, *following]:
+        scores.pop(id, None)
+    return heapq.nsmallest(suggestions_per_user(), scores.items(), key=lambda item: (-item[1], item[0]))
+
+# Recomputes and stores the suggestions of the users with user_ids, reading the graph around them with a few queries.
+# Clearing their stale flags comes first in the transaction that replaces their suggestions: the flags are only cleared
+# if the new suggestions are stored, and the update holds the users' rows (the write lock on SQLite), so their follows
+# made meanwhile wait for the commit and flag them again.
+def refresh_batch(user_ids):
+    with transaction.atomic():
+        User.objects.filter(pk__in=user_ids).update(suggestions_stale=False)
+
+        following = follow_lists(user_ids, "to_user_id", "from_user_id")
+        followees = {followee for ids in following.values() for followee in ids}
+        following_of_followees = follow_lists(followees, "to_user_id", "from_user_id")
+        followers = follow_lists(user_ids, "from_user_id", "to_user_id")
+        liked_posters = defaultdict(Counter)
+        for liker, poster in Like.objects.filter(liker_id__in=user_ids).values_list("liker_id", "post__poster_id"):
+            liked_posters[liker][poster] += 1
+
+        suggestions = []
+        for user_id in user_ids:
+            candidates = score_candidates(
+                user_id, following[user_id], following_of_followees, followers[user_id], liked_posters[user_id]
+            )
+            suggestions += [
+                Suggestion(user_id=user_id, suggested_id=candidate, score=score, rank=rank)
+                for rank, (candidate, score) in enumerate(candidates)
+            ]
+
+        Suggestion.objects.filter(user_id__in=user_ids).delete()
+        Suggestion.objects.bulk_create(suggestions, batch_size=500)
+
+# Returns the ids of the users whose suggestions are stale: those flagged by a follow or unfollow and those who liked a
+# post since the last refresh, up to the like with last_like_id
+def stale_user_ids(last_like_id):
+    progress, _ = SuggestionRefresh.objects.get_or_create(pk=1)
+    likers = Like.objects.filter(id__gt=progress.last_like_id, id__lte=last_like_id).values_list("liker_id", flat=True)
+    flagged = User.objects.filter(suggestions_stale=True).values_list("id", flat=True)
+    return sorted(set(likers) | set(flagged))
+
+# Recomputes the suggestions of the users with user_ids, or of every user whose suggestions are stale if None. Returns
+# the number of users refreshed.
+def refresh_suggestions(user_ids=None):
+    stale = user_ids is None
+    if stale:
+        last_like_id = Like.objects.aggregate(last_like_id=Max("id"))["last_like_id"] or 0
+        user_ids = stale_user_ids(last_like_id)
+    user_ids = list(user_ids)
+
+    for start in range(0, len(user_ids), REFRESH_BATCH_SIZE):
+        refresh_batch(user_ids[start:start + REFRESH_BATCH_SIZE])
+
+    # Only move past the likes once every batch is stored, so a refresh that fails goes over them again
+    if stale:
+        SuggestionRefresh.objects.filter(pk=1).update(last_like_id=last_like_id)
+    return len(user_ids)
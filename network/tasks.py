@@ -0,0 +1,156 @@
+import logging
+import queue
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+# Background task queue.
+#
+# Side effects of writes that the response does not need (filling timelines, mostly) are functions decorated with
+# @task, queued with function.enqueue(*args) and run by the backend NETWORK_TASK_BACKEND:
+#   - "immediate": run straight away, in the request (the default, so everything works without workers)
+#   - "database": inserted as a Task row in the write's own transaction, so a task is queued if and only if its write
+#     commits, and run by the workers of `manage.py run_tasks`, which may live on other machines
+#   - "thread": handed to a pool of NETWORK_TASK_THREADS worker threads of the current process once the write commits
+#     (tasks still queued when the process exits are lost)
+# A task that raises is retried NETWORK_TASK_MAX_ATTEMPTS times in all, with exponential backoff starting at
+# NETWORK_TASK_RETRY_SECONDS ("immediate" tasks are not retried: their error is the request's). Tasks may run out of
+# order and more than once, so they take ids (arguments must be JSON serializable) and act on the current state of the
+# rows.
+
+logger = logging.getLogger("network.tasks")
+
+# Returns the backend that runs tasks
+def task_backend():
+    return getattr(settings, "NETWORK_TASK_BACKEND", "immediate")
+
+# Returns the number of worker threads of the "thread" backend
+def task_threads():
+    return getattr(settings, "NETWORK_TASK_THREADS", 2)
+
+# Returns the number of times a task is tried before it is given up on
+def max_attempts():
+    return getattr(settings, "NETWORK_TASK_MAX_ATTEMPTS", 5)
+
+# Returns the number of seconds a task waits before being tried again after its attempt-th failure
+def retry_delay(attempt):
+    return getattr(settings, "NETWORK_TASK_RETRY_SECONDS", 2) * 2 ** (attempt - 1)
+
+# Returns the number of seconds a claimed Task row is hidden from other workers; a task whose worker died runs again
+# once it is over
+def lease_seconds():
+    return getattr(settings, "NETWORK_TASK_LEASE_SECONDS", 300)
+
+# Decorator that makes a function a task, queued by calling function.enqueue(*args)
+def task(function):
+    function.task_name = f"{function.__module__}.{function.__qualname__}"
+    function.enqueue = lambda *args: enqueue(function.task_name, list(args))
+    return function
+
+# Queues a call of the task named name (its dotted path) with args
+def enqueue(name, args):
+    backend = task_backend()
+    if backend == "immediate":
+        get_task(name)(*args)
+    elif backend == "database":
+        Task.objects.create(name=name, args=args)
+    elif backend == "thread":
+        transaction.on_commit(lambda: local_worker.put(name, args))
+    else:
+        raise ValueError(f"Unknown task backend {backend!r}.")
+
+# Returns the task function named name
+def get_task(name):
+    function = import_string(name)
+    if getattr(function, "task_name", None) != name:
+        raise ValueError(f"{name} is not a task.")
+    return function
+
+# Runs the task named name with args in a transaction, so a failed attempt leaves nothing behind
+def run_task(name, args):
+    function = get_task(name)
+    with transaction.atomic():
+        function(*args)
+
+# Claims up to limit Task rows that are due, hiding them from other workers for lease_seconds(), and returns them
+def claim_tasks(limit):
+    now = timezone.now()
+    due = Task.objects.filter(failed=False, run_at__lte=now).order_by("run_at", "id")
+    if connections[router.db_for_write(Task)].features.has_select_for_update_skip_locked:
+        due = due.select_for_update(skip_locked=True)
+
+    with transaction.atomic():
+        tasks = list(due[:limit])
+        if tasks:
+            claimed = Task.objects.filter(pk__in=[task.pk for task in tasks])
+            claimed.update(run_at=now + timedelta(seconds=lease_seconds()), attempts=F("attempts") + 1)
+
+    return tasks
+
+# Runs a claimed Task row, deleting it if it succeeds and scheduling its retry (or giving up on it) if it fails.
+# Returns whether it succeeded.
+def run_claimed_task(claimed):
+    attempt = claimed.attempts + 1
+    try:
+        run_task(claimed.name, claimed.args)
+    except Exception:
+        logger.exception("Task %s (attempt %d of %d) failed", claimed.name, attempt, max_attempts())
+        if attempt >= max_attempts():
+            Task.objects.filter(pk=claimed.pk).update(failed=True, last_error=traceback.format_exc())
+        else:
+            run_at = timezone.now() + timedelta(seconds=retry_delay(attempt))
+            Task.objects.filter(pk=claimed.pk).update(run_at=run_at, last_error=traceback.format_exc())
+        return False
+
+    Task.objects.filter(pk=claimed.pk).delete()
+    return True
+
+# Pool of worker threads running the tasks of the "thread" backend
+class LocalWorker:
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.threads = []
+        self.lock = threading.Lock()
+
+    # Queues the attempt-th try of a task, starting the worker threads if needed
+    def put(self, name, args, attempt=1):
+        with self.lock:
+            self.threads = [thread for thread in self.threads if thread.is_alive()]
+            while len(self.threads) < task_threads():
+                thread = threading.Thread(target=self.work, name="network-task-worker", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+        self.queue.put((name, args, attempt))
+
+    def work(self):
+        while True:
+            name, args, attempt = self.queue.get()
+            try:
+                close_old_connections()
+                run_task(name, args)
+            except Exception:
+                logger.exception("Task %s (attempt %d of %d) failed", name, attempt, max_attempts())
+                if attempt < max_attempts():
+                    retry = threading.Timer(retry_delay(attempt), self.put, (name, args, attempt + 1))
+                    retry.daemon = True
+                    retry.start()
+            finally:
+                # Do not keep an idle worker's connections open
+                if self.queue.empty():
+                    connections.close_all()
+                self.queue.task_done()
+
+    # Waits until every queued task has been tried (retries scheduled for later are not waited for)
+    def join(self):
+        self.queue.join()
+
+local_worker = LocalWorker()
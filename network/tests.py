@@ -1,6 +1,35 @@
-from django.test import Client, TestCase
-
-from .models import User, Post, Like
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+import unittest
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.sessions.models import Session
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from project4 import asgi_settings
+
+from .cache import cache_timeout, get_cache, stats
+from .events import QUEUE_SIZE, brokers, event_stream, get_broker
+from .graph import follow_graph
+from .instrumentation import histograms
+from .likebuffer import like_buffer
+from .models import User, Post, Like, Suggestion, Task, TimelineEntry
+from .querylog import QueryBudgetExceeded, inspect_queries, query_budget, query_shape
+from .routers import PRIMARY_COOKIE, ReplicaRouter, reading_from_replica
+from .streaming import STREAM_CHUNK_SIZE
+from .suggestions import refresh_suggestions
+from .tasks import claim_tasks, local_worker, run_claimed_task, task
+from .timeline import backfill_timeline, fan_out_post, following_posts_page
 
 # Test class for models
 class ModelTest(TestCase):
@@ -43,6 +72,1876 @@ class ModelTest(TestCase):
         self.assertEquals(like.liker, user)
         self.assertEquals(like.post, post)
 
+# Test class for serialization
+class SerializationTest(TestCase):
+    # Setup test database with users that like every post
+    def setUp(self):
+        get_cache().clear()
+        self.users = [User.objects.create(username=f"user{i}", password=f"user{i}") for i in range(3)]
+
+    # Create num_posts posts, each liked by every user
+    def create_posts(self, num_posts):
+        posts = Post.objects.bulk_create([
+            Post(poster=self.users[0], content=f"post {i}", like_count=len(self.users)) for i in range(num_posts)
+        ])
+        Like.objects.bulk_create([Like(liker=user, post=post) for post in posts for user in self.users])
+
+    # Test that serializing posts takes the same number of queries no matter how many posts there are
+    def test_serialize_posts_query_count_is_constant(self):
+        for num_posts in (10, 100, 1000):
+            Post.objects.all().delete()
+            self.create_posts(num_posts)
+
+            with self.assertNumQueries(1):
+                serialized = [post.serialize() for post in Post.objects.serializable()]
+
+            self.assertEqual(len(serialized), num_posts)
+            self.assertEqual(serialized[0]["poster"], "user0")
+            self.assertEqual(serialized[0]["likes"], 3)
+            self.assertNotIn("likers", serialized[0])
+
+    # Test that retrieving a page of posts takes the same number of queries no matter how many posts there are
+    # (one for the page, one for which of its posts the user liked, two for its ETag / Last-Modified validators and two
+    # to load the user's session)
+    def test_posts_view_query_count_is_constant(self):
+        self.client.force_login(self.users[1])
+
+        self.create_posts(10)
+        with self.assertNumQueries(6):
+            response = self.client.get("/posts", {"limit": 100})
+        self.assertTrue(all(post["liked_by_me"] for post in response.json()["posts"]))
+
+        self.create_posts(90)
+        get_cache().clear()
+        with self.assertNumQueries(6):
+            self.client.get("/posts", {"limit": 100})
+
+    # Test that streaming posts reads them through one query and looks up which of them the user liked with one query
+    # per chunk of STREAM_CHUNK_SIZE posts, however many there are (plus two queries for the ETag / Last-Modified
+    # validators and two to load the user's session)
+    def test_posts_stream_query_count_per_chunk(self):
+        self.client.force_login(self.users[1])
+        self.create_posts(2 * STREAM_CHUNK_SIZE + 1)
+
+        with self.assertNumQueries(2 + 2 + 1 + 3):
+            response = self.client.get("/posts", {"stream": "ndjson"})
+            lines = b"".join(response.streaming_content).splitlines()
+
+        self.assertEqual(len(lines), 2 * STREAM_CHUNK_SIZE + 1)
+
+    # Test that serializing a user takes no queries no matter how many followers they have
+    def test_serialize_user_query_count_is_constant(self):
+        user = self.users[0]
+        for follower in self.users[1:]:
+            follower.follow(user)
+        user.refresh_from_db()
+
+        with self.assertNumQueries(0):
+            data = user.serialize()
+
+        self.assertEqual(data["follower_count"], 2)
+        self.assertEqual(data["following_count"], 0)
+        self.assertNotIn("followers", data)
+
+# Test class for the denormalized like, follower and following counts
+class CountTest(TestCase):
+    # Setup test database with data
+    def setUp(self):
+        self.user1 = User.objects.create(username="user1", password="user1")
+        self.user2 = User.objects.create(username="user2", password="user2")
+        self.post = Post.objects.create(poster=self.user1, content="post")
+
+    # Test that liking and unliking a post updates its like count
+    def test_like_count(self):
+        self.post.like(self.user1)
+        self.post.like(self.user2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 2)
+
+        self.post.unlike(self.user1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+    # Test that following and unfollowing a user updates both users' counts
+    def test_follow_counts(self):
+        self.assertTrue(self.user1.follow(self.user2))
+        self.user1.refresh_from_db()
+        self.user2.refresh_from_db()
+        self.assertEqual(self.user1.following_count, 1)
+        self.assertEqual(self.user2.follower_count, 1)
+        self.assertEqual(self.user2.followers.first(), self.user1)
+
+        self.assertTrue(self.user1.unfollow(self.user2))
+        self.user1.refresh_from_db()
+        self.user2.refresh_from_db()
+        self.assertEqual(self.user1.following_count, 0)
+        self.assertEqual(self.user2.follower_count, 0)
+
+    # Test that following a user twice or unfollowing a user that is not followed does not change the counts
+    def test_follow_counts_repeated(self):
+        self.user1.follow(self.user2)
+        self.assertFalse(self.user1.follow(self.user2))
+        self.user1.unfollow(self.user2)
+        self.assertFalse(self.user1.unfollow(self.user2))
+
+        self.user1.refresh_from_db()
+        self.user2.refresh_from_db()
+        self.assertEqual(self.user1.following_count, 0)
+        self.assertEqual(self.user2.follower_count, 0)
+
+    # Test that the reconcile_counts command fixes counts that have drifted
+    def test_reconcile_counts(self):
+        Like.objects.create(post=self.post, liker=self.user2)
+        self.user2.followers.add(self.user1)
+        User.objects.filter(pk=self.user1.pk).update(follower_count=5)
+
+        call_command("reconcile_counts", stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.user1.refresh_from_db()
+        self.user2.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(self.user1.follower_count, 0)
+        self.assertEqual(self.user1.following_count, 1)
+        self.assertEqual(self.user2.follower_count, 1)
+
+# Returns the posts in the newest page of a user's following feed
+def following_posts(user):
+    return following_posts_page(user, {"limit": 100})["posts"]
+
+# Test class for following timelines
+class TimelineTest(TestCase):
+    # Setup test database with data
+    def setUp(self):
+        self.user1 = User.objects.create(username="user1", password="user1")
+        self.user2 = User.objects.create(username="user2", password="user2")
+        self.user3 = User.objects.create(username="user3", password="user3")
+
+    # Test that creating a post inserts it into the timelines of the poster's followers only
+    def test_create_post_fans_out(self):
+        self.user1.follow(self.user2)
+        self.client.force_login(self.user2)
+
+        self.client.post("/posts", {"content": "post"}, "application/json")
+
+        post = Post.objects.get(poster=self.user2)
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.user1, post=post).exists())
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.user3).exists())
+
+    # Test that following a user inserts their existing posts into the follower's timeline
+    def test_follow_backfills_timeline(self):
+        Post.objects.create(poster=self.user2, content="post 1")
+        Post.objects.create(poster=self.user2, content="post 2")
+
+        self.client.put("/user1", {"follow": True, "user": "user2"}, "application/json")
+
+        self.assertEqual(self.user1.timeline_entries.count(), 2)
+
+    # Test that unfollowing a user removes their posts from the follower's timeline
+    def test_unfollow_cleans_timeline(self):
+        self.client.put("/user1", {"follow": True, "user": "user2"}, "application/json")
+        self.client.put("/user1", {"follow": True, "user": "user3"}, "application/json")
+        fan_out_post(Post.objects.create(poster=self.user2, content="user2 post"))
+        fan_out_post(Post.objects.create(poster=self.user3, content="user3 post"))
+
+        self.client.put("/user1", {"follow": False, "user": "user2"}, "application/json")
+
+        self.assertEqual([post.content for post in following_posts(self.user1)], ["user3 post"])
+
+    # Test that posts from heavy accounts are not fanned out but are merged into the following feed when read
+    @override_settings(NETWORK_TIMELINE_HEAVY_FOLLOWER_THRESHOLD=1)
+    def test_heavy_account_merged_on_read(self):
+        self.user1.follow(self.user2)
+        self.user2.refresh_from_db()
+
+        post = Post.objects.create(poster=self.user2, content="post")
+        fan_out_post(post)
+
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(following_posts(self.user1), [post])
+        self.assertEqual(following_posts(self.user3), [])
+
+    # Test that an account's posts stay in its followers' feeds, once each, as it becomes heavy and drops back
+    @override_settings(NETWORK_TIMELINE_HEAVY_FOLLOWER_THRESHOLD=2)
+    def test_heavy_threshold_crossed_both_ways(self):
+        user4 = User.objects.create(username="user4", password="user4")
+
+        def post(content):
+            post = Post.objects.create(poster=User.objects.get(pk=self.user2.pk), content=content)
+            fan_out_post(post)
+            return post
+
+        self.user1.follow(self.user2)
+        before = post("before")
+        self.user3.follow(self.user2)
+        heavy = post("heavy")
+        self.assertFalse(TimelineEntry.objects.filter(post=heavy).exists())
+        # Following a heavy account backfills its older posts
+        user4.follow(self.user2)
+        backfill_timeline(user4, User.objects.get(pk=self.user2.pk))
+        self.assertEqual(following_posts(user4), [heavy, before])
+
+        self.user3.unfollow(self.user2)
+        user4.unfollow(self.user2)
+        after = post("after")
+        self.assertEqual(following_posts(self.user1), [after, heavy, before])
+
+        self.user3.follow(self.user2)
+        heavy_again = post("heavy again")
+        self.assertEqual(following_posts(self.user1), [heavy_again, after, heavy, before])
+
+    # Test that a following feed merged from a timeline and heavy accounts is paged through in order
+    @override_settings(NETWORK_TIMELINE_HEAVY_FOLLOWER_THRESHOLD=2)
+    def test_merged_feed_pages(self):
+        self.user1.follow(self.user2)
+        self.user1.follow(self.user3)
+        self.user2.follow(self.user3)
+        self.user3.refresh_from_db()
+
+        posts = []
+        for i in range(7):
+            post = Post.objects.create(poster=self.user2 if i % 2 else self.user3, content=f"post {i}")
+            fan_out_post(post)
+            posts.append(post)
+
+        first = following_posts_page(self.user1, {"limit": 3})
+        second = following_posts_page(self.user1, {"limit": 3, "cursor": first["next_cursor"]})
+        third = following_posts_page(self.user1, {"limit": 3, "cursor": second["next_cursor"]})
+        back = following_posts_page(self.user1, {"limit": 3, "cursor": second["prev_cursor"], "direction": "prev"})
+
+        self.assertEqual(first["posts"] + second["posts"] + third["posts"], posts[::-1])
+        self.assertIsNone(third["next_cursor"])
+        self.assertEqual(back["posts"], first["posts"])
+        self.assertIsNone(back["prev_cursor"])
+
+    # Test that timelines are trimmed to the configured depth
+    @override_settings(NETWORK_TIMELINE_DEPTH=3, NETWORK_TIMELINE_TRIM_INTERVAL=1)
+    def test_timeline_trimmed(self):
+        self.user1.follow(self.user2)
+        posts = [Post.objects.create(poster=self.user2, content=f"post {i}") for i in range(5)]
+        for post in posts:
+            fan_out_post(post)
+
+        self.assertEqual(following_posts(self.user1), posts[:1:-1])
+
+# Test class for following and unfollowing many users at once
+class BulkFollowTest(TestCase):
+    # Setup test database with data
+    def setUp(self):
+        get_cache().clear()
+        self.users = User.objects.bulk_create([User(username=f"user{i}", password=f"user{i}") for i in range(60)])
+        self.user = self.users[0]
+        self.client.force_login(self.user)
+
+    # Sends PUT /user0/following with data, returning the response's results
+    def put_following(self, data):
+        response = self.client.put("/user0/following", data, "application/json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    # Test that many users are followed at once, with their counts updated
+    def test_follow_many(self):
+        names = [user.username for user in self.users[1:]]
+
+        self.assertEqual(self.put_following({"follow": names}), {name: "followed" for name in names})
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.following_count, len(names))
+        self.assertEqual(set(self.user.following.values_list("username", flat=True)), set(names))
+        self.assertEqual(set(User.objects.filter(username__in=names).values_list("follower_count", flat=True)), {1})
+
+    # Test that following or unfollowing more users does not take more queries
+    def test_queries_do_not_grow(self):
+        def queries(data):
+            with CaptureQueriesContext(connection) as context:
+                self.put_following(data)
+            return len(context)
+
+        few, many = [user.username for user in self.users[1:3]], [user.username for user in self.users[3:]]
+        self.assertEqual(queries({"follow": few}), queries({"follow": many}))
+        self.assertEqual(queries({"unfollow": few}), queries({"unfollow": many}))
+
+    # Test that the result for each user tells what happened
+    def test_results(self):
+        self.user.follow(self.users[1])
+
+        results = self.put_following({"follow": ["user1", "user2", "user2", "nobody", "user0"], "unfollow": ["user3"]})
+        self.assertEqual(results, {
+            "user1": "already following",
+            "user2": "followed",
+            "nobody": "does not exist",
+            "user0": "cannot follow yourself",
+            "user3": "not following",
+        })
+
+        results = self.put_following({"unfollow": ["user1", "user2"]})
+        self.assertEqual(results, {"user1": "unfollowed", "user2": "unfollowed"})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.following_count, 0)
+
+    # Test that the followed users' posts are backfilled into the timeline, and the unfollowed users' removed
+    @override_settings(NETWORK_TIMELINE_DEPTH=3)
+    def test_timeline(self):
+        posts = [Post.objects.create(poster=self.users[1 + i % 2], content=f"post {i}") for i in range(4)]
+
+        self.put_following({"follow": ["user1", "user2"]})
+        self.assertEqual(following_posts(self.user), posts[:0:-1])
+
+        self.put_following({"unfollow": ["user2"]})
+        self.assertEqual(following_posts(self.user), [posts[2]])
+
+    # Test that the profiles of everyone involved are invalidated in the cache
+    def test_invalidates_profiles(self):
+        self.client.get("/user0")
+        self.client.get("/user1")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.put_following({"follow": ["user1"]})
+
+        self.assertEqual(self.client.get("/user0").json()["following_count"], 1)
+        self.assertEqual(self.client.get("/user1").json()["follower_count"], 1)
+
+    # Test that only the logged in user can change whom they follow, and that malformed requests are rejected
+    def test_invalid(self):
+        response = self.client.put("/user1/following", {"follow": ["user2"]}, "application/json")
+        self.assertEqual(response.status_code, 403)
+
+        for data in ({"follow": "user1"}, {"follow": [1]}, {"follow": ["user1"], "unfollow": ["user1"]},
+                     {"follow": [f"user{i}" for i in range(501)]}):
+            self.assertEqual(self.client.put("/user0/following", data, "application/json").status_code, 400)
+        self.assertEqual(self.client.put("/user0/following", "[]", "application/json").status_code, 400)
+
+        self.client.logout()
+        response = self.client.put("/user0/following", {"follow": ["user1"]}, "application/json")
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(self.user.following.exists())
+
+# Arguments of the calls of the test tasks below
+task_calls = []
+
+# Task that records its calls
+@task
+def recording_task(value):
+    task_calls.append(value)
+
+# Task that records its calls and fails the first time it is called with a value
+@task
+def flaky_task(value):
+    task_calls.append(value)
+    if task_calls.count(value) == 1:
+        raise ValueError(f"{value} failed")
+
+# Test class for the background task queue
+@override_settings(NETWORK_TASK_BACKEND="database", NETWORK_TASK_MAX_ATTEMPTS=3)
+class TaskQueueTest(TestCase):
+    # Setup test database with data
+    def setUp(self):
+        get_cache().clear()
+        task_calls.clear()
+        self.user1 = User.objects.create(username="user1", password="user1")
+        self.user2 = User.objects.create(username="user2", password="user2")
+        self.user1.follow(self.user2)
+        self.client.force_login(self.user2)
+
+    # Runs the due tasks like a worker would, returning its report
+    def run_tasks(self):
+        out = StringIO()
+        call_command("run_tasks", "--once", stdout=out)
+        return out.getvalue().strip()
+
+    # Test that creating a post queues its fan-out alongside the post, for a worker to run
+    def test_post_fan_out_is_queued(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post("/posts", {"content": "post"}, "application/json")
+
+        inserts = [query["sql"].split()[2] for query in queries if query["sql"].startswith("INSERT")]
+        self.assertEqual(inserts, ['"network_post"', '"network_task"'])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+        self.assertEqual(self.run_tasks(), "Ran 1 tasks: 1 succeeded, 0 failed.")
+        self.assertEqual([post.content for post in following_posts(self.user1)], ["post"])
+        self.assertFalse(Task.objects.exists())
+
+    # Test that edits and follows queue their timeline updates, which act on the rows as they are when they run
+    def test_timeline_tasks(self):
+        post = Post.objects.create(poster=self.user2, content="post")
+        user3 = User.objects.create(username="user3", password="user3")
+        self.client.put(f"/posts/{post.id}/update", {"content": "edited"}, "application/json")
+        self.client.put("/user3", {"follow": True, "user": "user2"}, "application/json")
+        self.client.put("/user1", {"follow": False, "user": "user2"}, "application/json")
+        self.client.put("/user3", {"follow": False, "user": "user2"}, "application/json")
+        self.client.force_login(self.user1)
+        self.client.put("/user1/following", {"follow": ["user2"]}, "application/json")
+        self.assertEqual(Task.objects.count(), 5)
+
+        self.run_tasks()
+
+        self.assertEqual([post.content for post in following_posts(self.user1)], ["edited"])
+        self.assertEqual(following_posts(user3), [])
+
+    # Test that a fan-out run after a client read the following feed changes the feed's ETag, so the client's next
+    # conditional GET gets the new post instead of a 304
+    def test_fan_out_changes_following_feed_etag(self):
+        self.client.post("/posts", {"content": "post"}, "application/json")
+        self.client.force_login(self.user1)
+        response = self.client.get("/posts/user/user1/following")
+        self.assertEqual(response.json()["posts"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(run_claimed_task(claim_tasks(10)[0]))
+
+        response = self.client.get("/posts/user/user1/following", headers={"if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post["content"] for post in response.json()["posts"]], ["post"])
+
+    # Test that a backfill or clean-up run after a client read the following feed changes the feed's ETag
+    def test_follow_tasks_change_following_feed_etag(self):
+        Post.objects.create(poster=self.user2, content="post")
+        user3 = User.objects.create(username="user3", password="user3")
+        self.client.force_login(user3)
+
+        for follow, expected in ((True, ["post"]), (False, [])):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.put("/user3", {"follow": follow, "user": "user2"}, "application/json")
+            etag = self.client.get("/posts/user/user3/following")["ETag"]
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertTrue(run_claimed_task(claim_tasks(10)[0]))
+
+            response = self.client.get("/posts/user/user3/following", headers={"if-none-match": etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([post["content"] for post in response.json()["posts"]], expected)
+
+    # Test that a failing task is retried later with a growing delay, and given up on after the last attempt
+    @override_settings(NETWORK_TASK_RETRY_SECONDS=60)
+    def test_retries(self):
+        flaky_task.enqueue("flaky")
+        recording_task.enqueue("recorded")
+
+        with self.assertLogs("network.tasks", "ERROR") as logs:
+            self.assertEqual(self.run_tasks(), "Ran 2 tasks: 1 succeeded, 1 failed.")
+        self.assertIn("Task network.tests.flaky_task (attempt 1 of 3) failed", logs.output[0])
+        retry = Task.objects.get()
+        self.assertEqual(retry.attempts, 1)
+        self.assertIn("ValueError: flaky failed", retry.last_error)
+        self.assertAlmostEqual((retry.run_at - timezone.now()).total_seconds(), 60, delta=5)
+        self.assertEqual(self.run_tasks(), "Ran 0 tasks: 0 succeeded, 0 failed.")
+
+        Task.objects.update(run_at=timezone.now())
+        self.assertEqual(self.run_tasks(), "Ran 1 tasks: 1 succeeded, 0 failed.")
+        self.assertEqual(task_calls, ["flaky", "recorded", "flaky"])
+
+        Task.objects.create(name="network.tests.flaky_task", args=["again"], attempts=2)
+        with self.assertLogs("network.tasks", "ERROR"):
+            self.run_tasks()
+        self.assertTrue(Task.objects.get().failed)
+        self.assertEqual(self.run_tasks(), "Ran 0 tasks: 0 succeeded, 0 failed.")
+
+    # Test that a claimed task is hidden from other workers until its lease runs out
+    @override_settings(NETWORK_TASK_LEASE_SECONDS=60)
+    def test_claims_are_leased(self):
+        recording_task.enqueue("leased")
+
+        self.assertEqual(len(claim_tasks(10)), 1)
+        self.assertEqual(claim_tasks(10), [])
+
+        Task.objects.update(run_at=timezone.now())
+        self.assertEqual(len(claim_tasks(10)), 1)
+
+    # Test that only task functions can be queued and run
+    def test_not_a_task(self):
+        Task.objects.create(name="network.views.index", args=[])
+        Task.objects.create(name="network.tests.missing_task", args=[])
+        with override_settings(NETWORK_TASK_MAX_ATTEMPTS=1), self.assertLogs("network.tasks", "ERROR"):
+            self.assertEqual(self.run_tasks(), "Ran 2 tasks: 0 succeeded, 2 failed.")
+        self.assertEqual(Task.objects.filter(failed=True).count(), 2)
+
+    # Test that the immediate backend runs tasks in the request
+    @override_settings(NETWORK_TASK_BACKEND="immediate")
+    def test_immediate(self):
+        self.client.post("/posts", {"content": "post"}, "application/json")
+
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual([post.content for post in following_posts(self.user1)], ["post"])
+
+# Test class for the "thread" task backend, whose workers need committed rows
+@override_settings(NETWORK_TASK_BACKEND="thread", NETWORK_TASK_RETRY_SECONDS=0.01)
+class TaskThreadTest(TransactionTestCase):
+    # Setup test database with data
+    def setUp(self):
+        get_cache().clear()
+        task_calls.clear()
+        self.user1 = User.objects.create(username="user1", password="user1")
+        self.user2 = User.objects.create(username="user2", password="user2")
+        self.user1.follow(self.user2)
+
+    # Test that tasks run on the worker threads once their write commits
+    def test_post_fan_out(self):
+        self.client.force_login(self.user2)
+        self.client.post("/posts", {"content": "post"}, "application/json")
+        local_worker.join()
+
+        self.assertEqual([post.content for post in following_posts(self.user1)], ["post"])
+        self.assertFalse(Task.objects.exists())
+
+    # Test that a failing task is retried
+    def test_retry(self):
+        with self.assertLogs("network.tasks", "ERROR"):
+            with transaction.atomic():
+                flaky_task.enqueue("flaky")
+
+            for _ in range(100):
+                if len(task_calls) == 2:
+                    break
+                threading.Event().wait(0.05)
+            local_worker.join()
+
+        self.assertEqual(task_calls, ["flaky", "flaky"])
+
+# Test class for the response cache
+class CacheTest(TestCase):
+    # Setup test database with data
+    def setUp(self):
+        get_cache().clear()
+        self.user1 = User.objects.create(username="user1", password="user1")
+        self.user2 = User.objects.create(username="user2", password="user2")
+        self.post = Post.objects.create(poster=self.user1, content="post")
+
+    # Test that a page of posts is served from the cache the second time it is retrieved
+    def test_posts_cached(self):
+        response = self.client.get("/posts")
+        self.assertEqual(response["X-Cache"], "MISS")
+
+        with self.assertNumQueries(0):
+            cached = self.client.get("/posts")
+
+        self.assertEqual(cached["X-Cache"], "HIT")
+        self.assertEqual(cached.json(), response.json())
+        self.assertEqual(stats(), {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+
+    # Test that each page of posts is cached separately
+    def test_posts_cached_per_page(self):
+        self.client.get("/posts")
+        response = self.client.get("/posts", {"limit": 1})
+
+        self.assertEqual(response["X-Cache"], "MISS")
+
+    # Test that creating a post invalidates the cached pages of posts
+    def test_posts_invalidated_by_create(self):
+        self.client.get("/posts")
+        self.client.force_login(self.user1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/posts", {"content": "new post"}, "application/json")
+        response = self.client.get("/posts")
+
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["posts"][0]["content"], "new post")
+
+    # Test that editing and liking a post invalidates the cached pages of posts
+    def test_posts_invalidated_by_update(self):
+        self.client.force_login(self.user1)
+
+        for data in ({"content": "edited"}, {"like": True}, {"like": False}):
+            self.client.get("/posts")
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.put(f"/posts/{self.post.id}/update", data, "application/json")
+            response = self.client.get("/posts")
+
+            self.assertEqual(response["X-Cache"], "MISS")
+
+        self.assertEqual(response.json()["posts"][0]["content"], "edited")
+        self.assertEqual(response.json()["posts"][0]["likes"], 0)
+
+    # Test that following a user invalidates both users' cached profiles
+    def test_user_invalidated_by_follow(self):
+        self.client.get("/user1")
+        self.client.get("/user2")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put("/user1", {"follow": True, "user": "user2"}, "application/json")
+        user1 = self.client.get("/user1")
+        user2 = self.client.get("/user2")
+
+        self.assertEqual(user1["X-Cache"], "MISS")
+        self.assertEqual(user1.json()["following_count"], 1)
+        self.assertEqual(user2["X-Cache"], "MISS")
+        self.assertEqual(user2.json()["follower_count"], 1)
+
+    # Test that a cached page of posts is still marked with whether the requesting user liked each post
+    def test_posts_cached_liked_by_me(self):
+        self.post.like(self.user2)
+
+        self.client.force_login(self.user1)
+        self.assertFalse(self.client.get("/posts").json()["posts"][0]["liked_by_me"])
+
+        self.client.force_login(self.user2)
+        response = self.client.get("/posts")
+
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertTrue(response.json()["posts"][0]["liked_by_me"])
+
+    # Test that a missing user is not cached
+    def test_user_does_not_exist_not_cached(self):
+        self.client.get("/user3")
+        User.objects.create(username="user3", password="user3")
+
+        self.assertEqual(self.client.get("/user3").status_code, 200)
+
+# Test class for the in-process follow graph cache
+class FollowGraphTest(TestCase):
+    # Setup test database with users that follow some of each other
+    def setUp(self):
+        get_cache().clear()
+        follow_graph.clear()
+        self.users = [User.objects.create(username=f"user{i}", password=f"user{i}") for i in range(4)]
+        for user in self.users[1:]:
+            self.users[0].follow(user)
+
+    # Test that membership is answered from the cached following ids after the first lookup
+    def test_follows_cached(self):
+        user0, user1, user2, user3 = self.users
+
+        with self.assertNumQueries(1):
+            self.assertTrue(follow_graph.follows(user0.id, "user0", user2.id))
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.follows(user0.id, "user0", user1.id))
+            self.assertTrue(follow_graph.follows(user0.id, "user0", user3.id))
+            self.assertFalse(follow_graph.follows(user0.id, "user0", user0.id))
+
+        self.assertEqual(list(follow_graph.entries[user0.id][1]), sorted([user1.id, user2.id, user3.id]))
+
+    # Test that following and unfollowing through the API invalidates the cached following ids
+    def test_follows_invalidated_by_follow(self):
+        user0, user1 = self.users[:2]
+        self.assertFalse(follow_graph.follows(user1.id, "user1", user0.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put("/user1", {"follow": True, "user": "user0"}, "application/json")
+        self.assertTrue(follow_graph.follows(user1.id, "user1", user0.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put("/user1", {"follow": False, "user": "user0"}, "application/json")
+        self.assertFalse(follow_graph.follows(user1.id, "user1", user0.id))
+
+    # Test that entries expire, so processes that do not share the cache generations see follows eventually
+    @override_settings(NETWORK_FOLLOW_GRAPH_MAX_AGE_SECONDS=0)
+    def test_entries_expire(self):
+        user0, user1 = self.users[:2]
+        self.assertFalse(follow_graph.follows(user1.id, "user1", user0.id))
+
+        # A follow whose invalidation this process does not see
+        user1.follow(user0)
+        with self.assertNumQueries(1):
+            self.assertTrue(follow_graph.follows(user1.id, "user1", user0.id))
+
+    # Test that the least recently used entries are evicted to keep the number of cached ids bounded
+    @override_settings(NETWORK_FOLLOW_GRAPH_MAX_IDS=4)
+    def test_size_bounded(self):
+        user0, user1, user2, user3 = self.users
+        user1.follow(user2)
+        user2.follow(user3)
+
+        follow_graph.follows(user0.id, "user0", user1.id)
+        follow_graph.follows(user1.id, "user1", user2.id)
+        self.assertEqual(follow_graph.size, 4)
+
+        follow_graph.follows(user2.id, "user2", user3.id)
+
+        self.assertEqual(list(follow_graph.entries), [user1.id, user2.id])
+        self.assertEqual(follow_graph.size, 2)
+
+# Test class for conditional GETs (ETag / Last-Modified / 304) on the feed and profile routes
+class ConditionalTest(TestCase):
+    # Setup test database with data
+    def setUp(self):
+        get_cache().clear()
+        self.user1 = User.objects.create(username="user1", password="user1")
+        self.user2 = User.objects.create(username="user2", password="user2")
+        self.post = Post.objects.create(poster=self.user1, content="post")
+        self.client.force_login(self.user2)
+
+    # Test that a GET that sends back the ETag of a current page of posts gets a 304 without any query
+    def test_posts_not_modified(self):
+        response = self.client.get("/posts")
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get("/posts", headers={"if-none-match": response["ETag"]})
+
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b"")
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+
+    # Test that a GET that sends back the Last-Modified time of a current page of posts gets a 304
+    def test_posts_not_modified_since(self):
+        response = self.client.get("/posts")
+        not_modified = self.client.get("/posts", headers={"if-modified-since": response["Last-Modified"]})
+
+        self.assertEqual(not_modified.status_code, 304)
+
+    # Test that each page of posts has its own ETag
+    def test_posts_etag_per_page(self):
+        response = self.client.get("/posts")
+        other_page = self.client.get("/posts", {"limit": 1}, headers={"if-none-match": response["ETag"]})
+
+        self.assertEqual(other_page.status_code, 200)
+        self.assertNotEqual(other_page["ETag"], response["ETag"])
+
+    # Test that creating, editing, liking and unliking a post changes the ETag of the page of posts
+    def test_posts_etag_changed_by_writes(self):
+        writes = [
+            lambda: self.client.post("/posts", {"content": "new post"}, "application/json"),
+            lambda: self.client.put(f"/posts/{self.post.id}/like"),
+            lambda: self.client.delete(f"/posts/{self.post.id}/like"),
+        ]
+
+        for write in writes:
+            etag = self.client.get("/posts")["ETag"]
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            response = self.client.get("/posts", headers={"if-none-match": etag})
+
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+
+        self.assertEqual(response.json()["posts"][1]["likes"], 0)
+
+    # Test that a malformed page request is never answered with a 304
+    def test_posts_invalid_page_has_no_etag(self):
+        response = self.client.get("/posts", {"limit": "x"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("ETag", response)
+
+    # Test that writes do not get validators or 304s
+    def test_post_not_conditional(self):
+        etag = self.client.get("/posts")["ETag"]
+        response = self.client.post(
+            "/posts", {"content": "new post"}, "application/json", headers={"if-none-match": etag}
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("ETag", response)
+
+    # Test that the following feed is not modified until the user follows someone
+    def test_following_posts_etag_changed_by_follow(self):
+        etag = self.client.get("/posts/user/user2/following")["ETag"]
+        not_modified = self.client.get("/posts/user/user2/following", headers={"if-none-match": etag})
+        self.assertEqual(not_modified.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put("/user2", {"follow": True, "user": "user1"}, "application/json")
+        response = self.client.get("/posts/user/user2/following", headers={"if-none-match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["posts"]), 1)
+
+    # Test that a user's profile is not modified until someone follows them
+    def test_user_etag_changed_by_follow(self):
+        etag = self.client.get("/user1")["ETag"]
+        not_modified = self.client.get("/user1", headers={"if-none-match": etag})
+        self.assertEqual(not_modified.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put("/user2", {"follow": True, "user": "user1"}, "application/json")
+        response = self.client.get("/user1", headers={"if-none-match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["follower_count"], 1)
+
+    # Test that each session has its own ETag for a page of posts, since posts are marked with whether the user liked
+    # them
+    def test_posts_etag_per_session(self):
+        etag = self.client.get("/posts")["ETag"]
+
+        self.client.force_login(self.user1)
+        response = self.client.get("/posts", headers={"if-none-match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    # Test that a missing user has no ETag
+    def test_user_does_not_exist_has_no_etag(self):
+        response = self.client.get("/user3")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("ETag", response)
+
+# Test class for the performance middleware and its measurements
+@override_settings(NETWORK_PERFORMANCE_SAMPLE_RATE=1.0)
+class PerformanceMiddlewareTest(TestCase):
+    # Setup test database with data
+    def setUp(self):
+        get_cache().clear()
+        histograms.clear()
+        self.user1 = User.objects.create(username="user1", password="user1")
+        self.staff = User.objects.create(username="staff", password="staff", is_staff=True)
+        Post.objects.create(poster=self.user1, content="post")
+
+    # Test that a sampled request reports its query, serialization and total time in a Server-Timing header
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/posts")
+
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, rf'^db;dur=[0-9.]+;desc="{len(queries)} queries", ')
+        self.assertRegex(timing, r"serialize;dur=[0-9.]+")
+        self.assertRegex(timing, r"total;dur=[0-9.]+$")
+
+    # Test that requests are aggregated by route
+    def test_histograms_per_route(self):
+        self.client.get("/posts")
+        self.client.get("/posts")
+        self.client.get("/user1")
+
+        routes = histograms.snapshot()
+        self.assertEqual(routes["posts"]["count"], 2)
+        self.assertEqual(routes["user"]["count"], 1)
+        self.assertEqual(sum(routes["posts"]["wall_ms_histogram"].values()), 2)
+        self.assertGreater(routes["posts"]["mean_queries"], 0)
+        self.assertEqual(routes["posts"]["mean_bytes"], len(self.client.get("/posts").content))
+        self.assertIn("serialize", routes["posts"]["mean_spans_ms"])
+
+    # Test that requests that are not sampled are neither timed nor recorded
+    @override_settings(NETWORK_PERFORMANCE_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        response = self.client.get("/posts")
+
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(histograms.snapshot(), {})
+
+    # Test that requests to the async views are measured, including the queries they run in other threads
+    @override_settings(ROOT_URLCONF="project4.asgi_urls")
+    async def test_async_view(self):
+        response = await self.async_client.get("/posts")
+
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[0-9.]+;desc="[1-9][0-9]* queries"')
+        self.assertEqual(histograms.snapshot()["posts"]["count"], 1)
+
+    # Test that only staff can read the measurements
+    def test_metrics_staff_only(self):
+        self.client.get("/posts")
+        self.assertEqual(self.client.get("/metrics/performance").status_code, 403)
+
+        self.client.force_login(self.staff)
+        response = self.client.get("/metrics/performance")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["routes"]["posts"]["count"], 1)
+
+# Test class for the async views served under ASGI
+@override_settings(ROOT_URLCONF="project4.asgi_urls")
+class AsyncViewTest(TestCase):
+    # Test that the ASGI settings do not keep database connections between requests
+    def test_asgi_settings_close_connections(self):
+        self.assertTrue(all(database["CONN_MAX_AGE"] == 0 for database in asgi_settings.DATABASES.values()))
+
+    # Setup test database with data
+    def setUp(self):
+        get_cache().clear()
+        self.user1 = User.objects.create(username="user1", password="user1", email="user1@gmail.com")
+        self.user2 = User.objects.create(username="user2", password="user2")
+        self.user2.follow(self.user1)
+        self.posts = [Post.objects.create(poster=self.user1, content=f"post {i}") for i in range(15)]
+        for post in self.posts:
+            fan_out_post(post)
+        self.posts[-1].like(self.user2)
+
+    # Test that a page of all posts is retrieved, marked with whether the logged in user liked each post
+    async def test_posts(self):
+        await self.async_client.aforce_login(self.user2)
+
+        response = await self.async_client.get("/posts")
+        data = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual([post["content"] for post in data["posts"]], [f"post {i}" for i in range(14, 4, -1)])
+        self.assertEqual([post["liked_by_me"] for post in data["posts"][:2]], [True, False])
+
+        response = await self.async_client.get("/posts", {"cursor": data["next_cursor"]})
+
+        posts = response.json()["posts"]
+        self.assertEqual([post["content"] for post in posts], [f"post {i}" for i in range(4, -1, -1)])
+
+    # Test that a page of posts the client already has is answered with a 304
+    async def test_posts_not_modified(self):
+        etag = (await self.async_client.get("/posts"))["ETag"]
+        response = await self.async_client.get("/posts", headers={"if-none-match": etag})
+
+        self.assertEqual(response.status_code, 304)
+
+    # Test that every post is streamed
+    async def test_posts_stream(self):
+        response = await self.async_client.get("/posts", {"stream": "ndjson"})
+        lines = b"".join([chunk async for chunk in response.streaming_content]).splitlines()
+
+        self.assertEqual([json.loads(line)["content"] for line in lines], [f"post {i}" for i in range(14, -1, -1)])
+
+    # Test that a post is created by the sync view
+    async def test_posts_create(self):
+        await self.async_client.aforce_login(self.user2)
+
+        response = await self.async_client.post("/posts", {"content": "new post"}, "application/json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(await Post.objects.filter(poster=self.user2).acount(), 1)
+
+    # Test that the posts of a user are retrieved, and only by a logged in user
+    async def test_user_posts(self):
+        self.assertEqual((await self.async_client.get("/posts/user/user1")).status_code, 302)
+
+        await self.async_client.aforce_login(self.user2)
+        response = await self.async_client.get("/posts/user/user1", {"limit": 3})
+
+        self.assertEqual([post["content"] for post in response.json()["posts"]], ["post 14", "post 13", "post 12"])
+        self.assertEqual((await self.async_client.get("/posts/user/user3")).status_code, 400)
+
+    # Test that the following feed of a user is retrieved
+    async def test_user_following_posts(self):
+        await self.async_client.aforce_login(self.user2)
+
+        response = await self.async_client.get("/posts/user/user2/following")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["posts"]), 10)
+        self.assertTrue(response.json()["posts"][0]["liked_by_me"])
+
+        response = await self.async_client.get("/posts/user/user2/following", {"cursor": "0,99999999999999999999"})
+        self.assertEqual(response.status_code, 400)
+
+    # Test that info about a user is retrieved, and that users are followed by the sync view
+    async def test_user(self):
+        response = await self.async_client.get("/user1")
+
+        self.assertEqual(response.json(), {
+            "username": "user1", "email": "user1@gmail.com", "follower_count": 1, "following_count": 0
+        })
+        self.assertEqual((await self.async_client.get("/user3")).status_code, 400)
+
+        response = await self.async_client.put("/user1", {"follow": True, "user": "user2"}, "application/json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((await User.objects.aget(username="user1")).following_count, 1)
+
+# Test class for the Server-Sent Events of feed updates, served under ASGI
+@override_settings(ROOT_URLCONF="project4.asgi_urls")
+class EventsTest(TestCase):
+    # Setup test database with data
+    def setUp(self):
+        get_cache().clear()
+        brokers.clear()
+        self.user1 = User.objects.create(username="user1", password="user1")
+        self.user2 = User.objects.create(username="user2", password="user2")
+        self.user3 = User.objects.create(username="user3", password="user3")
+        self.user2.follow(self.user1)
+        self.post = Post.objects.create(poster=self.user1, content="post")
+        self.other_post = Post.objects.create(poster=self.user1, content="other post")
+
+    # Opens an event stream and returns its chunks, after the first (the reconnection delay)
+    async def open_stream(self, **params):
+        response = await self.async_client.get("/posts/events", params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b"retry: 3000\n\n")
+        return chunks
+
+    # Returns the next event of a stream as a (name, data) tuple
+    async def next_event(self, chunks):
+        chunk = (await asyncio.wait_for(anext(chunks), 5)).decode()
+        name, data = re.fullmatch(r"event: (\w+)\ndata: (.*)\n\n", chunk).groups()
+        return name, json.loads(data)
+
+    # Makes a request as user through the sync views, running its on-commit callbacks
+    @sync_to_async
+    def write(self, user, method, path, data=None):
+        client = Client()
+        client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            getattr(client, method)(path, data, "application/json")
+
+    # Test that new posts are pushed as their id and poster
+    async def test_new_post(self):
+        chunks = await self.open_stream()
+
+        await self.write(self.user2, "post", "/posts", {"content": "new post"})
+
+        post = await Post.objects.aget(content="new post")
+        self.assertEqual(await self.next_event(chunks), ("post", {"id": post.id, "poster": "user2"}))
+
+    # Test that like counts and edits are pushed for the watched posts only
+    async def test_likes_and_edits(self):
+        chunks = await self.open_stream(posts=f"{self.post.id}")
+
+        await self.write(self.user2, "put", f"/posts/{self.other_post.id}/like")
+        await self.write(self.user2, "put", f"/posts/{self.post.id}/like")
+        await self.write(self.user3, "put", f"/posts/{self.post.id}/update", {"like": True})
+        await self.write(self.user1, "put", f"/posts/{self.post.id}/update", {"content": "edited"})
+
+        self.assertEqual(await self.next_event(chunks), ("likes", {"id": self.post.id, "likes": 1}))
+        self.assertEqual(await self.next_event(chunks), ("likes", {"id": self.post.id, "likes": 2}))
+        name, data = await self.next_event(chunks)
+        self.assertEqual((name, data["id"], data["content"]), ("edit", self.post.id, "edited"))
+
+    # Test that a stream can be limited to the new posts of one poster, or of the users the logged in user follows
+    async def test_poster_filters(self):
+        by_poster = await self.open_stream(poster="user1")
+        await self.async_client.aforce_login(self.user2)
+        by_following = await self.open_stream(following="true")
+
+        await self.write(self.user3, "post", "/posts", {"content": "not followed"})
+        await self.write(self.user1, "post", "/posts", {"content": "followed"})
+
+        for chunks in (by_poster, by_following):
+            self.assertEqual((await self.next_event(chunks))[1]["poster"], "user1")
+
+    # Test that an idle stream sends keepalive comments
+    @override_settings(NETWORK_EVENTS_KEEPALIVE_SECONDS=0.01)
+    async def test_keepalive(self):
+        chunks = await self.open_stream()
+
+        self.assertEqual(await asyncio.wait_for(anext(chunks), 5), b": keepalive\n\n")
+
+    # Test that a client that falls behind is told to resync, and that a closed stream unsubscribes
+    async def test_overflow(self):
+        stream = event_stream([])
+        await anext(stream)
+        broker = get_broker()
+        self.assertTrue(broker.has_subscribers("posts"))
+
+        for i in range(QUEUE_SIZE + 1):
+            broker.publish("posts", ("post", {"id": i, "poster": "user1"}))
+        await asyncio.sleep(0)
+
+        self.assertEqual(await anext(stream), 'event: resync\ndata: {}\n\n')
+        await stream.aclose()
+        self.assertFalse(broker.has_subscribers("posts"))
+
+    # Test that malformed requests are rejected
+    async def test_invalid(self):
+        response = await self.async_client.get("/posts/events", {"posts": "a"})
+        self.assertEqual(response.json()["message"], "Invalid posts.")
+        response = await self.async_client.get("/posts/events", {"posts": "99999999999999999999999"})
+        self.assertEqual(response.json()["message"], "Invalid posts.")
+
+        response = await self.async_client.get("/posts/events", {"following": "true"})
+        self.assertEqual(response.status_code, 401)
+
+    # Test that the event stream is not served under WSGI
+    @override_settings(ROOT_URLCONF="project4.urls")
+    def test_not_served_under_wsgi(self):
+        self.assertEqual(self.client.get("/posts/events").status_code, 501)
+
+# Test class for the benchmark_asgi command
+class BenchmarkAsgiTest(TransactionTestCase):
+    # Test that the command reports the throughput of both handlers without failed requests
+    def test_benchmark_asgi(self):
+        Post.objects.create(poster=User.objects.create(username="user1", password="user1"), content="post")
+        out = StringIO()
+
+        call_command("benchmark_asgi", requests=10, concurrency=2, paths=["/posts", "/user1"], stdout=out)
+
+        self.assertRegex(out.getvalue(), r"WSGI: [\d.]+ requests/s, .*, 0 failed")
+        self.assertRegex(out.getvalue(), r"ASGI: [\d.]+ requests/s, .*, 0 failed")
+
+    # Test that the command fails without requests to make
+    def test_benchmark_asgi_no_requests(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark_asgi", requests=0, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command("benchmark_asgi", concurrency=0, stdout=StringIO())
+
+# Test class for the SQLite profile and the benchmark_sqlite command
+@unittest.skipUnless(connection.vendor == "sqlite", "The profile is SQLite-specific")
+class SqliteProfileTest(TransactionTestCase):
+    # Test that connections are opened with the profile's pragmas
+    def test_pragmas(self):
+        with connection.cursor() as cursor:
+            pragmas = {
+                pragma: cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+                for pragma in ("journal_mode", "synchronous", "busy_timeout", "temp_store")
+            }
+
+        self.assertEqual(pragmas, {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 20000, "temp_store": 2})
+
+    # Test that the command reports the throughput of both setups without failed requests, leaving the database as it
+    # was
+    def test_benchmark_sqlite(self):
+        Post.objects.create(poster=User.objects.create(username="user1", password="user1"), content="post")
+        out = StringIO()
+
+        call_command("benchmark_sqlite", seconds=0.2, readers=2, writers=1, stdout=out)
+
+        self.assertRegex(out.getvalue(), r"default: [\d.]+ reads/s, [\d.]+ writes/s, 0 failed")
+        self.assertRegex(out.getvalue(), r"wal: [\d.]+ reads/s, [\d.]+ writes/s, 0 failed")
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Post.objects.get().content, "post")
+
+# Test class for the generate_graph and benchmark commands
+class BenchmarkTest(TestCase):
+    # Setup test database with a generated graph
+    def setUp(self):
+        get_cache().clear()
+        call_command("generate_graph", users=40, posts=300, follows=5, likes=3, seed=1, stdout=StringIO())
+
+    # Test that the generated counts and timelines match the generated follows, likes and posts
+    def test_generate_graph_consistent(self):
+        out = StringIO()
+        call_command("reconcile_counts", stdout=out)
+
+        self.assertEqual(out.getvalue().strip(), "Fixed 0 like counts, 0 follower counts and 0 following counts.")
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Post.objects.count(), 300)
+        for user in User.objects.all():
+            expected = Post.objects.filter(poster__in=user.following.all()).order_by("-timestamp", "-id")[:100]
+            self.assertEqual(following_posts(user), list(expected))
+
+    # Test that followers follow a power law: the top user has many times the followers of the median user
+    def test_generate_graph_power_law(self):
+        counts = sorted(User.objects.values_list("follower_count", flat=True), reverse=True)
+
+        self.assertGreater(counts[0], 5 * max(counts[len(counts) // 2], 1))
+
+    # Test that the same seed generates the same graph
+    def test_generate_graph_seeded(self):
+        call_command(
+            "generate_graph", users=40, posts=300, follows=5, likes=3, seed=1, prefix="again", stdout=StringIO()
+        )
+
+        def graph(prefix):
+            return sorted(
+                User.objects.filter(username__startswith=prefix).values_list("follower_count", "following_count")
+            )
+
+        self.assertEqual(graph("bench"), graph("again"))
+
+    # Test that generating users with a prefix that is taken fails
+    def test_generate_graph_prefix_taken(self):
+        with self.assertRaises(CommandError):
+            call_command("generate_graph", users=2, posts=0, stdout=StringIO())
+
+    # Test that every API route is benchmarked and the results are written as JSON
+    def test_benchmark(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            out = StringIO()
+
+            call_command("benchmark", requests=3, output=output, stdout=out)
+            call_command("benchmark", requests=3, route=["posts"], compare=output, stdout=out)
+
+            with open(output) as f:
+                results = json.load(f)
+
+        self.assertEqual(set(results["routes"]), {
+            "posts", "posts?limit=100", "posts_batch", "user_posts", "user_following_posts", "user", "user_followers",
+            "user_following", "user_follows", "post_likers", "user_suggestions", "posts_search"
+        })
+        for result in results["routes"].values():
+            self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+            self.assertLessEqual(result["p95_ms"], result["p99_ms"])
+            self.assertGreater(result["bytes"], 0)
+        self.assertRegex(out.getvalue(), r"posts: p50 .* vs baseline\)")
+
+        with self.assertRaises(CommandError):
+            call_command("benchmark", requests=0, stdout=StringIO())
+
+# Test class for the query plans of the API routes.
+# Every SELECT an API route runs must find its rows through an index (no full table scan) and must get them in the order
+# it asks for from an index (no temp B-tree sort). The only scans allowed are index walks cut short by a LIMIT.
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite-specific")
+class QueryPlanTest(TestCase):
+    # Setup test database with users that follow and like each other's posts
+    def setUp(self):
+        get_cache().clear()
+        self.users = [User.objects.create(username=f"user{i}", password=f"user{i}") for i in range(5)]
+        for user in self.users[1:]:
+            user.follow(self.users[0])
+            self.users[0].follow(user)
+        for user in self.users:
+            for i in range(3):
+                post = Post.objects.create(poster=user, content=f"post {i}")
+                fan_out_post(post)
+                post.like(self.users[0])
+
+        self.client.force_login(self.users[0])
+        self.cursor = self.client.get("/posts", {"limit": 2}).json()["next_cursor"]
+        get_cache().clear()
+
+    # Returns the steps of the query plan of a captured query
+    def query_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+
+    # Asserts that every SELECT run by a request uses indexes for filtering and sorting
+    def assertQueriesUseIndexes(self, method, path, data=None):
+        with CaptureQueriesContext(connection) as context:
+            if method == "get":
+                response = self.client.get(path, data)
+            else:
+                response = getattr(self.client, method)(path, data, "application/json")
+
+        self.assertLess(response.status_code, 300)
+        for query in context.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith("SELECT"):
+                continue
+
+            plan = self.query_plan(sql)
+
+            # Scans of CONSTANT ROW or of the rows of a subquery the plan has already computed do not read a table
+            computed = {"CONSTANT"} | {step.split(" ", 1)[1] for step in plan if step.startswith(("CO-ROUTINE", "MATERIALIZE"))}
+
+            for step in plan:
+                # Search ranks are computed per query, so its matches are always sorted (see search.py)
+                if step != "USE TEMP B-TREE FOR ORDER BY" or "network_post_fts" not in sql:
+                    self.assertNotIn("USE TEMP B-TREE", step, f"{sql} sorts without an index: {step}")
+
+                # A scan of the FTS5 table is a lookup of its full-text index
+                scan = re.match(r"SCAN (.+?)( USING (COVERING )?INDEX \S+| VIRTUAL TABLE INDEX \d+:M\S*)?$", step)
+                if scan and scan.group(1) not in computed:
+                    self.assertIsNotNone(scan.group(2), f"{sql} scans a whole table: {step}")
+                    self.assertIn("LIMIT", sql, f"{sql} scans a whole index: {step}")
+
+    # Test the query plans of GET /posts
+    def test_posts(self):
+        self.assertQueriesUseIndexes("get", "/posts")
+        self.assertQueriesUseIndexes("get", "/posts", {"cursor": self.cursor})
+        self.assertQueriesUseIndexes("get", "/posts", {"cursor": self.cursor, "direction": "prev"})
+
+    # Test the query plans of POST /posts
+    def test_create_post(self):
+        self.assertQueriesUseIndexes("post", "/posts", {"content": "post"})
+
+    # Test the query plans of GET /posts/batch
+    def test_posts_batch(self):
+        ids = ",".join(str(id) for id in Post.objects.values_list("id", flat=True))
+        self.assertQueriesUseIndexes("get", "/posts/batch", {"ids": ids})
+
+    # Test the query plans of GET /posts/search
+    @unittest.skipUnless(connection.vendor == "sqlite", "Search uses SQLite FTS5")
+    def test_posts_search(self):
+        cursor = self.client.get("/posts/search", {"q": "post", "limit": 2}).json()["next_cursor"]
+        get_cache().clear()
+
+        self.assertQueriesUseIndexes("get", "/posts/search", {"q": "post"})
+        self.assertQueriesUseIndexes("get", "/posts/search", {"q": "post", "cursor": cursor})
+        self.assertQueriesUseIndexes("get", "/posts/search", {"q": "post", "cursor": cursor, "direction": "prev"})
+
+    # Test the query plans of GET /posts/user/<username>
+    def test_user_posts(self):
+        self.assertQueriesUseIndexes("get", "/posts/user/user1")
+        self.assertQueriesUseIndexes("get", "/posts/user/user1", {"cursor": self.cursor})
+
+    # Test the query plans of GET /posts/user/<username>/following
+    def test_user_following_posts(self):
+        self.assertQueriesUseIndexes("get", "/posts/user/user0/following")
+        self.assertQueriesUseIndexes("get", "/posts/user/user0/following", {"cursor": self.cursor})
+
+    # Test the query plans of PUT /posts/<post_id>/update
+    def test_update_post(self):
+        post = Post.objects.filter(poster=self.users[0]).first()
+        self.assertQueriesUseIndexes("put", f"/posts/{post.id}/update", {"content": "edited"})
+        self.assertQueriesUseIndexes("put", f"/posts/{post.id}/update", {"like": False})
+        self.assertQueriesUseIndexes("put", f"/posts/{post.id}/update", {"like": True})
+
+    # Test the query plans of GET /posts/<post_id>/likers
+    def test_post_likers(self):
+        post = Post.objects.first()
+        self.assertQueriesUseIndexes("get", f"/posts/{post.id}/likers")
+        self.assertQueriesUseIndexes("get", f"/posts/{post.id}/likers", {"cursor": "1000"})
+        self.assertQueriesUseIndexes("get", f"/posts/{post.id}/likers", {"cursor": "1", "direction": "prev"})
+
+    # Test the query plans of GET /<username>
+    def test_user(self):
+        self.assertQueriesUseIndexes("get", "/user0")
+
+    # Test the query plans of GET /<username>/follows/<other>
+    def test_user_follows(self):
+        follow_graph.clear()
+        self.assertQueriesUseIndexes("get", "/user0/follows/user1")
+
+    # Test the query plans of GET /<username>/followers and GET /<username>/following
+    def test_user_follow_lists(self):
+        for path in ("/user0/followers", "/user0/following"):
+            self.assertQueriesUseIndexes("get", path)
+            cursor = self.client.get(path, {"limit": 1}).json()["next_cursor"]
+            self.assertQueriesUseIndexes("get", path, {"cursor": cursor, "limit": 1})
+            self.assertQueriesUseIndexes("get", path, {"cursor": cursor, "direction": "prev"})
+
+    # Test the query plans of PUT /<username>
+    def test_follow(self):
+        self.assertQueriesUseIndexes("put", "/user1", {"follow": False, "user": "user0"})
+        self.assertQueriesUseIndexes("put", "/user1", {"follow": True, "user": "user0"})
+
+# Test class for the slow query log and repeated query (N+1) detector
+class QueryLogTest(TestCase):
+    # Setup test database with users that follow and like each other's posts
+    def setUp(self):
+        get_cache().clear()
+        self.users = [User.objects.create(username=f"user{i}", password=f"user{i}") for i in range(20)]
+        for user in self.users[1:]:
+            user.follow(self.users[0])
+            self.users[0].follow(user)
+            post = Post.objects.create(poster=user, content="post")
+            fan_out_post(post)
+            post.like(self.users[0])
+        self.client.force_login(self.users[0])
+
+    # Test that queries that differ only in their numbers or number of IN parameters have the same shape
+    def test_query_shape(self):
+        self.assertEqual(
+            query_shape('SELECT * FROM "post" WHERE "id" IN (%s, %s, %s) LIMIT 10'),
+            query_shape('SELECT * FROM "post" WHERE "id" IN (%s, %s) LIMIT 20'),
+        )
+        self.assertNotEqual(query_shape('SELECT * FROM "post"'), query_shape('SELECT * FROM "user"'))
+
+    # Test that slow queries are logged with the line of code that made them
+    @override_settings(NETWORK_SLOW_QUERY_MS=0)
+    def test_slow_query(self):
+        with self.assertLogs("network.queries", "WARNING") as logs:
+            list(User.objects.all())
+
+        self.assertRegex(logs.output[0], r"Slow query \([0-9.]+ ms\) at network/tests.py:\d+ in test_slow_query: SELECT")
+
+    # Test that a query repeated once per row is logged once, with the line of code that made it
+    def test_repeated_query(self):
+        with self.assertLogs("network.queries", "WARNING") as logs:
+            with inspect_queries("loop", threshold=5) as inspection:
+                for post in Post.objects.all():
+                    post.poster.username
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("Query repeated 5 times in loop (likely N+1) at network/tests.py:", logs.output[0])
+        self.assertEqual(inspection.queries, 20)
+
+    # Test that the queries of each request are inspected, labelled with the request
+    @override_settings(NETWORK_REPEATED_QUERY_THRESHOLD=1)
+    def test_request_inspected(self):
+        with self.assertLogs("network.queries", "WARNING") as logs:
+            self.client.get("/posts")
+
+        self.assertTrue(all("in GET /posts" in line for line in logs.output))
+
+    # Test that a block over its query budget fails
+    def test_query_budget(self):
+        with query_budget(queries=1):
+            User.objects.count()
+
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(queries=1):
+                User.objects.count()
+                User.objects.count()
+
+        with self.assertRaises(QueryBudgetExceeded), self.assertLogs("network.queries", "WARNING"):
+            with query_budget(repeats=3):
+                for post in Post.objects.all():
+                    post.poster.username
+
+    # Test that no API route repeats a query per post or user it returns
+    def test_routes_have_no_repeated_queries(self):
+        post = Post.objects.first()
+        ids = ",".join(str(id) for id in Post.objects.values_list("id", flat=True))
+        paths = [
+            "/posts", "/posts?stream=json", f"/posts/batch?ids={ids}", "/posts/user/user1",
+            "/posts/user/user0/following", "/user0", "/user0/followers", "/user0/following", "/user0/follows/user1",
+            f"/posts/{post.id}/likers",
+        ]
+        for path in paths:
+            with query_budget(repeats=5, label=path):
+                response = self.client.get(path)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+
+# Test class for read replica routing, with a second SQLite file standing in for a replica
+@unittest.skipUnless(connection.vendor == "sqlite", "sync_replica copies SQLite databases")
+@override_settings(NETWORK_READ_REPLICAS=["replica"])
+class ReplicaTest(TransactionTestCase):
+    # The replica is added by setUpClass, after the test databases have been set up
+    databases = "__all__"
+
+    # Add the replica database, in a temporary file
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings["replica"] = {
+            **connections.settings["default"], "NAME": os.path.join(cls.directory.name, "replica.sqlite3")
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+        cls.directory.cleanup()
+
+    # Setup a replica of the test database with data, then write to the primary only
+    def setUp(self):
+        get_cache().clear()
+        self.user1 = User.objects.create(username="user1", password="user1")
+        self.user2 = User.objects.create(username="user2", password="user2")
+        Post.objects.create(poster=self.user1, content="replicated post")
+        call_command("sync_replica", stdout=StringIO())
+        Post.objects.create(poster=self.user1, content="unreplicated post")
+
+    def contents(self, response):
+        return [post["content"] for post in response.json()["posts"]]
+
+    # Test that GET requests to the API routes read from the replica
+    def test_reads_from_replica(self):
+        self.client.force_login(self.user2)
+
+        self.assertEqual(self.contents(self.client.get("/posts")), ["replicated post"])
+        self.assertEqual(self.contents(self.client.get("/posts/user/user1")), ["replicated post"])
+        self.assertEqual(self.client.get("/user1").json()["username"], "user1")
+
+    # Test that a writer pinned to the primary is not served what another client cached from the replica after the write
+    def test_read_your_writes_cached(self):
+        writer, reader = Client(), Client()
+        writer.force_login(self.user2)
+        reader.force_login(self.user1)
+
+        writer.post("/posts", {"content": "new post"}, "application/json")
+        self.assertEqual(self.contents(reader.get("/posts")), ["replicated post"])
+        response = writer.get("/posts")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(self.contents(response), ["new post", "unreplicated post", "replicated post"])
+
+        writer.put("/user2", {"follow": True, "user": "user1"}, "application/json")
+        self.assertEqual(reader.get("/user1").json()["follower_count"], 0)
+        self.assertEqual(writer.get("/user1").json()["follower_count"], 1)
+
+    # Test that a client that writes reads its writes from the primary until its pin expires
+    def test_read_your_writes(self):
+        self.client.force_login(self.user2)
+
+        response = self.client.post("/posts", {"content": "new post"}, "application/json")
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        self.assertEqual(self.contents(self.client.get("/posts")), ["new post", "unreplicated post", "replicated post"])
+
+        self.client.cookies[PRIMARY_COOKIE] = "0"
+        get_cache().clear()
+        self.assertEqual(self.contents(self.client.get("/posts")), ["replicated post"])
+
+    # Test that likes and follows pin the client to the primary
+    def test_like_and_follow_pin(self):
+        self.client.force_login(self.user2)
+        post = Post.objects.first()
+
+        self.assertIn(PRIMARY_COOKIE, self.client.put(f"/posts/{post.id}/like").cookies)
+        self.assertIn(PRIMARY_COOKIE, self.client.put("/user2", {"follow": True, "user": "user1"}, "application/json").cookies)
+        self.assertNotIn(PRIMARY_COOKIE, self.client.put(f"/posts/{post.id + 100}/like").cookies)
+
+    # Test that the follow graph cache is filled from the primary by views that read from the replica
+    def test_follow_graph_reads_primary(self):
+        follow_graph.clear()
+        self.user2.follow(self.user1)
+        self.client.force_login(self.user2)
+
+        self.assertEqual(self.client.get("/user2/suggestions").status_code, 200)
+        self.assertTrue(follow_graph.follows(self.user2.id, "user2", self.user1.id))
+
+    # Test that reads outside the decorated views, of other apps' tables, and all writes use the primary
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Post), "default")
+
+        token = reading_from_replica.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Post), "replica")
+            self.assertEqual(router.db_for_read(Session), "default")
+            self.assertEqual(router.db_for_write(Post), "default")
+            self.assertFalse(router.allow_migrate("replica", "network"))
+        finally:
+            reading_from_replica.reset(token)
+
+    # Test that responses read from a replica are cached no longer than a writer is pinned to the primary
+    @override_settings(NETWORK_CACHE_TIMEOUT=300, NETWORK_REPLICA_STICKY_SECONDS=5)
+    def test_cache_timeout(self):
+        self.assertEqual(cache_timeout(), 300)
+
+        token = reading_from_replica.set(True)
+        try:
+            self.assertEqual(cache_timeout(), 5)
+        finally:
+            reading_from_replica.reset(token)
+
+# Test class for full-text search over posts
+@unittest.skipUnless(connection.vendor == "sqlite", "Search uses SQLite FTS5")
+class SearchTest(TestCase):
+    # Setup test database with data
+    def setUp(self):
+        get_cache().clear()
+        self.user1 = User.objects.create(username="user1", password="user1")
+        self.user2 = User.objects.create(username="user2", password="user2")
+        self.client.force_login(self.user1)
+
+    def search(self, q, **params):
+        return self.client.get("/posts/search", {"q": q, **params})
+
+    def contents(self, response):
+        return [post["content"] for post in response.json()["posts"]]
+
+    # Test that matches are ranked best first, with the same fields as the feeds
+    def test_ranked(self):
+        Post.objects.create(poster=self.user2, content="I had a coffee with a friend after a long walk")
+        best = Post.objects.create(poster=self.user2, content="coffee coffee coffee")
+        Post.objects.create(poster=self.user2, content="tea")
+        best.like(self.user1)
+
+        response = self.search("coffee")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.contents(response), ["coffee coffee coffee", "I had a coffee with a friend after a long walk"])
+        self.assertEqual(response.json()["posts"][0], {**best.serialize(), "likes": 1, "liked_by_me": True})
+
+    # Test that every word must match, words match their other forms, and the last word matches as a prefix
+    def test_matching(self):
+        Post.objects.create(poster=self.user2, content="Running shoes for the weekend")
+        Post.objects.create(poster=self.user2, content="New shoes")
+
+        self.assertEqual(self.contents(self.search("shoes weekend")), ["Running shoes for the weekend"])
+        self.assertEqual(self.contents(self.search("run")), ["Running shoes for the weekend"])
+        self.assertEqual(self.contents(self.search("wee")), ["Running shoes for the weekend"])
+        self.assertEqual(self.contents(self.search("SHOES", limit=1)), ["New shoes"])
+
+    # Test that FTS5 query syntax in a query is searched for rather than applied
+    def test_query_syntax(self):
+        Post.objects.create(poster=self.user2, content="coffee")
+
+        for q in ["coffee OR tea", "NEAR(coffee", "content:coffee tea", "-coffee tea*"]:
+            response = self.search(q)
+            self.assertEqual(response.status_code, 200, q)
+            self.assertEqual(self.contents(response), [], q)
+
+        self.assertEqual(self.contents(self.search('"coffee')), ["coffee"])
+
+    # Test that edited and deleted posts are reindexed
+    def test_index_kept_in_sync(self):
+        post = Post.objects.create(poster=self.user1, content="old words")
+
+        self.client.put(f"/posts/{post.id}/update", {"content": "new words"}, "application/json")
+        self.assertEqual(self.contents(self.search("old")), [])
+        self.assertEqual(self.contents(self.search("new")), ["new words"])
+
+        post.delete()
+        get_cache().clear()
+        self.assertEqual(self.contents(self.search("words")), [])
+
+    # Test that new posts are searchable straight away, despite the cache
+    def test_new_post_invalidates(self):
+        self.assertEqual(self.contents(self.search("hello")), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/posts", {"content": "hello"}, "application/json")
+
+        self.assertEqual(self.contents(self.search("hello")), ["hello"])
+
+    # Test that paging through the matches returns each once, in rank order, and that pages can be walked back
+    def test_pagination(self):
+        for i in range(25):
+            Post.objects.create(poster=self.user2, content="match " + "filler " * i)
+
+        pages, cursor = [], None
+        while True:
+            data = self.search("match", **({"cursor": cursor} if cursor else {})).json()
+            pages.append(data)
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+
+        contents = [post["content"] for page in pages for post in page["posts"]]
+        self.assertEqual([len(page["posts"]) for page in pages], [10, 10, 5])
+        self.assertEqual(contents, sorted(contents, key=len))
+
+        previous = self.search("match", cursor=pages[1]["prev_cursor"], direction="prev").json()
+        self.assertEqual(previous["posts"], pages[0]["posts"])
+        self.assertIsNone(previous["prev_cursor"])
+
+    # Test that a query without words and a malformed or out of range cursor are rejected
+    def test_invalid(self):
+        self.assertEqual(self.search("").status_code, 400)
+        self.assertEqual(self.search(" !? ").json()["message"], "Search query cannot be empty.")
+        self.assertEqual(self.search("coffee", cursor="nope").json()["message"], "Invalid cursor.")
+        self.assertEqual(self.search("coffee", cursor="1.0,99999999999999999999999").status_code, 400)
+
+# Test class for concurrent likes
+# (the threads wait for each other's locks, so their queries are not logged as slow)
+@override_settings(NETWORK_SLOW_QUERY_MS=None)
+class LikeConcurrencyTest(TransactionTestCase):
+    # Setup test database with data
+    def setUp(self):
+        get_cache().clear()
+        self.users = [User.objects.create(username=f"user{i}", password=f"user{i}") for i in range(8)]
+        self.post = Post.objects.create(poster=self.users[0], content="post")
+
+    # Sends method /posts/<id>/like as every user at once, each from its own thread, repeats times in a row
+    def send_concurrently(self, method, repeats):
+        errors = []
+        barrier = threading.Barrier(len(self.users))
+
+        def send(user):
+            try:
+                client = Client()
+                client.force_login(user)
+                barrier.wait()
+                for _ in range(repeats):
+                    response = getattr(client, method)(f"/posts/{self.post.id}/like")
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+            except Exception as e:
+                errors.append(e)
+                barrier.abort()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=send, args=(user,)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+
+    # Test that concurrent, repeated likes leave one like per user and a matching like count
+    def test_concurrent_likes(self):
+        self.send_concurrently("put", 5)
+
+        self.post.refresh_from_db()
+        self.assertEqual(Like.objects.filter(post=self.post).count(), len(self.users))
+        self.assertEqual(self.post.like_count, len(self.users))
+
+    # Test that concurrent, repeated unlikes remove every like without the like count going wrong
+    def test_concurrent_unlikes(self):
+        for user in self.users:
+            self.post.like(user)
+
+        self.send_concurrently("delete", 5)
+
+        self.post.refresh_from_db()
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 0)
+        self.assertEqual(self.post.like_count, 0)
+
+# Test class for write-behind likes, flushed by hand unless a test turns the timer on
+@override_settings(NETWORK_LIKE_WRITE_BEHIND=True, NETWORK_LIKE_FLUSH_SECONDS=None, NETWORK_LIKE_FLUSH_SIZE=100)
+class LikeBufferTest(TransactionTestCase):
+    # Setup test database with data
+    def setUp(self):
+        get_cache().clear()
+        self.addCleanup(like_buffer.clear)
+        self.users = [User.objects.create(username=f"user{i}", password=f"user{i}") for i in range(4)]
+        self.post = Post.objects.create(poster=self.users[0], content="post")
+        self.clients = []
+        for user in self.users:
+            client = Client()
+            client.force_login(user)
+            self.clients.append(client)
+
+    # Returns the post as served to the client of user i
+    def served_post(self, i):
+        return self.clients[i].get("/posts").json()["posts"][0]
+
+    # Test that likes are served at once but only written when the buffer is flushed
+    def test_likes_are_written_behind(self):
+        response = self.clients[1].put(f"/posts/{self.post.id}/like")
+        self.assertEqual(response.json()["liked"], True)
+        self.clients[2].put(f"/posts/{self.post.id}/update", {"like": True}, "application/json")
+
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(self.served_post(1), {**self.served_post(1), "likes": 2, "liked_by_me": True})
+        self.assertEqual(self.served_post(3), {**self.served_post(3), "likes": 2, "liked_by_me": False})
+
+        self.assertEqual(like_buffer.flush(), 2)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 2)
+        self.assertEqual(set(Like.objects.values_list("liker__username", flat=True)), {"user1", "user2"})
+        self.assertEqual(self.served_post(1), {**self.served_post(1), "likes": 2, "liked_by_me": True})
+
+    # Test that liking and unliking a post again before a flush cancel out, and that repeats change nothing
+    def test_toggles_cancel_out(self):
+        self.post.like(self.users[2])
+
+        for _ in range(3):
+            self.assertEqual(self.clients[1].put(f"/posts/{self.post.id}/like").status_code, 200)
+        self.clients[1].delete(f"/posts/{self.post.id}/like")
+        self.clients[2].delete(f"/posts/{self.post.id}/like")
+        self.clients[2].put(f"/posts/{self.post.id}/like")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(like_buffer.flush(), 0)
+
+    # Test that unlikes are written behind, and that a flush corrects a like count that has drifted
+    def test_unlikes_are_written_behind(self):
+        for user in self.users[1:]:
+            self.post.like(user)
+        Post.objects.filter(pk=self.post.pk).update(like_count=10)
+
+        self.clients[1].delete(f"/posts/{self.post.id}/like")
+        self.clients[2].delete(f"/posts/{self.post.id}/like")
+        self.assertEqual(self.served_post(1), {**self.served_post(1), "likes": 8, "liked_by_me": False})
+
+        like_buffer.flush()
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(list(Like.objects.values_list("liker__username", flat=True)), ["user3"])
+
+    # Test that a flush takes the same number of queries however many posts and users it writes
+    def test_flush_is_batched(self):
+        posts = [Post.objects.create(poster=self.users[0], content=f"post {i}") for i in range(6)]
+        for user in self.users[1:]:
+            posts[0].like(user)
+
+        def flush_queries(liked, unlikers):
+            for post in liked:
+                for user in self.users:
+                    like_buffer.record(post, user, True)
+            for user in unlikers:
+                like_buffer.record(posts[0], user, False)
+            with CaptureQueriesContext(connection) as queries:
+                like_buffer.flush()
+            return len(queries)
+
+        self.assertEqual(flush_queries(posts[1:2], self.users[1:2]), flush_queries(posts[2:], self.users[2:]))
+        self.assertEqual(Like.objects.count(), 4 * 5)
+        like_counts = Post.objects.filter(pk__in=[post.pk for post in posts]).order_by("id")
+        self.assertEqual(list(like_counts.values_list("like_count", flat=True)), [0] + [4] * 5)
+
+    # Test that the buffer is flushed once it is full
+    @override_settings(NETWORK_LIKE_FLUSH_SIZE=2)
+    def test_flush_when_full(self):
+        self.clients[1].put(f"/posts/{self.post.id}/like")
+        self.assertFalse(Like.objects.exists())
+
+        self.clients[2].put(f"/posts/{self.post.id}/like")
+
+        self.assertEqual(Like.objects.count(), 2)
+        self.assertEqual(like_buffer.flush(), 0)
+
+    # Test that the buffer is flushed on a timer
+    @override_settings(NETWORK_LIKE_FLUSH_SECONDS=0.05)
+    def test_flush_on_timer(self):
+        self.clients[1].put(f"/posts/{self.post.id}/like")
+
+        for _ in range(100):
+            if Like.objects.exists() and like_buffer.pending_delta(self.post.id) == 0:
+                break
+            threading.Event().wait(0.05)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+# Test class for precomputed follow suggestions
+class SuggestionsTest(TestCase):
+    # Setup test database with data: user0 follows user1 and user2, who follow user3 (both) and user4 (user1); user5
+    # follows user0, and user0 liked three posts of user4
+    def setUp(self):
+        get_cache().clear()
+        follow_graph.clear()
+        self.users = [User.objects.create(username=f"user{i}", password=f"user{i}") for i in range(6)]
+        u = self.users
+        for follower, followee in [(0, 1), (0, 2), (1, 3), (1, 4), (2, 3), (5, 0)]:
+            u[follower].follow(u[followee])
+        for i in range(3):
+            Post.objects.create(poster=u[4], content=f"post {i}").like(u[0])
+
+        self.client = Client()
+        self.client.force_login(u[0])
+
+    # Returns the stored suggestions of a user as (username, score) pairs, best first
+    def stored(self, user):
+        suggestions = Suggestion.objects.filter(user=user).order_by("rank")
+        return list(suggestions.values_list("suggested__username", "score"))
+
+    # Test that candidates are scored from friends of friends, follow-backs and likes, leaving out followed users
+    def test_scores(self):
+        self.assertEqual(refresh_suggestions(), 6)
+        self.assertEqual(self.stored(self.users[0]), [("user4", 2.5), ("user3", 2.0), ("user5", 2.0)])
+        # user1 is followed by user0 (a follow-back) and follows user3 and user4
+        self.assertEqual(self.stored(self.users[1]), [("user0", 2.0)])
+
+    # Test that only suggestions_per_user() suggestions are kept
+    @override_settings(NETWORK_SUGGESTIONS_PER_USER=1)
+    def test_top_k(self):
+        refresh_suggestions()
+        self.assertEqual(self.stored(self.users[0]), [("user4", 2.5)])
+
+    # Test that a refresh only recomputes the users flagged by a follow and the users who liked a post since the last one
+    def test_incremental_refresh(self):
+        refresh_suggestions()
+        self.assertFalse(User.objects.filter(suggestions_stale=True).exists())
+        self.assertEqual(refresh_suggestions(), 0)
+
+        self.users[0].follow(self.users[3])
+        Post.objects.filter(poster=self.users[4]).first().unlike(self.users[0])
+        Post.objects.create(poster=self.users[0], content="post").like(self.users[2])
+        self.assertEqual(set(User.objects.filter(suggestions_stale=True)), {self.users[0]})
+
+        self.assertEqual(refresh_suggestions(), 2)
+        self.assertEqual(self.stored(self.users[0]), [("user4", 2.0), ("user5", 2.0)])
+        self.assertEqual(self.stored(self.users[2]), [("user0", 2.5)])
+        self.assertFalse(User.objects.filter(suggestions_stale=True).exists())
+        self.assertEqual(refresh_suggestions(), 0)
+
+    # Test that liking and unliking do not write to the user
+    def test_likes_do_not_update_user(self):
+        post = Post.objects.create(poster=self.users[0], content="post")
+        with CaptureQueriesContext(connection) as queries:
+            post.like(self.users[1])
+            post.unlike(self.users[1])
+
+        self.assertFalse([query for query in queries if query["sql"].startswith('UPDATE "network_user"')])
+
+    # Test that a refresh that fails leaves its users flagged, and their stored suggestions as they were
+    def test_failed_refresh_keeps_flags(self):
+        refresh_suggestions()
+        self.users[0].follow(self.users[3])
+
+        with mock.patch("network.suggestions.score_candidates", side_effect=ValueError("scoring failed")):
+            with self.assertRaises(ValueError):
+                refresh_suggestions()
+
+        self.assertTrue(User.objects.get(pk=self.users[0].pk).suggestions_stale)
+        self.assertEqual(self.stored(self.users[0]), [("user4", 2.5), ("user3", 2.0), ("user5", 2.0)])
+        self.assertEqual(refresh_suggestions(), 1)
+
+    # Test that the command refreshes the stale users, or all of them
+    def test_command(self):
+        out = StringIO()
+        call_command("refresh_suggestions", stdout=out)
+        self.assertIn("Refreshed the suggestions of 6 users.", out.getvalue())
+        call_command("refresh_suggestions", "--all", stdout=out)
+        self.assertIn("Refreshed the suggestions of 6 users.", out.getvalue().splitlines()[-1])
+
+    # Test that the API serves the stored suggestions without users followed since, and only to their user
+    def test_api(self):
+        refresh_suggestions()
+        response = self.client.get("/user0/suggestions")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["suggestions"], [
+            {"username": "user4", "score": 2.5},
+            {"username": "user3", "score": 2.0},
+            {"username": "user5", "score": 2.0},
+        ])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put("/user0", {"follow": True, "user": "user3"}, "application/json")
+        usernames = [s["username"] for s in self.client.get("/user0/suggestions").json()["suggestions"]]
+        self.assertEqual(usernames, ["user4", "user5"])
+
+        # Once the follow graph is cached, the suggestions are one query on top of the session's
+        with self.assertNumQueries(3):
+            self.client.get("/user0/suggestions")
+
+        self.assertEqual(self.client.get("/user1/suggestions").status_code, 403)
+        self.assertEqual(Client().get("/user0/suggestions").status_code, 401)
+        self.assertEqual(self.client.post("/user0/suggestions").status_code, 400)
+
 # Test class for client
 class ClientTest(TestCase):
 
@@ -50,6 +1949,7 @@ class ClientTest(TestCase):
 
     # Setup database with data
     def setUp(self):
+        get_cache().clear()
         user1 = User.objects.create(username="user1", password="user1", email="user1@gmail.com")
 
     # index View Tests
@@ -188,7 +2088,7 @@ class ClientTest(TestCase):
         response = self.client.get("/posts")
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.json()), 0)
+        self.assertEqual(len(response.json()["posts"]), 0)
 
     # Test that posts are retrieved when there are posts
     def test_posts_get_many(self):
@@ -199,7 +2099,7 @@ class ClientTest(TestCase):
         response = self.client.get("/posts")
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.json()), 2)
+        self.assertEqual(len(response.json()["posts"]), 2)
 
     # Test that nothing happens when the request method is PUT
     def test_posts_invalid_request_method(self):
@@ -211,6 +2111,167 @@ class ClientTest(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.json()["message"], "GET or POST request required.")
 
+    # Test that posts are retrieved one page at a time by following next_cursor
+    def test_posts_get_pages(self):
+        user = User.objects.get(username="user1")
+        for i in range(25):
+            Post.objects.create(poster=user, content=f"post {i}")
+
+        response = self.client.get("/posts")
+        data = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post["content"] for post in data["posts"]], [f"post {i}" for i in range(24, 14, -1)])
+        self.assertIsNone(data["prev_cursor"])
+        self.assertIsNotNone(data["next_cursor"])
+
+        response = self.client.get("/posts", {"cursor": data["next_cursor"]})
+        data = response.json()
+
+        self.assertEqual([post["content"] for post in data["posts"]], [f"post {i}" for i in range(14, 4, -1)])
+        self.assertIsNotNone(data["prev_cursor"])
+
+        response = self.client.get("/posts", {"cursor": data["next_cursor"]})
+        data = response.json()
+
+        self.assertEqual([post["content"] for post in data["posts"]], [f"post {i}" for i in range(4, -1, -1)])
+        self.assertIsNone(data["next_cursor"])
+
+    # Test that the previous page of posts is retrieved with prev_cursor
+    def test_posts_get_previous_page(self):
+        user = User.objects.get(username="user1")
+        for i in range(25):
+            Post.objects.create(poster=user, content=f"post {i}")
+
+        first = self.client.get("/posts").json()
+        second = self.client.get("/posts", {"cursor": first["next_cursor"]}).json()
+        response = self.client.get("/posts", {"cursor": second["prev_cursor"], "direction": "prev"})
+        data = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data["posts"], first["posts"])
+        self.assertIsNone(data["prev_cursor"])
+        self.assertEqual(data["next_cursor"], first["next_cursor"])
+
+    # Test that the number of posts in a page can be set with limit
+    def test_posts_get_page_limit(self):
+        user = User.objects.get(username="user1")
+        for i in range(5):
+            Post.objects.create(poster=user, content=f"post {i}")
+
+        response = self.client.get("/posts", {"limit": 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["posts"]), 2)
+
+    # Test that nothing is retrieved when the cursor is malformed
+    def test_posts_get_invalid_cursor(self):
+        response = self.client.get("/posts", {"cursor": "yesterday"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "Invalid cursor.")
+
+    # Test that nothing is retrieved when the limit is not a positive integer
+    def test_posts_get_invalid_limit(self):
+        response = self.client.get("/posts", {"limit": 0})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "Invalid limit.")
+
+    # Test that every post is streamed as one JSON object, newest first
+    def test_posts_stream_json(self):
+        user = User.objects.get(username="user1")
+        for i in range(25):
+            Post.objects.create(poster=user, content=f"post {i}")
+
+        response = self.client.get("/posts", {"stream": "json"})
+        data = json.loads(b"".join(response.streaming_content))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual([post["content"] for post in data["posts"]], [f"post {i}" for i in range(24, -1, -1)])
+
+    # Test that every post is streamed as newline-delimited JSON, newest first
+    def test_posts_stream_ndjson(self):
+        user = User.objects.get(username="user1")
+        for i in range(25):
+            Post.objects.create(poster=user, content=f"post {i}")
+
+        response = self.client.get("/posts", {"stream": "ndjson"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual([json.loads(line)["content"] for line in lines], [f"post {i}" for i in range(24, -1, -1)])
+
+    # Test that an empty stream is still valid JSON
+    def test_posts_stream_json_empty(self):
+        response = self.client.get("/posts", {"stream": "json"})
+
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), {"posts": []})
+
+    # Test that nothing is streamed when the format is unknown
+    def test_posts_stream_invalid_format(self):
+        response = self.client.get("/posts", {"stream": "xml"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "Invalid stream.")
+
+    # posts_batch View Tests
+    # ---------------------------------------------------------------------------------------------
+    # Test that nothing happens when request is POST
+    def test_posts_batch_request_method_is_post(self):
+        response = self.client.post("/posts/batch")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "GET request required.")
+
+    # Test that nothing is retrieved when the ids are malformed
+    def test_posts_batch_invalid_ids(self):
+        response = self.client.get("/posts/batch", {"ids": "1,two"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "Invalid ids.")
+
+    # Test that nothing is retrieved when an id is too large for the database
+    def test_posts_batch_out_of_range_ids(self):
+        response = self.client.get("/posts/batch", {"ids": "1,99999999999999999999999"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "Invalid ids.")
+
+    # Test that nothing is retrieved when too many ids are given
+    def test_posts_batch_too_many_ids(self):
+        response = self.client.get("/posts/batch", {"ids": ",".join(str(id) for id in range(1, 102))})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "At most 100 posts can be retrieved at once.")
+
+    # Test that posts are retrieved in the order of the ids, leaving out posts that do not exist
+    def test_posts_batch_get_many(self):
+        user = User.objects.get(username="user1")
+        first = Post.objects.create(poster=user, content="first")
+        second = Post.objects.create(poster=user, content="second")
+
+        response = self.client.get("/posts/batch", {"ids": f"{second.id},1000,{first.id},{second.id}"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post["content"] for post in response.json()["posts"]], ["second", "first"])
+
+    # Test that retrieving posts takes the same number of queries no matter how many posts are retrieved
+    def test_posts_batch_query_count_is_constant(self):
+        user = User.objects.get(username="user1")
+        posts = [Post.objects.create(poster=user, content=f"post {i}") for i in range(50)]
+        for post in posts:
+            post.like(user)
+
+        self.client.force_login(user)
+
+        with self.assertNumQueries(4):
+            self.client.get("/posts/batch", {"ids": f"{posts[0].id}"})
+        with self.assertNumQueries(4):
+            self.client.get("/posts/batch", {"ids": ",".join(str(post.id) for post in posts)})
+
     # user_posts View Tests
     # ---------------------------------------------------------------------------------------------
     # Test that nothing happens when request is POST
@@ -251,7 +2312,7 @@ class ClientTest(TestCase):
         response = self.client.get("/posts/user/user1")
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.json()), 0)
+        self.assertEqual(len(response.json()["posts"]), 0)
 
     # Test that posts are retrieved when a user has posts
     def test_user_posts_get_many(self):
@@ -262,10 +2323,10 @@ class ClientTest(TestCase):
         Post.objects.create(poster=user, content="This is my second post!")
 
         response = self.client.get("/posts/user/user1")
-        data = response.json()
+        data = response.json()["posts"]
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.json()), 2)
+        self.assertEqual(len(response.json()["posts"]), 2)
         self.assertEqual(data[0]["poster"], "user1")
         self.assertEqual(data[0]["content"], "This is my second post!")
         self.assertEqual(data[1]["poster"], "user1")
@@ -291,7 +2352,7 @@ class ClientTest(TestCase):
     def test_user_get_info(self):
         user1 = User.objects.get(username="user1")
         user2 = User.objects.create(username="user2", password="user2", email="user2@gmail.com")
-        user1.followers.add(user2)
+        user2.follow(user1)
 
         response = self.client.get("/user1")
         data = response.json()
@@ -299,8 +2360,8 @@ class ClientTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(data["username"], "user1")
         self.assertEqual(data["email"], "user1@gmail.com")
-        self.assertEqual(len(data["followers"]), 1)
-        self.assertEqual(len(data["following"]), 0)
+        self.assertEqual(data["follower_count"], 1)
+        self.assertEqual(data["following_count"], 0)
     
     # Test that nothing happens when user trying to be followed/unfollowed does not exist
     def test_user_user_to_follow_or_unfollow_does_not_exist(self):
@@ -326,6 +2387,8 @@ class ClientTest(TestCase):
         self.assertEqual(response.json()["message"], "user1 is now following user2")
         self.assertEqual(user1.following.count(), 1)
         self.assertEqual(user2.followers.count(), 1)
+        self.assertEqual(User.objects.get(username="user1").following_count, 1)
+        self.assertEqual(User.objects.get(username="user2").follower_count, 1)
 
     # Test that user is unfollowed
     def test_user_user_is_unfollowed(self):
@@ -343,6 +2406,94 @@ class ClientTest(TestCase):
         self.assertEqual(user1.following.count(), 0)
         self.assertEqual(user2.followers.count(), 0)
 
+    # user_followers and user_following View Tests
+    # ---------------------------------------------------------------------------------------------
+    # Test that nothing happens when request is POST
+    def test_user_followers_request_method_is_post(self):
+        for path in ("/user1/followers", "/user1/following"):
+            response = self.client.post(path)
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()["message"], "GET request required.")
+
+    # Test that nothing happens when user does not exist
+    def test_user_followers_user_does_not_exist(self):
+        for path in ("/user2/followers", "/user2/following"):
+            response = self.client.get(path)
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()["message"], "User does not exist.")
+
+    # Test that the followers and following of a user are retrieved, newest follow first
+    def test_user_followers_and_following(self):
+        user1 = User.objects.get(username="user1")
+        user2 = User.objects.create(username="user2", password="user2")
+        user3 = User.objects.create(username="user3", password="user3")
+        user2.follow(user1)
+        user3.follow(user1)
+        user1.follow(user3)
+
+        followers = self.client.get("/user1/followers").json()
+        following = self.client.get("/user1/following").json()
+
+        self.assertEqual(followers, {"users": ["user3", "user2"], "next_cursor": None, "prev_cursor": None})
+        self.assertEqual(following, {"users": ["user3"], "next_cursor": None, "prev_cursor": None})
+
+    # Test that the followers of a user are paged through with next_cursor and prev_cursor
+    def test_user_followers_pages(self):
+        user1 = User.objects.get(username="user1")
+        for i in range(2, 7):
+            User.objects.create(username=f"user{i}", password=f"user{i}").follow(user1)
+
+        first = self.client.get("/user1/followers", {"limit": 2}).json()
+        second = self.client.get("/user1/followers", {"limit": 2, "cursor": first["next_cursor"]}).json()
+        third = self.client.get("/user1/followers", {"limit": 2, "cursor": second["next_cursor"]}).json()
+        previous = self.client.get(
+            "/user1/followers", {"limit": 2, "cursor": second["prev_cursor"], "direction": "prev"}
+        ).json()
+
+        self.assertEqual(first["users"], ["user6", "user5"])
+        self.assertEqual(second["users"], ["user4", "user3"])
+        self.assertEqual(third["users"], ["user2"])
+        self.assertIsNone(third["next_cursor"])
+        self.assertEqual(previous, first)
+
+    # Test that nothing is retrieved when the cursor is malformed
+    def test_user_followers_invalid_cursor(self):
+        response = self.client.get("/user1/followers", {"cursor": "yesterday"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "Invalid cursor.")
+
+        response = self.client.get("/user1/followers", {"cursor": "99999999999999999999"})
+        self.assertEqual(response.status_code, 400)
+
+    # user_follows View Tests
+    # ---------------------------------------------------------------------------------------------
+    # Test that nothing happens when request is POST
+    def test_user_follows_request_method_is_post(self):
+        response = self.client.post("/user1/follows/user1")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "GET request required.")
+
+    # Test that nothing happens when either user does not exist
+    def test_user_follows_user_does_not_exist(self):
+        for path in ("/user1/follows/user2", "/user2/follows/user1"):
+            response = self.client.get(path)
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()["message"], "User does not exist.")
+
+    # Test that whether a user follows another user is retrieved
+    def test_user_follows(self):
+        user1 = User.objects.get(username="user1")
+        user2 = User.objects.create(username="user2", password="user2", email="user2@gmail.com")
+        user1.follow(user2)
+
+        self.assertEqual(self.client.get("/user1/follows/user2").json(), {"follows": True})
+        self.assertEqual(self.client.get("/user2/follows/user1").json(), {"follows": False})
+
     # user_following_posts View Tests
     # ---------------------------------------------------------------------------------------------
     # Test that nothing happens when request is POST
@@ -375,6 +2526,16 @@ class ClientTest(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.json()["message"], "User does not exist.")
     
+    # Test that nothing is retrieved when the cursor's id is too large for the database
+    def test_user_following_posts_cursor_out_of_range(self):
+        user = User.objects.get(username="user1")
+        self.client.force_login(user)
+
+        response = self.client.get("/posts/user/user1/following", {"cursor": "0,99999999999999999999"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "Invalid cursor.")
+
     # Test that zero posts are retrieved when a user does not follow anyone
     def test_user_following_posts_follows_no_one(self):
         user = User.objects.get(username="user1")
@@ -383,7 +2544,7 @@ class ClientTest(TestCase):
         response = self.client.get("/posts/user/user1/following")
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.json()), 0)
+        self.assertEqual(len(response.json()["posts"]), 0)
 
     # Test that zero posts are retrieved when people a user follows do not have any posts
     def test_user_following_posts_get_nothing(self):
@@ -400,7 +2561,7 @@ class ClientTest(TestCase):
         response = self.client.get("/posts/user/user1/following")
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.json()), 0)
+        self.assertEqual(len(response.json()["posts"]), 0)
   
     # Test that posts are retrieved when people a user follows have posts
     def test_user_following_posts_get_many(self):
@@ -414,14 +2575,14 @@ class ClientTest(TestCase):
         user2.save()
         user3.save()
 
-        Post.objects.create(poster=user2, content="user2 post")
-        Post.objects.create(poster=user3, content="user3 post")
+        fan_out_post(Post.objects.create(poster=user2, content="user2 post"))
+        fan_out_post(Post.objects.create(poster=user3, content="user3 post"))
 
         response = self.client.get("/posts/user/user1/following")
-        data = response.json()
+        data = response.json()["posts"]
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.json()), 2)
+        self.assertEqual(len(response.json()["posts"]), 2)
         self.assertEqual(data[0]["poster"], "user3")
         self.assertEqual(data[0]["content"], "user3 post")
         self.assertEqual(data[1]["poster"], "user2")
@@ -512,6 +2673,7 @@ class ClientTest(TestCase):
         self.assertEqual(response.json()["message"], "Added like to post 1.")
         self.assertEqual(user1.likes.first().post, post)
         self.assertEqual(post.likes.first().liker, user1)
+        self.assertEqual(Post.objects.get(id=1).like_count, 1)
 
     # Test that a like is removed from the post
     def test_update_post_unlike_post(self):
@@ -527,4 +2689,102 @@ class ClientTest(TestCase):
         self.assertEqual(response.json()["message"], "Removed like from post 1.")
         self.assertEqual(user1.likes.all().count(), 0)
         self.assertEqual(post.likes.all().count(), 0)
-    
\ No newline at end of file
+    
+
+    # like_post View Tests
+    # ---------------------------------------------------------------------------------------------
+    # Test that nothing happens when request is GET
+    def test_like_post_request_method_is_get(self):
+        user1 = User.objects.get(username="user1")
+        self.client.force_login(user1)
+
+        response = self.client.get("/posts/1/like")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "PUT or DELETE request required.")
+
+    # Test that nothing happens when post does not exist
+    def test_like_post_post_does_not_exist(self):
+        user1 = User.objects.get(username="user1")
+        self.client.force_login(user1)
+
+        response = self.client.put("/posts/1/like")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "Post does not exist.")
+
+    # Test that liking a post twice adds one like
+    def test_like_post_twice(self):
+        user1 = User.objects.get(username="user1")
+        self.client.force_login(user1)
+        post = Post.objects.create(poster=user1, content="content")
+
+        self.client.put(f"/posts/{post.id}/like")
+        response = self.client.put(f"/posts/{post.id}/like")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"message": f"Added like to post {post.id}.", "liked": True})
+        self.assertEqual(post.likes.count(), 1)
+        self.assertEqual(Post.objects.get(id=post.id).like_count, 1)
+
+    # Test that unliking a post that is not liked does nothing
+    def test_unlike_post_not_liked(self):
+        user1 = User.objects.get(username="user1")
+        self.client.force_login(user1)
+        post = Post.objects.create(poster=user1, content="content")
+
+        response = self.client.delete(f"/posts/{post.id}/like")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"message": f"Removed like from post {post.id}.", "liked": False})
+        self.assertEqual(Post.objects.get(id=post.id).like_count, 0)
+
+    # post_likers View Tests
+    # ---------------------------------------------------------------------------------------------
+    # Test that nothing happens when request is POST
+    def test_post_likers_request_method_is_post(self):
+        response = self.client.post("/posts/1/likers")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "GET request required.")
+
+    # Test that nothing happens when post does not exist
+    def test_post_likers_post_does_not_exist(self):
+        response = self.client.get("/posts/1/likers")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "Post does not exist.")
+
+    # Test that the users who liked a post are paged through, most recent like first
+    def test_post_likers(self):
+        user1 = User.objects.get(username="user1")
+        post = Post.objects.create(poster=user1, content="content")
+        for i in range(2, 5):
+            post.like(User.objects.create(username=f"user{i}", password=f"user{i}"))
+
+        first = self.client.get(f"/posts/{post.id}/likers", {"limit": 2}).json()
+        second = self.client.get(f"/posts/{post.id}/likers", {"limit": 2, "cursor": first["next_cursor"]}).json()
+
+        previous = self.client.get(
+            f"/posts/{post.id}/likers", {"limit": 2, "cursor": second["prev_cursor"], "direction": "prev"}
+        ).json()
+
+        self.assertEqual(first["users"], ["user4", "user3"])
+        self.assertEqual(second["users"], ["user2"])
+        self.assertIsNone(second["next_cursor"])
+        self.assertEqual(previous, first)
+
+    # Test that posts are marked with whether the logged in user liked them, and not with who liked them
+    def test_posts_liked_by_me(self):
+        user1 = User.objects.get(username="user1")
+        liked = Post.objects.create(poster=user1, content="liked")
+        Post.objects.create(poster=user1, content="not liked")
+        liked.like(user1)
+
+        anonymous = self.client.get("/posts").json()["posts"]
+        self.client.force_login(user1)
+        posts = self.client.get("/posts").json()["posts"]
+
+        self.assertEqual([post["liked_by_me"] for post in anonymous], [False, False])
+        self.assertEqual([post["liked_by_me"] for post in posts], [False, True])
+        self.assertNotIn("likers", posts[0])
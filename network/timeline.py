@@ -0,0 +1,146 @@
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .cache import invalidate
+from .models import User, Post, TimelineEntry
+from .pagination import apaginate_merged_posts, paginate_merged_posts
+from .tasks import task
+
+# Precomputed following timelines (fan-out on write).
+#
+# When a post is created it is inserted into the timeline of each of the poster's followers, so reading the following
+# feed is a lookup of the reader's own entries instead of a scan over the posts of everyone they follow. Posts from
+# heavy accounts (accounts with at least NETWORK_TIMELINE_HEAVY_FOLLOWER_THRESHOLD followers) are not fanned out since
+# that would stall the write; they are merged into their followers' feeds when they are read instead. The first post
+# an account does not fan out sets its User.merged_since, and its posts from then on are merged into the feeds for
+# good, so the posts it made while heavy stay in its followers' feeds if it drops below the threshold. Posts that are
+# in a timeline as well as merged are only shown once. Following an account backfills its posts either way.
+
+# Returns the number of entries kept in each user's timeline
+def timeline_depth():
+    return getattr(settings, "NETWORK_TIMELINE_DEPTH", 800)
+
+# Returns the number of followers above which an account's posts are merged in when read instead of fanned out
+def heavy_follower_threshold():
+    return getattr(settings, "NETWORK_TIMELINE_HEAVY_FOLLOWER_THRESHOLD", 10000)
+
+# Returns how often a timeline is trimmed; a timeline is trimmed about once every this many entries it receives
+def trim_interval():
+    return getattr(settings, "NETWORK_TIMELINE_TRIM_INTERVAL", 50)
+
+# Returns True if a user's posts are merged into their followers' feeds when read instead of fanned out
+def is_heavy(user):
+    return user.follower_count >= heavy_follower_threshold()
+
+# Deletes all but the newest timeline_depth() entries from the timelines of the users with the given ids
+def trim_timelines(owner_ids):
+    excess = TimelineEntry.objects.filter(owner_id__in=owner_ids).annotate(
+        position=Window(RowNumber(), partition_by=F("owner_id"), order_by=[F("timestamp").desc(), F("post_id").desc()])
+    ).filter(position__gt=timeline_depth()).values_list("id", flat=True)
+
+    excess = list(excess)
+    if excess:
+        TimelineEntry.objects.filter(id__in=excess).delete()
+
+# Inserts a new post into the timelines of the poster's followers, or, for a heavy poster, has it merged into their
+# feeds when read
+def fan_out_post(post):
+    poster = post.poster
+    if is_heavy(poster):
+        if poster.merged_since is None:
+            User.objects.filter(pk=poster.pk, merged_since__isnull=True).update(merged_since=post.timestamp)
+            poster.merged_since = post.timestamp
+        return
+
+    follower_ids = list(post.poster.followers.values_list("id", flat=True))
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(owner_id=follower_id, post=post, timestamp=post.timestamp) for follower_id in follower_ids
+    ], ignore_conflicts=True)
+
+    # Trimming every timeline on every post would cost a window over each follower's whole timeline, so each post only
+    # trims the timelines of a 1 / trim_interval() slice of the followers
+    interval = trim_interval()
+    trim_timelines([follower_id for follower_id in follower_ids if (follower_id + post.id) % interval == 0])
+
+# Moves an edited post to its new position in the timelines it is in
+def refresh_timeline_entries(post):
+    TimelineEntry.objects.filter(post=post).update(timestamp=post.timestamp)
+
+# Inserts the newest posts of the users that have just been followed into the follower's timeline. Only the newest
+# timeline_depth() posts of all of them together are kept, so that is all that is read. Heavy accounts are backfilled
+# too, so their posts from before they became heavy stay in the feed.
+def backfill_timeline(follower, *followees):
+    if not followees:
+        return
+
+    posts = Post.objects.filter(poster__in=followees).order_by("-timestamp", "-id").values_list("id", "timestamp")
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(owner=follower, post_id=post_id, timestamp=timestamp)
+        for post_id, timestamp in posts[:timeline_depth()]
+    ], ignore_conflicts=True)
+    trim_timelines([follower.id])
+
+# Removes the posts of the users that have just been unfollowed from the follower's timeline
+def clean_timeline(follower, *followees):
+    TimelineEntry.objects.filter(owner=follower, post__poster__in=followees).delete()
+
+# Tasks that keep timelines up to date after a write (see tasks.py). They may run late, out of order or more than once,
+# so each acts on the current rows: a post that no longer exists is skipped, and only follows that still hold (or no
+# longer hold) are backfilled (or cleaned). The write's own invalidations can come before the task, so each task also
+# invalidates the following feeds it changed (their validators are cached in the "posts" namespace under the owner's
+# "user:<username>" generation), or a client that read a feed in between would keep getting 304s for it.
+
+# Task: inserts a new post into the timelines of the poster's followers
+@task
+def fan_out_post_task(post_id):
+    post = Post.objects.select_related("poster").filter(pk=post_id).first()
+    if post is not None:
+        fan_out_post(post)
+        invalidate("posts")
+
+# Task: moves an edited post to its new position in the timelines it is in
+@task
+def refresh_timeline_entries_task(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        refresh_timeline_entries(post)
+        invalidate("posts")
+
+# Task: inserts the newest posts of the users with followee_ids that the user with follower_id follows into their
+# timeline
+@task
+def backfill_timeline_task(follower_id, followee_ids):
+    followees = User.objects.filter(pk__in=followee_ids, followers__pk=follower_id)
+    follower = User.objects.filter(pk=follower_id).first()
+    if follower is not None:
+        backfill_timeline(follower, *followees)
+        invalidate(f"user:{follower.username}")
+
+# Task: removes the posts of the users with followee_ids that the user with follower_id does not follow from their
+# timeline
+@task
+def clean_timeline_task(follower_id, followee_ids):
+    followees = User.objects.filter(pk__in=followee_ids).exclude(followers__pk=follower_id)
+    follower = User.objects.filter(pk=follower_id).only("id", "username").first()
+    if follower is not None:
+        clean_timeline(follower, *followees)
+        invalidate(f"user:{follower.username}")
+
+# Returns one page of a user's following feed, selected by the cursor, direction and limit in params: the posts in their
+# timeline merged with the posts the accounts they follow made since they stopped being fanned out. Each is read in
+# order from its own index.
+def following_posts_page(user, params):
+    sources = [(user.timeline_entries.all(), "timestamp", "post_id")]
+    for followee in user.following.filter(merged_since__isnull=False):
+        sources.append((Post.objects.filter(poster=followee, timestamp__gte=followee.merged_since), "timestamp", "id"))
+
+    return paginate_merged_posts(sources, Post.objects.serializable(), params)
+
+# Async version of following_posts_page, using the async ORM
+async def afollowing_posts_page(user, params):
+    sources = [(user.timeline_entries.all(), "timestamp", "post_id")]
+    async for followee in user.following.filter(merged_since__isnull=False):
+        sources.append((Post.objects.filter(poster=followee, timestamp__gte=followee.merged_since), "timestamp", "id"))
+
+    return await apaginate_merged_posts(sources, Post.objects.serializable(), params)
@@ -11,8 +11,18 @@ urlpatterns = [
 
     # API routes
     path("posts", views.posts, name="posts"),
+    path("posts/batch", views.posts_batch, name="posts_batch"),
+    path("posts/search", views.posts_search, name="posts_search"),
+    path("posts/events", views.posts_events, name="posts_events"),
     path("posts/user/<str:username>", views.user_posts, name="user_posts"),
     path("posts/user/<str:username>/following", views.user_following_posts, name="user_following_posts"),
     path("posts/<int:post_id>/update", views.update_post, name="update_post"),
+    path("posts/<int:post_id>/like", views.like_post, name="like_post"),
+    path("posts/<int:post_id>/likers", views.post_likers, name="post_likers"),
+    path("metrics/performance", views.performance_metrics, name="performance_metrics"),
     path("<str:username>", views.user, name="user"),
+    path("<str:username>/followers", views.user_followers, name="user_followers"),
+    path("<str:username>/following", views.user_following, name="user_following"),
+    path("<str:username>/suggestions", views.user_suggestions, name="user_suggestions"),
+    path("<str:username>/follows/<str:other>", views.user_follows, name="user_follows"),
 ]
@@ -1,13 +1,35 @@
 import json
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.http import HttpResponse, HttpResponseRedirect
 from django.http.response import JsonResponse
 from django.shortcuts import render
 from django.urls import reverse
+from django.views.decorators.http import condition
 
-from .models import User, Post, Like
+from .cache import cache_key, get_generation, get_or_compute, invalidate
+from .conditional import (
+    following_posts_etag, following_posts_last_modified, posts_etag, posts_last_modified, user_etag, user_last_modified
+)
+from .events import publish_on_commit
+from .graph import contains, follow_graph
+from .instrumentation import histograms, timer
+from .likebuffer import like_buffer, overlay_pending_likes, set_like
+from .models import User, Post, Like, Suggestion
+from .pagination import MAX_ID, InvalidPageRequest, paginate_by_id, paginate_posts
+from .routers import pin_to_primary, replica_reads
+from .search import match_expression, search_available, search_posts
+from .streaming import STREAM_CONTENT_TYPES, streaming_posts_response
+from .timeline import (
+    backfill_timeline_task, clean_timeline_task, fan_out_post_task, following_posts_page, refresh_timeline_entries_task
+)
+
+# Maximum number of posts that can be retrieved by GET /posts/batch at once
+MAX_BATCH_SIZE = 100
+
+# Maximum number of users that can be followed or unfollowed by PUT /<username>/following at once
+MAX_BULK_FOLLOW_SIZE = 500
 
 # Renders the index page
 def index(request):
@@ -61,11 +83,72 @@ def register(request):
                 "message": "Username already taken."
             })
         login(request, user)
-        return HttpResponseRedirect(reverse("index"))
+        return pin_to_primary(HttpResponseRedirect(reverse("index")))
     else:
         return render(request, "network/register.html")
 
-# API Route: POST = creates a new post, GET = retrieves all posts
+# Serializes a page of posts
+def serialize_page(page):
+    with timer("serialize"):
+        return {
+            "posts": [post.serialize() for post in page["posts"]],
+            "next_cursor": page["next_cursor"],
+            "prev_cursor": page["prev_cursor"]
+        }
+
+# Returns a JSON response containing data, timing its encoding as serialization
+def json_response(data):
+    with timer("serialize"):
+        return JsonResponse(data, status=200)
+
+# Sets "liked_by_me" on each of a list of serialized posts to whether user has liked it, using a single query.
+# This is done per request, after the posts come out of the cache, so cached posts are the same for every user.
+def mark_liked_by_me(posts, user):
+    liked = Like.objects.liked_post_ids(user, [post["id"] for post in posts])
+    for post in posts:
+        post["liked_by_me"] = post["id"] in liked
+    return overlay_pending_likes(posts, user)
+
+# Returns one page of posts from a queryset, selected by the request's cursor, direction and limit query parameters,
+# serialized
+def posts_page(request, queryset):
+    return serialize_page(paginate_posts(queryset, request.GET))
+
+# Returns a JSON response containing one page of posts from a queryset, selected by the request's cursor, direction and
+# limit query parameters
+def posts_page_response(request, queryset):
+    try:
+        data = posts_page(request, queryset)
+    except InvalidPageRequest as e:
+        return JsonResponse({"message": str(e)}, status=400)
+
+    mark_liked_by_me(data["posts"], request.user)
+    return json_response(data)
+
+# Returns a JSON response containing data, marked with whether it came from the cache
+def cached_json_response(data, hit):
+    response = json_response(data)
+    response["X-Cache"] = "HIT" if hit else "MISS"
+    return response
+
+# Publishes a post's new like count to the clients displaying it, once the like or unlike commits
+def publish_likes(post):
+    def event():
+        likes = Post.objects.filter(pk=post.pk).values_list("like_count", flat=True).first()
+        if likes is None:
+            return None
+        return ("likes", {"id": post.id, "likes": max(likes + like_buffer.pending_delta(post.id), 0)})
+
+    publish_on_commit(f"post:{post.id}", event)
+
+# Publishes a post's new content to the clients displaying it, once the edit commits
+def publish_edit(post):
+    data = {"id": post.id, "content": post.content, "timestamp": post.serialize()["timestamp"]}
+    publish_on_commit(f"post:{post.id}", lambda: ("edit", data))
+
+# API Route: POST = creates a new post, GET = retrieves a page of all posts (or streams every post)
+@replica_reads
+@condition(etag_func=posts_etag, last_modified_func=posts_last_modified)
 def posts(request):
     # Create a new post
     if request.method == "POST" and request.user.is_authenticated:
@@ -78,21 +161,100 @@ def posts(request):
 
         user = request.user
 
-        post = Post(poster=user, content=content)
-        post.save()
+        # Save the post and queue its fan-out together
+        with transaction.atomic():
+            post = Post(poster=user, content=content)
+            post.save()
+            fan_out_post_task.enqueue(post.id)
+        invalidate("posts")
+        publish_on_commit("posts", lambda: ("post", {"id": post.id, "poster": user.username}))
 
         return JsonResponse({"message": "Post created successfully."}, status=201)
     
-    # Return all posts
+    # Stream every post, one chunk at a time
+    elif request.method == "GET" and "stream" in request.GET:
+        format = request.GET["stream"]
+        if format not in STREAM_CONTENT_TYPES:
+            return JsonResponse({"message": "Invalid stream."}, status=400)
+
+        return streaming_posts_response(Post.objects.serializable(), format, request.user)
+
+    # Return a page of all posts, from the cache if possible
     elif request.method == "GET":
-        posts = Post.objects.all().order_by("-timestamp")
-        return JsonResponse([post.serialize() for post in posts], status=200, safe=False)
+        key = cache_key("posts", request.GET.get("cursor"), request.GET.get("direction"), request.GET.get("limit"))
+        try:
+            data, hit = get_or_compute(key, lambda: posts_page(request, Post.objects.serializable()))
+        except InvalidPageRequest as e:
+            return JsonResponse({"message": str(e)}, status=400)
+
+        mark_liked_by_me(data["posts"], request.user)
+        return cached_json_response(data, hit)
     
     # Do nothing 
     else:
         return JsonResponse({"message": "GET or POST request required."}, status=400)
 
-# API route: GET = retrieves all posts created by a user
+# Parses comma-separated ids, dropping duplicates. Raises ValueError if one is not an integer the database can store.
+def parse_ids(value):
+    ids = list(dict.fromkeys(int(id) for id in value.split(",") if id.strip()))
+    if any(not -MAX_ID <= id <= MAX_ID for id in ids):
+        raise ValueError("Id out of range.")
+    return ids
+
+# API route: GET = retrieves the posts with the given ids, in the order of the ids
+@replica_reads
+def posts_batch(request):
+    # If request is not GET, do nothing
+    if request.method != "GET":
+        return JsonResponse({"message": "GET request required."}, status=400)
+
+    try:
+        ids = parse_ids(request.GET.get("ids", ""))
+    except ValueError:
+        return JsonResponse({"message": "Invalid ids."}, status=400)
+
+    if len(ids) > MAX_BATCH_SIZE:
+        return JsonResponse({"message": f"At most {MAX_BATCH_SIZE} posts can be retrieved at once."}, status=400)
+
+    # Return the posts that exist, fetched in a fixed number of queries
+    posts = Post.objects.serializable().in_bulk(ids)
+    with timer("serialize"):
+        posts = [posts[id].serialize() for id in ids if id in posts]
+    return json_response({"posts": mark_liked_by_me(posts, request.user)})
+
+# API route: GET = retrieves a page of the posts matching a search query, best match first
+@replica_reads
+def posts_search(request):
+    # If request is not GET, do nothing
+    if request.method != "GET":
+        return JsonResponse({"message": "GET request required."}, status=400)
+
+    if not search_available():
+        return JsonResponse({"message": "Search is not available."}, status=501)
+
+    expression = match_expression(request.GET.get("q", ""))
+    if expression is None:
+        return JsonResponse({"message": "Search query cannot be empty."}, status=400)
+
+    # Return a page of the matching posts, from the cache if possible
+    key = cache_key(
+        "posts", "search", expression, request.GET.get("cursor"), request.GET.get("direction"), request.GET.get("limit")
+    )
+    try:
+        data, hit = get_or_compute(key, lambda: serialize_page(search_posts(expression, request.GET)))
+    except InvalidPageRequest as e:
+        return JsonResponse({"message": str(e)}, status=400)
+
+    mark_liked_by_me(data["posts"], request.user)
+    return cached_json_response(data, hit)
+
+# API route: GET = streams updates to the posts as Server-Sent Events. Only served under ASGI (see
+# async_views.posts_events), where a connection held open does not hold a worker thread.
+def posts_events(request):
+    return JsonResponse({"message": "Server-Sent Events are only served under ASGI."}, status=501)
+
+# API route: GET = retrieves a page of the posts created by a user
+@replica_reads
 @login_required
 def user_posts(request, username):
     # If request is not GET, do nothing
@@ -105,24 +267,32 @@ def user_posts(request, username):
     except:
         return JsonResponse({"message": "User does not exist."}, status=400) 
     
-    # Return posts created by a user in reverse chronological order
-    posts = Post.objects.filter(poster=user).order_by("-timestamp")
-    return JsonResponse([post.serialize() for post in posts], status=200, safe=False)
+    # Return a page of the posts created by a user in reverse chronological order
+    return posts_page_response(request, Post.objects.serializable().filter(poster=user))
 
 # API route: GET = retrieve info about a user, PUT = follow or unfollow a user
+@replica_reads
+@condition(etag_func=user_etag, last_modified_func=user_last_modified)
 def user(request, username):
+    # Return info about a user, from the cache if possible
+    if request.method == "GET":
+        try:
+            data, hit = get_or_compute(
+                cache_key(f"user:{username}"), lambda: User.objects.get(username=username).serialize()
+            )
+        except User.DoesNotExist:
+            return JsonResponse({"message": "User does not exist."}, status=400)
+
+        return cached_json_response(data, hit)
+
     # Get user with username=username
     try:
         user = User.objects.get(username=username)
     except:
         return JsonResponse({"message": "User does not exist."}, status=400) 
 
-    # Return info about a user
-    if request.method == "GET":
-        return JsonResponse(user.serialize(), status=200, safe=False)
-    
     # Update follower/following for a user
-    elif request.method == "PUT":
+    if request.method == "PUT":
         data = json.loads(request.body)
         follow = data.get("follow")
         username_of_user_to_follow_or_unfollow = data.get("user")
@@ -133,13 +303,17 @@ def user(request, username):
             return JsonResponse({"message": "User that is trying to be followed/unfollowed does not exist."}, status=400)
 
         if follow:
-            user.following.add(user_to_follow_or_unfollow)
+            with transaction.atomic():
+                if user.follow(user_to_follow_or_unfollow):
+                    backfill_timeline_task.enqueue(user.id, [user_to_follow_or_unfollow.id])
+                    invalidate(f"user:{username}", f"user:{username_of_user_to_follow_or_unfollow}")
             message = f"{username} is now following {username_of_user_to_follow_or_unfollow}"
         else:
-            user.following.remove(user_to_follow_or_unfollow)
+            with transaction.atomic():
+                if user.unfollow(user_to_follow_or_unfollow):
+                    clean_timeline_task.enqueue(user.id, [user_to_follow_or_unfollow.id])
+                    invalidate(f"user:{username}", f"user:{username_of_user_to_follow_or_unfollow}")
             message = f"{username} is no longer following {username_of_user_to_follow_or_unfollow}"
-        
-        user.save()
 
         return JsonResponse({"message": message}, status=201)
 
@@ -147,8 +321,160 @@ def user(request, username):
     else:
         return JsonResponse({"message": "GET request required."}, status=400)
 
-# API route: GET = retrieves all posts made by the people a user follows
+# Returns a JSON response containing one page of the usernames in field of the rows of a queryset (follows or likes),
+# newest row first, selected by the request's cursor, direction and limit query parameters
+def users_page_response(request, queryset, field):
+    try:
+        return JsonResponse(paginate_by_id(queryset, request.GET, field, "users"), status=200)
+    except InvalidPageRequest as e:
+        return JsonResponse({"message": str(e)}, status=400)
+
+# API route: GET = retrieves a page of the followers of a user
+@replica_reads
+def user_followers(request, username):
+    # If request is not GET, do nothing
+    if request.method != "GET":
+        return JsonResponse({"message": "GET request required."}, status=400)
+
+    # Get user with username=username
+    try:
+        user = User.objects.get(username=username)
+    except User.DoesNotExist:
+        return JsonResponse({"message": "User does not exist."}, status=400)
+
+    # A follow row (from_user=followee, to_user=follower) means follower follows followee
+    follows = User.followers.through.objects.filter(from_user=user)
+    return users_page_response(request, follows, "to_user__username")
+
+# API route: GET = retrieves a page of the users a user follows, PUT = follows and unfollows many users at once
+@replica_reads
+def user_following(request, username):
+    if request.method == "PUT":
+        return follow_many(request, username)
+
+    # If request is not GET (or PUT, above), do nothing
+    if request.method != "GET":
+        return JsonResponse({"message": "GET request required."}, status=400)
+
+    # Get user with username=username
+    try:
+        user = User.objects.get(username=username)
+    except User.DoesNotExist:
+        return JsonResponse({"message": "User does not exist."}, status=400)
+
+    # A follow row (from_user=followee, to_user=follower) means follower follows followee
+    follows = User.followers.through.objects.filter(to_user=user)
+    return users_page_response(request, follows, "from_user__username")
+
+# Makes the logged in user follow the users whose usernames are in the "follow" list of the request's body and unfollow
+# those in its "unfollow" list, resolving all of them with one query and writing each list with a single insert or
+# delete. Responds with the result for each username.
+def follow_many(request, username):
+    if not request.user.is_authenticated:
+        return JsonResponse({"message": "Log in to follow users."}, status=401)
+
+    if request.user.username != username:
+        return JsonResponse({"message": "You can only change whom you follow."}, status=403)
+
+    # Parse and check the lists of usernames, dropping duplicates
+    try:
+        data = json.loads(request.body)
+        follow, unfollow = data.get("follow", []), data.get("unfollow", [])
+    except (ValueError, AttributeError):
+        return JsonResponse({"message": "Invalid request body."}, status=400)
+
+    def is_usernames(names):
+        return isinstance(names, list) and all(isinstance(name, str) for name in names)
+
+    if not (is_usernames(follow) and is_usernames(unfollow)):
+        return JsonResponse({"message": "follow and unfollow must be lists of usernames."}, status=400)
+
+    follow, unfollow = list(dict.fromkeys(follow)), list(dict.fromkeys(unfollow))
+
+    if len(follow) + len(unfollow) > MAX_BULK_FOLLOW_SIZE:
+        return JsonResponse(
+            {"message": f"At most {MAX_BULK_FOLLOW_SIZE} users can be followed or unfollowed at once."}, status=400
+        )
+
+    if not set(follow).isdisjoint(unfollow):
+        return JsonResponse({"message": "A user cannot be both followed and unfollowed."}, status=400)
+
+    user = request.user
+    users = User.objects.in_bulk(follow + unfollow, field_name="username")
+    followees = [users[name] for name in follow if name in users and name != username]
+    unfollowees = [users[name] for name in unfollow if name in users and name != username]
+
+    # Write the follows and queue their timeline updates together
+    with transaction.atomic():
+        followed = user.follow_many(followees)
+        unfollowed = user.unfollow_many(unfollowees)
+
+        followed = [followee for followee in followees if followee.id in followed]
+        unfollowed = [unfollowee for unfollowee in unfollowees if unfollowee.id in unfollowed]
+        if followed:
+            backfill_timeline_task.enqueue(user.id, [followee.id for followee in followed])
+        if unfollowed:
+            clean_timeline_task.enqueue(user.id, [unfollowee.id for unfollowee in unfollowed])
+        if followed or unfollowed:
+            invalidate(f"user:{username}", *(f"user:{other.username}" for other in followed + unfollowed))
+
+    # Report what happened to each user
+    changed = {other.username for other in followed + unfollowed}
+    results = {}
+    outcomes = ((follow, "followed", "already following"), (unfollow, "unfollowed", "not following"))
+    for names, done, unchanged in outcomes:
+        for name in names:
+            if name == username:
+                results[name] = "cannot follow yourself"
+            elif name not in users:
+                results[name] = "does not exist"
+            else:
+                results[name] = done if name in changed else unchanged
+
+    return JsonResponse({"results": results}, status=200)
+
+# API route: GET = checks whether a user follows another user
+def user_follows(request, username, other):
+    # If request is not GET, do nothing
+    if request.method != "GET":
+        return JsonResponse({"message": "GET request required."}, status=400)
+
+    # Get the ids of both users
+    ids = dict(User.objects.filter(username__in=[username, other]).values_list("username", "id"))
+    if username not in ids or other not in ids:
+        return JsonResponse({"message": "User does not exist."}, status=400)
+
+    # Look the follow up in the follow graph cache
+    return JsonResponse({"follows": follow_graph.follows(ids[username], username, ids[other])}, status=200)
+
+# API route: GET = retrieves the precomputed suggestions of users for the logged in user to follow, best first
+@replica_reads
+def user_suggestions(request, username):
+    # If request is not GET, do nothing
+    if request.method != "GET":
+        return JsonResponse({"message": "GET request required."}, status=400)
+
+    if not request.user.is_authenticated:
+        return JsonResponse({"message": "Log in to see suggestions."}, status=401)
+
+    if request.user.username != username:
+        return JsonResponse({"message": "You can only see your own suggestions."}, status=403)
+
+    # Read the stored suggestions, leaving out the users followed since they were computed
+    user = request.user
+    following = follow_graph.following(user.id, get_generation(f"user:{username}"))
+    suggestions = Suggestion.objects.filter(user=user).order_by("rank")
+    suggestions = [
+        {"username": suggested, "score": score}
+        for id, suggested, score in suggestions.values_list("suggested_id", "suggested__username", "score")
+        if not contains(following, id)
+    ]
+    return JsonResponse({"suggestions": suggestions}, status=200)
+
+# API route: GET = retrieves a page of the posts made by the people a user follows
+@replica_reads
 @login_required
+@condition(etag_func=following_posts_etag, last_modified_func=following_posts_last_modified)
 def user_following_posts(request, username):
     # If request is not GET, do nothing
     if request.method != "GET":
@@ -160,13 +486,17 @@ def user_following_posts(request, username):
     except:
         return JsonResponse({"message": "User does not exist."}, status=400)
     
-    # Return all posts made by people a user follows in reverse chronological order
-    following = user.following.all()
-    posts = Post.objects.filter(poster__in = following).order_by("-timestamp")
-    
-    return JsonResponse([post.serialize() for post in posts], status=200, safe=False)
+    # Return a page of the posts made by people a user follows in reverse chronological order
+    try:
+        data = serialize_page(following_posts_page(user, request.GET))
+    except InvalidPageRequest as e:
+        return JsonResponse({"message": str(e)}, status=400)
+
+    mark_liked_by_me(data["posts"], request.user)
+    return json_response(data)
 
 # API route: PUT = update the content or like count for a post
+@replica_reads
 @login_required
 def update_post(request, post_id):
     # If request is not PUT, do nothing
@@ -196,17 +526,74 @@ def update_post(request, post_id):
         post.content = content
         message = "Content of post successfully updated."
 
-        post.save()
+        with transaction.atomic():
+            post.save(update_fields=["content", "timestamp"])
+            refresh_timeline_entries_task.enqueue(post.id)
+        invalidate("posts")
+        publish_edit(post)
     
     # Update post's likes count
     if data.get("like") is not None:
-        user = request.user
+        changed = set_like(post, request.user, bool(data.get("like")))
         if data.get("like"):
-            like = Like.objects.create(post=post, liker=user)
             message = f"Added like to post {post.id}."
         else:
-            like = Like.objects.get(post=post, liker=user)
-            like.delete()
             message = f"Removed like from post {post.id}."
+
+        if changed:
+            invalidate("posts")
+            publish_likes(post)
             
-    return JsonResponse({"message": message}, status=201)
\ No newline at end of file
+    return JsonResponse({"message": message}, status=201)
+
+# API route: PUT = like a post, DELETE = unlike a post. Both are idempotent, so repeated or concurrent requests leave a
+# single like (or none) and a correct like count.
+@replica_reads
+@login_required
+def like_post(request, post_id):
+    # If request is not PUT or DELETE, do nothing
+    if request.method not in ("PUT", "DELETE"):
+        return JsonResponse({"message": "PUT or DELETE request required."}, status=400)
+
+    # Get post with id=post_id
+    try:
+        post = Post.objects.get(id=post_id)
+    except Post.DoesNotExist:
+        return JsonResponse({"message": "Post does not exist."}, status=400)
+
+    changed = set_like(post, request.user, request.method == "PUT")
+    if request.method == "PUT":
+        message = f"Added like to post {post.id}."
+    else:
+        message = f"Removed like from post {post.id}."
+
+    if changed:
+        invalidate("posts")
+        publish_likes(post)
+
+    return JsonResponse({"message": message, "liked": request.method == "PUT"}, status=200)
+
+# API route: GET = retrieves a page of the users who liked a post
+@replica_reads
+def post_likers(request, post_id):
+    # If request is not GET, do nothing
+    if request.method != "GET":
+        return JsonResponse({"message": "GET request required."}, status=400)
+
+    # Check that the post exists
+    if not Post.objects.filter(id=post_id).exists():
+        return JsonResponse({"message": "Post does not exist."}, status=400)
+
+    # Return a page of the users who liked the post, most recent like first
+    return users_page_response(request, Like.objects.filter(post_id=post_id), "liker__username")
+
+# API route: GET = retrieves the per-route performance measurements of this process (staff only)
+def performance_metrics(request):
+    # If request is not GET, do nothing
+    if request.method != "GET":
+        return JsonResponse({"message": "GET request required."}, status=400)
+
+    if not request.user.is_staff:
+        return JsonResponse({"message": "Staff access required."}, status=403)
+
+    return JsonResponse({"routes": histograms.snapshot()}, status=200)
@@ -2,6 +2,13 @@
 ASGI config for project4 project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Under ASGI the read-heavy API routes are served by async views (see asgi_settings.py), e.g.
+
+    uvicorn project4.asgi:application
+
+Run a single worker unless NETWORK_EVENT_BROKER is a broker shared by every process: the default InProcessBroker only
+delivers GET /posts/events updates to the clients of the process that made the write (see network/events.py). With a
+shared broker (and a shared cache, see CACHES), more workers can be run, e.g. with --workers 4.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
@@ -11,6 +18,6 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project4.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project4.asgi_settings')
 
 application = get_asgi_application()
@@ -0,0 +1,15 @@
+"""
+Django settings for project4 when served under ASGI (see asgi.py).
+
+The same as settings.py, except that the read-heavy API routes are served by async views and database connections are
+not kept between requests.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+ROOT_URLCONF = 'project4.asgi_urls'
+
+# Persistent connections belong to the thread that opened them. Under ASGI, the sync code of each request runs in a
+# thread of its own and the request_finished handler that closes expired connections runs in another, so connections
+# kept open would pile up instead of being reused; Django's docs advise turning them off under ASGI.
+DATABASES = {alias: {**database, 'CONN_MAX_AGE': 0} for alias, database in DATABASES.items()}  # noqa: F405
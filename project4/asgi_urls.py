@@ -0,0 +1,12 @@
+"""project4 URL Configuration under ASGI
+
+The same routes as project4/urls.py, with the network app's read-heavy API routes served by async views (see
+network/async_urls.py).
+"""
+from django.contrib import admin
+from django.urls import include, path
+
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    path("", include("network.async_urls")),
+]
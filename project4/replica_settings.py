@@ -0,0 +1,22 @@
+"""
+Django settings for project4 with a local read replica.
+
+The same as settings.py, with a second SQLite file (db_replica.sqlite3) standing in for a read replica of db.sqlite3.
+Copy the primary to it with `manage.py sync_replica`, e.g.
+
+    DJANGO_SETTINGS_MODULE=project4.replica_settings python manage.py sync_replica
+"""
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    **DATABASES,
+    'replica': {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+        # Tests read the replica from the test database
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+NETWORK_READ_REPLICAS = ['replica']
@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'network.middleware.PerformanceMiddleware',
+    'network.middleware.QueryInspectionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,15 +76,134 @@ WSGI_APPLICATION = 'project4.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
+# High-concurrency SQLite profile (benchmarked by `manage.py benchmark_sqlite`):
+# - WAL journaling, so readers do not block the writer and the writer does not block readers
+# - synchronous=NORMAL, which is durable against application crashes in WAL mode and skips an fsync per commit
+# - memory-mapped reads, a larger page cache and in-memory temporary tables
+# - a busy timeout, so a writer waits for the write lock instead of failing with "database is locked"
+# - IMMEDIATE transactions, which take the write lock when they begin, so they wait for it in the busy timeout instead
+#   of failing when a read lock cannot be upgraded
+# - persistent connections, kept open by each thread between requests instead of opened for every request
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # in KiB
+    'temp_store': 'MEMORY',
+}
+
+SQLITE_WAL_PROFILE = {
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {
+        'timeout': 20,
+        'transaction_mode': 'IMMEDIATE',
+        'init_command': '; '.join(f'PRAGMA {pragma}={value}' for pragma, value in SQLITE_PRAGMAS.items()),
+    },
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        **SQLITE_WAL_PROFILE,
+        # Test against a database file rather than SQLite's shared in-memory database, which fails concurrent writers
+        # with "database table is locked" instead of waiting for the lock like a database file does
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
     }
 }
 
+# Read replicas (see network/routers.py): aliases in DATABASES that the GET API routes read from, e.g. ['replica'] (see
+# replica_settings.py for a local setup). Writes always go to the default database.
+DATABASE_ROUTERS = ['network.routers.ReplicaRouter']
+NETWORK_READ_REPLICAS = []
+
+# Number of seconds a client reads from the default database after writing, so it sees its own writes
+NETWORK_REPLICA_STICKY_SECONDS = 5
+
 AUTH_USER_MODEL = "network.User"
 
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# Any backend works, e.g. django.core.cache.backends.filebased.FileBasedCache or
+# django.core.cache.backends.redis.RedisCache to share the cache between processes
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Response cache for GET /posts and GET /<username> (see network/cache.py)
+NETWORK_CACHE_ALIAS = "default"
+NETWORK_CACHE_TIMEOUT = 300
+
+# Following timelines (see network/timeline.py)
+# Number of posts kept in each user's precomputed following timeline
+NETWORK_TIMELINE_DEPTH = 800
+
+# Accounts with at least this many followers have their posts merged into their followers' feeds when read instead of
+# fanned out to every follower when written
+NETWORK_TIMELINE_HEAVY_FOLLOWER_THRESHOLD = 10000
+
+# Each new post trims the timelines of about 1 in this many of the poster's followers
+NETWORK_TIMELINE_TRIM_INTERVAL = 50
+
+# Maximum number of user ids held by the in-process follow graph cache (see network/graph.py)
+NETWORK_FOLLOW_GRAPH_MAX_IDS = 1000000
+
+# Number of seconds an entry of the follow graph cache is used for. Follows invalidate entries at once only in processes
+# sharing the response cache (CACHES / NETWORK_CACHE_ALIAS); other processes see them once their entries expire.
+NETWORK_FOLLOW_GRAPH_MAX_AGE_SECONDS = 60
+
+# Background tasks (see network/tasks.py)
+# Backend that runs the side effects of writes: "immediate" (in the request), "database" (queued in the Task table and
+# run by `manage.py run_tasks`) or "thread" (run by worker threads of the web server's process)
+NETWORK_TASK_BACKEND = "immediate"
+
+# Number of worker threads of the "thread" backend
+NETWORK_TASK_THREADS = 2
+
+# Number of times a failing task is tried, waiting NETWORK_TASK_RETRY_SECONDS, then twice as long each time, in between
+NETWORK_TASK_MAX_ATTEMPTS = 5
+NETWORK_TASK_RETRY_SECONDS = 2
+
+# Number of seconds a worker of the "database" backend has to run a task before other workers may run it again
+NETWORK_TASK_LEASE_SECONDS = 300
+
+# Write-behind likes (see network/likebuffer.py)
+# Record likes and unlikes in memory and write them to the database in batches
+NETWORK_LIKE_WRITE_BEHIND = False
+
+# Number of seconds between writes of the buffered likes (None to only write them when the buffer is full)
+NETWORK_LIKE_FLUSH_SECONDS = 1
+
+# Number of buffered likes and unlikes that triggers a write
+NETWORK_LIKE_FLUSH_SIZE = 500
+
+# Number of "who to follow" suggestions stored for each user by `manage.py refresh_suggestions` (see
+# network/suggestions.py)
+NETWORK_SUGGESTIONS_PER_USER = 20
+
+# Server-Sent Events of feed updates (see network/events.py)
+# Class of the publish/subscribe broker; the default only reaches clients connected to the same process
+NETWORK_EVENT_BROKER = "network.events.InProcessBroker"
+
+# Number of seconds after which an idle event stream sends a keepalive comment
+NETWORK_EVENTS_KEEPALIVE_SECONDS = 15
+
+# Fraction of requests measured by network.middleware.PerformanceMiddleware (0 turns the measurements off)
+NETWORK_PERFORMANCE_SAMPLE_RATE = 0.1
+
+# Slow query log and N+1 detector (see network/querylog.py), logged to the "network.queries" logger
+# Queries taking at least this many milliseconds are logged with the code that made them (None turns it off)
+NETWORK_SLOW_QUERY_MS = 100
+
+# A query shape run this many times in one request is logged as a likely N+1 query (None turns it off)
+NETWORK_REPEATED_QUERY_THRESHOLD = 10
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 